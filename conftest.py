@@ -0,0 +1,79 @@
+import asyncio
+import json
+from collections.abc import Callable
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from omu.extension.table import TableType
+from omu.extension.table.packets import TableItemsPacket, TableKeysPacket
+from omu.extension.table.table_extension import TableImpl
+from omu.identifier import Identifier
+from omu.serializer import Serializer
+
+TABLE_ID = Identifier("com.example", "items")
+
+
+class FakeClient:
+    def __init__(self, items: dict[str, dict], calls: list[list[str]]) -> None:
+        self.network = SimpleNamespace(
+            add_packet_handler=lambda *args: None, add_task=lambda *args: None
+        )
+        self.endpoints = self
+        self.tables = self
+        self.running = False
+        self.items = items
+        self.calls = calls
+        self._tables: dict[Identifier, TableImpl] = {}
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return asyncio.get_running_loop()
+
+    def on_ready(self, coro: Any) -> None:
+        pass
+
+    def find(self, id: Identifier) -> TableImpl | None:
+        return self._tables.get(id)
+
+    async def call(self, endpoint: Any, packet: TableKeysPacket) -> TableItemsPacket:
+        self.calls.append(list(packet.keys))
+        return TableItemsPacket(
+            id=packet.id,
+            items={
+                key: json.dumps(self.items[key]).encode()
+                for key in packet.keys
+                if key in self.items
+            },
+        )
+
+
+@pytest.fixture
+def requested_keys() -> list[list[str]]:
+    """Keys each table created by `create_table` asked the server for."""
+    return []
+
+
+@pytest.fixture
+def create_table(
+    requested_keys: list[list[str]],
+) -> Callable[..., TableImpl[dict]]:
+    """Creates a client table of dicts keyed by "key", each on its own client
+    that serves `items` as if they were on the server."""
+
+    def create(
+        items: dict[str, dict] | None = None, id: Identifier = TABLE_ID
+    ) -> TableImpl[dict]:
+        client = FakeClient(items or {}, requested_keys)
+        table = TableImpl[dict](
+            client,  # type: ignore
+            TableType(
+                id=id,
+                serializer=Serializer.json(),
+                key_function=lambda item: item["key"],
+            ),
+        )
+        client._tables[id] = table
+        return table
+
+    return create
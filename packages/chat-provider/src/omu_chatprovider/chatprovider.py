@@ -94,8 +94,8 @@ async def recheck_rooms():
     for service in tuple(chat_services.values()):
         if service.closed:
             del chat_services[service.room.id]
-    rooms = await chat.rooms.fetch_items()
-    for room in filter(lambda r: r.connected, rooms.values()):
+    rooms = await chat.rooms.fetch_by_index("connected", True)
+    for room in rooms.values():
         if room.provider_id not in services:
             continue
         if not await should_remove(room, services[room.provider_id]):
@@ -123,7 +123,19 @@ async def should_remove(room: Room, provider_service: ProviderService):
 
 
 async def recheck_channels():
-    all_channels = await chat.channels.fetch_items()
+    if not services:
+        return
+    all_channels = await chat.channels.query(
+        {
+            "filters": [
+                {
+                    "path": "$.provider_id",
+                    "op": "in",
+                    "value": [provider_id.key() for provider_id in services],
+                }
+            ]
+        }
+    )
     for channel in all_channels.values():
         provider = get_provider(channel)
         if provider is None:
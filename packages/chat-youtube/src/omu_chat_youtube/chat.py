@@ -311,8 +311,11 @@ class YoutubeChat(ChatService):
                 await self.process_chat_data(chat_data)
                 await asyncio.sleep(1 / 3)
                 if count % 10 == 0:
-                    self.room.metadata |= await self.youtube_chat.fetch_metadata()
-                    await self.chat.rooms.update(self.room)
+                    metadata = await self.youtube_chat.fetch_metadata()
+                    self.room.metadata |= metadata
+                    await self.chat.rooms.patch(
+                        {self.room.key(): {"metadata": metadata}}
+                    )
                 count += 1
         finally:
             await self.stop()
@@ -320,6 +323,7 @@ class YoutubeChat(ChatService):
     async def process_chat_data(self, chat_data: ChatData):
         messages: list[Message] = []
         authors: list[Author] = []
+        deleted_keys: list[str] = []
         for action in chat_data.chat_actions:
             if "addChatItemAction" in action:
                 await self.process_message_item(
@@ -330,33 +334,43 @@ class YoutubeChat(ChatService):
             elif "addLiveChatTickerItemAction" in action:
                 pass
             elif "markChatItemAsDeletedAction" in action:
-                await self.process_deleted_item(action["markChatItemAsDeletedAction"])
+                deleted_keys.append(
+                    self.process_deleted_item(action["markChatItemAsDeletedAction"])
+                )
             elif "removeChatItemAction" in action:
-                await self.process_deleted_item(action["removeChatItemAction"])
+                deleted_keys.append(
+                    self.process_deleted_item(action["removeChatItemAction"])
+                )
             elif "removeChatItemByAuthorAction" in action:
                 pass
             elif "updateLiveChatPollAction" in action:
                 await self.process_poll_action(action["updateLiveChatPollAction"])
             else:
                 logger.warning(f"Unknown chat action: {action}")
-        if len(authors) > 0:
-            added_authors: list[Author] = []
-            for author in authors:
-                if author.key() in self.chat.authors.cache:
-                    continue
-                added_authors.append(author)
-            await self.chat.authors.add(*added_authors)
-            self.author_fetch_queue.extend(added_authors)
-        if len(messages) > 0:
-            await self.chat.messages.add(*messages)
-            await self.update_message_ids(messages)
+        # Deletions, authors, messages and the room are written in one round trip
+        async with self.chat.omu.tables.batch():
+            if len(deleted_keys) > 0:
+                await self.chat.messages.remove_keys(*deleted_keys)
+            if len(authors) > 0:
+                added_authors: list[Author] = []
+                for author in authors:
+                    if author.key() in self.chat.authors.cache:
+                        continue
+                    added_authors.append(author)
+                await self.chat.authors.add(*added_authors)
+                self.author_fetch_queue.extend(added_authors)
+            if len(messages) > 0:
+                await self.chat.messages.add(*messages)
+                await self.update_message_ids(messages)
         await self.process_reactions(chat_data)
 
     async def update_message_ids(self, messages):
+        metadata: RoomMetadata = {"last_message_id": messages[-1].id.key()}
         if not self._room.metadata.get("first_message_id"):
-            self._room.metadata["first_message_id"] = messages[0].id.key()
-        self._room.metadata["last_message_id"] = messages[-1].id.key()
-        await self.chat.rooms.update(self._room)
+            metadata["first_message_id"] = messages[0].id.key()
+        self._room.metadata |= metadata
+        # Only the changed ids are sent instead of the whole room
+        await self.chat.rooms.patch({self._room.key(): {"metadata": metadata}})
 
     async def fetch_authors_task(self):
         try:
@@ -370,7 +384,9 @@ class YoutubeChat(ChatService):
                     metadata = author.metadata or {}
                     metadata |= new_metadata
                     author.metadata = metadata
-                    await self.chat.authors.update(author)
+                    await self.chat.authors.patch(
+                        {author.key(): {"metadata": new_metadata}}
+                    )
         except asyncio.CancelledError:
             return
 
@@ -513,11 +529,9 @@ class YoutubeChat(ChatService):
         else:
             raise ProviderError(f"Unknown message type: {list(item.keys())} {item=}")
 
-    async def process_deleted_item(self, item: MarkChatItemAsDeletedAction):
-        id = self._room.id / item["targetItemId"]
-        message = await self.chat.messages.get(id.key())
-        if message:
-            await self.chat.messages.remove(message)
+    def process_deleted_item(self, item: MarkChatItemAsDeletedAction) -> str:
+        # Removing a message that was never stored is a no-op on the server
+        return (self._room.id / item["targetItemId"]).key()
 
     async def process_poll_action(self, action: UpdateLiveChatPollAction):
         poll_renderer = action["pollToUpdate"]["pollRenderer"]
@@ -27,6 +27,14 @@ MESSAGE_TABLE = TableType.create_model(
         read=CHAT_READ_PERMISSION_ID,
         write=CHAT_WRITE_PERMISSION_ID,
     ),
+    indexes={
+        "room_id": {"path": "$.room_id"},
+        "author_id": {"path": "$.author_id"},
+        "created_at": {"path": "$.created_at"},
+        "paid": {"path": "$.paid", "exists": True},
+    },
+    partition={"path": "$.room_id"},
+    search={"path": "$.content", "text_type": "text"},
 )
 AUTHOR_TABLE = TableType.create_model(
     IDENTIFIER,
@@ -37,6 +45,9 @@ AUTHOR_TABLE = TableType.create_model(
         read=CHAT_READ_PERMISSION_ID,
         write=CHAT_WRITE_PERMISSION_ID,
     ),
+    indexes={
+        "provider_id": {"path": "$.provider_id"},
+    },
 )
 CHANNEL_TABLE = TableType.create_model(
     IDENTIFIER,
@@ -47,6 +58,9 @@ CHANNEL_TABLE = TableType.create_model(
         read=CHAT_READ_PERMISSION_ID,
         write=CHAT_WRITE_PERMISSION_ID,
     ),
+    indexes={
+        "provider_id": {"path": "$.provider_id"},
+    },
 )
 PROVIDER_TABLE = TableType.create_model(
     IDENTIFIER,
@@ -67,6 +81,12 @@ ROOM_TABLE = TableType.create_model(
         read=CHAT_READ_PERMISSION_ID,
         write=CHAT_WRITE_PERMISSION_ID,
     ),
+    indexes={
+        "provider_id": {"path": "$.provider_id"},
+        "channel_id": {"path": "$.channel_id"},
+        "connected": {"path": "$.connected"},
+    },
+    update_window=0.5,
 )
 VOTE_TABLE = TableType.create_model(
     IDENTIFIER,
@@ -103,6 +123,7 @@ class Chat:
     ):
         omu.server.require(IDENTIFIER)
         omu.permissions.require(CHAT_PERMISSION_ID)
+        self.omu = omu
         self.messages = omu.tables.get(MESSAGE_TABLE)
         self.authors = omu.tables.get(AUTHOR_TABLE)
         self.channels = omu.tables.get(CHANNEL_TABLE)
@@ -47,6 +47,10 @@ class TableEvent[T](ListenerEvent[Mapping[str, T]]):
         self.remove_batch = ListenerEvent(
             lambda chat: get_table(chat).event.remove,
         )
+        # Removed keys only, the removed items are not sent
+        self.remove_keys = ListenerEvent(
+            lambda chat: get_table(chat).event.remove_keys,
+        )
         self.add = self._create_batch_subscriber(
             lambda table: table.event.add,
         )
@@ -0,0 +1,53 @@
+import argparse
+import time
+
+from omu.extension.table.table_cache import TableCache
+
+
+def legacy_update_cache(
+    cache: dict[str, int], items: dict[str, int], cache_size: int
+) -> dict[str, int]:
+    # The previous implementation: merge, convert to a tuple and slice.
+    merged_cache = {**cache, **items}
+    cache_array = tuple(merged_cache.items())
+    return dict(cache_array[:cache_size])
+
+
+def bench_legacy(events: int, batch: int, cache_size: int) -> float:
+    cache: dict[str, int] = {}
+    start = time.perf_counter()
+    for event in range(events):
+        items = {f"message{event * batch + i}": i for i in range(batch)}
+        cache = legacy_update_cache(cache, items, cache_size)
+    return time.perf_counter() - start
+
+
+def bench_table_cache(events: int, batch: int, cache_size: int) -> float:
+    cache = TableCache[int](cache_size)
+    start = time.perf_counter()
+    for event in range(events):
+        items = {f"message{event * batch + i}": i for i in range(batch)}
+        cache.update(items)
+    return time.perf_counter() - start
+
+
+def main(events: int, batch: int, cache_size: int) -> None:
+    for name, bench in (
+        ("legacy update_cache", bench_legacy),
+        ("TableCache.update", bench_table_cache),
+    ):
+        elapsed = bench(events, batch, cache_size)
+        per_event = elapsed / events * 1_000_000
+        print(
+            f"{name}: {events} events of {batch} items into {cache_size} "
+            f"in {elapsed:.3f}s ({per_event:.1f}us/event)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Client table cache benchmark")
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument("--cache-size", type=int, default=1000)
+    args = parser.parse_args()
+    main(args.events, args.batch, args.cache_size)
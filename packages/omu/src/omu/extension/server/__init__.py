@@ -2,8 +2,10 @@ from __future__ import annotations
 
 from .server_extension import (
     SERVER_APPS_READ_PERMISSION_ID,
+    SERVER_BACKUP_PERMISSION_ID,
     SERVER_EXTENSION_TYPE,
     SERVER_SHUTDOWN_PERMISSION_ID,
+    ServerBackup,
     ServerExtension,
 )
 
@@ -11,5 +13,7 @@ __all__ = [
     "SERVER_EXTENSION_TYPE",
     "SERVER_APPS_READ_PERMISSION_ID",
     "SERVER_SHUTDOWN_PERMISSION_ID",
+    "SERVER_BACKUP_PERMISSION_ID",
+    "ServerBackup",
     "ServerExtension",
 ]
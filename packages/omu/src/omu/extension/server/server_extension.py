@@ -1,3 +1,5 @@
+from typing import NotRequired, TypedDict
+
 from omu.app import App
 from omu.client import Client
 from omu.extension import Extension, ExtensionType
@@ -20,6 +22,7 @@ APP_TABLE_TYPE = TableType.create_model(
     permissions=TablePermissions(
         read=SERVER_APPS_READ_PERMISSION_ID,
     ),
+    adapter="memory",
 )
 SERVER_SHUTDOWN_PERMISSION_ID = SERVER_EXTENSION_TYPE / "shutdown"
 SHUTDOWN_ENDPOINT_TYPE = EndpointType[bool, bool].create_json(
@@ -27,6 +30,19 @@ SHUTDOWN_ENDPOINT_TYPE = EndpointType[bool, bool].create_json(
     "shutdown",
     permission_id=SERVER_SHUTDOWN_PERMISSION_ID,
 )
+SERVER_BACKUP_PERMISSION_ID = SERVER_EXTENSION_TYPE / "backup"
+
+
+class ServerBackup(TypedDict):
+    file: str  # archive name in the server's backup directory
+    rate: NotRequired[int]  # bytes per second read, to spare live traffic
+
+
+BACKUP_ENDPOINT_TYPE = EndpointType[ServerBackup, int].create_json(
+    SERVER_EXTENSION_TYPE,
+    "backup",
+    permission_id=SERVER_BACKUP_PERMISSION_ID,
+)
 REQUIRE_APPS_PACKET_TYPE = PacketType[list[Identifier]].create_json(
     SERVER_EXTENSION_TYPE,
     "require_apps",
@@ -56,6 +72,12 @@ class ServerExtension(Extension):
     async def shutdown(self, restart: bool = False) -> bool:
         return await self._client.endpoints.call(SHUTDOWN_ENDPOINT_TYPE, restart)
 
+    async def backup(self, file: str, rate: int | None = None) -> int:
+        backup = ServerBackup(file=file)
+        if rate is not None:
+            backup["rate"] = rate
+        return await self._client.endpoints.call(BACKUP_ENDPOINT_TYPE, backup)
+
     def require(self, *app_ids: Identifier) -> None:
         if self._client.running:
             raise RuntimeError("Cannot require apps after the client has started")
@@ -1,12 +1,58 @@
-from .table import Table, TableConfig, TableEvents, TablePermissions, TableType
+from .table import (
+    IndexValue,
+    Table,
+    TableAdapterType,
+    TableCacheChange,
+    TableChange,
+    TableChanges,
+    TableChangeType,
+    TableCompression,
+    TableConfig,
+    TableDump,
+    TableDumpFormat,
+    TableEvents,
+    TableFilter,
+    TableIndex,
+    TablePage,
+    TablePartition,
+    TablePermissions,
+    TableQuery,
+    TableRestore,
+    TableRetention,
+    TableSearch,
+    TableSearchQuery,
+    TableType,
+    TableWrite,
+    TableWriteType,
+)
 from .table_extension import TABLE_EXTENSION_TYPE, TableExtension
 
 __all__ = [
+    "IndexValue",
     "Table",
+    "TableAdapterType",
+    "TableCacheChange",
+    "TableChange",
+    "TableChanges",
+    "TableChangeType",
+    "TableCompression",
     "TableConfig",
+    "TableDump",
+    "TableDumpFormat",
     "TableEvents",
+    "TableFilter",
+    "TableIndex",
+    "TablePage",
+    "TablePartition",
     "TablePermissions",
+    "TableQuery",
+    "TableRestore",
+    "TableRetention",
+    "TableSearch",
+    "TableSearchQuery",
     "TableType",
+    "TableWrite",
+    "TableWriteType",
     "TABLE_EXTENSION_TYPE",
     "TableExtension",
 ]
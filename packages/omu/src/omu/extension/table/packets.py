@@ -8,7 +8,18 @@ from omu.bytebuffer import ByteReader, ByteWriter
 from omu.helper import map_optional
 from omu.identifier import Identifier
 
-from .table import TableConfig
+from .table import (
+    IndexValue,
+    TableChange,
+    TableChangeType,
+    TableConfig,
+    TableDump,
+    TableQuery,
+    TableRestore,
+    TableSearchQuery,
+    TableWrite,
+    TableWriteType,
+)
 
 
 @dataclass(frozen=True, slots=True)
@@ -157,6 +168,76 @@ class TableFetchPacket:
         )
 
 
+@dataclass(frozen=True, slots=True)
+class TableFetchPagePacket:
+    id: Identifier
+    limit: int
+    backward: bool
+    cursor: str | None
+
+    @classmethod
+    def serialize(cls, item: TableFetchPagePacket) -> bytes:
+        writer = ByteWriter()
+        writer.write_string(item.id.key())
+        writer.write_int(item.limit)
+        writer.write_boolean(item.backward)
+        writer.write_boolean(item.cursor is not None)
+        if item.cursor is not None:
+            writer.write_string(item.cursor)
+        return writer.finish()
+
+    @classmethod
+    def deserialize(cls, item: bytes) -> TableFetchPagePacket:
+        with ByteReader(item) as reader:
+            id = reader.read_string()
+            limit = reader.read_int()
+            backward = reader.read_boolean()
+            cursor = reader.read_string() if reader.read_boolean() else None
+        return TableFetchPagePacket(
+            id=Identifier.from_key(id),
+            limit=limit,
+            backward=backward,
+            cursor=cursor,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class TablePagePacket:
+    id: Identifier
+    items: Mapping[str, bytes]
+    cursor: str | None
+
+    @classmethod
+    def serialize(cls, item: TablePagePacket) -> bytes:
+        writer = ByteWriter()
+        writer.write_string(item.id.key())
+        writer.write_int(len(item.items))
+        for key, value in item.items.items():
+            writer.write_string(key)
+            writer.write_byte_array(value)
+        writer.write_boolean(item.cursor is not None)
+        if item.cursor is not None:
+            writer.write_string(item.cursor)
+        return writer.finish()
+
+    @classmethod
+    def deserialize(cls, item: bytes) -> TablePagePacket:
+        with ByteReader(item) as reader:
+            id = reader.read_string()
+            item_count = reader.read_int()
+            items: Mapping[str, bytes] = {}
+            for _ in range(item_count):
+                item_key = reader.read_string()
+                value = reader.read_byte_array()
+                items[item_key] = value
+            cursor = reader.read_string() if reader.read_boolean() else None
+        return TablePagePacket(
+            id=Identifier.from_key(id),
+            items=items,
+            cursor=cursor,
+        )
+
+
 @dataclass(frozen=True, slots=True)
 class TableFetchRangePacket:
     id: Identifier
@@ -180,6 +261,274 @@ class TableFetchRangePacket:
         return TableFetchRangePacket(id=Identifier.from_key(id), start=start, end=end)
 
 
+@dataclass(frozen=True, slots=True)
+class TableFetchIndexPacket:
+    id: Identifier
+    index: str
+    start: IndexValue | None
+    end: IndexValue | None
+    limit: int | None
+    backward: bool
+
+    @classmethod
+    def serialize(cls, item: TableFetchIndexPacket) -> bytes:
+        writer = ByteWriter()
+        writer.write_string(item.id.key())
+        writer.write_string(item.index)
+        flags = 0
+        if item.start is not None:
+            flags |= 0b1
+        if item.end is not None:
+            flags |= 0b10
+        if item.limit is not None:
+            flags |= 0b100
+        if item.backward:
+            flags |= 0b1000
+        writer.write_byte(flags)
+        if item.start is not None:
+            writer.write_string(json.dumps(item.start))
+        if item.end is not None:
+            writer.write_string(json.dumps(item.end))
+        if item.limit is not None:
+            writer.write_int(item.limit)
+        return writer.finish()
+
+    @classmethod
+    def deserialize(cls, item: bytes) -> TableFetchIndexPacket:
+        with ByteReader(item) as reader:
+            id = reader.read_string()
+            index = reader.read_string()
+            flags = reader.read_byte()
+            start = json.loads(reader.read_string()) if flags & 0b1 else None
+            end = json.loads(reader.read_string()) if flags & 0b10 else None
+            limit = reader.read_int() if flags & 0b100 else None
+        return TableFetchIndexPacket(
+            id=Identifier.from_key(id),
+            index=index,
+            start=start,
+            end=end,
+            limit=limit,
+            backward=bool(flags & 0b1000),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class TableQueryPacket:
+    id: Identifier
+    query: TableQuery
+
+    @classmethod
+    def serialize(cls, item: TableQueryPacket) -> bytes:
+        writer = ByteWriter()
+        writer.write_string(item.id.key())
+        writer.write_string(json.dumps(item.query))
+        return writer.finish()
+
+    @classmethod
+    def deserialize(cls, item: bytes) -> TableQueryPacket:
+        with ByteReader(item) as reader:
+            id = reader.read_string()
+            query = json.loads(reader.read_string())
+        return TableQueryPacket(id=Identifier.from_key(id), query=query)
+
+
+@dataclass(frozen=True, slots=True)
+class TableSearchPacket:
+    id: Identifier
+    query: TableSearchQuery
+
+    @classmethod
+    def serialize(cls, item: TableSearchPacket) -> bytes:
+        writer = ByteWriter()
+        writer.write_string(item.id.key())
+        writer.write_string(json.dumps(item.query))
+        return writer.finish()
+
+    @classmethod
+    def deserialize(cls, item: bytes) -> TableSearchPacket:
+        with ByteReader(item) as reader:
+            id = reader.read_string()
+            query = json.loads(reader.read_string())
+        return TableSearchPacket(id=Identifier.from_key(id), query=query)
+
+
+@dataclass(frozen=True, slots=True)
+class TableDumpPacket:
+    id: Identifier
+    dump: TableDump
+
+    @classmethod
+    def serialize(cls, item: TableDumpPacket) -> bytes:
+        writer = ByteWriter()
+        writer.write_string(item.id.key())
+        writer.write_string(json.dumps(item.dump))
+        return writer.finish()
+
+    @classmethod
+    def deserialize(cls, item: bytes) -> TableDumpPacket:
+        with ByteReader(item) as reader:
+            id = reader.read_string()
+            dump = json.loads(reader.read_string())
+        return TableDumpPacket(id=Identifier.from_key(id), dump=dump)
+
+
+@dataclass(frozen=True, slots=True)
+class TableRestorePacket:
+    id: Identifier
+    restore: TableRestore
+
+    @classmethod
+    def serialize(cls, item: TableRestorePacket) -> bytes:
+        writer = ByteWriter()
+        writer.write_string(item.id.key())
+        writer.write_string(json.dumps(item.restore))
+        return writer.finish()
+
+    @classmethod
+    def deserialize(cls, item: bytes) -> TableRestorePacket:
+        with ByteReader(item) as reader:
+            id = reader.read_string()
+            restore = json.loads(reader.read_string())
+        return TableRestorePacket(id=Identifier.from_key(id), restore=restore)
+
+
+@dataclass(frozen=True, slots=True)
+class TableChangesSincePacket:
+    id: Identifier
+    offset: int | None
+    consumer: str | None
+    limit: int
+
+    @classmethod
+    def serialize(cls, item: TableChangesSincePacket) -> bytes:
+        writer = ByteWriter()
+        writer.write_string(item.id.key())
+        writer.write_boolean(item.offset is not None)
+        if item.offset is not None:
+            writer.write_big_int(item.offset)
+        writer.write_boolean(item.consumer is not None)
+        if item.consumer is not None:
+            writer.write_string(item.consumer)
+        writer.write_int(item.limit)
+        return writer.finish()
+
+    @classmethod
+    def deserialize(cls, item: bytes) -> TableChangesSincePacket:
+        with ByteReader(item) as reader:
+            id = reader.read_string()
+            offset = reader.read_big_int() if reader.read_boolean() else None
+            consumer = reader.read_string() if reader.read_boolean() else None
+            limit = reader.read_int()
+        return TableChangesSincePacket(
+            id=Identifier.from_key(id),
+            offset=offset,
+            consumer=consumer,
+            limit=limit,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class TableChangesPacket:
+    id: Identifier
+    changes: Sequence[TableChange[bytes]]
+    offset: int
+
+    @classmethod
+    def serialize(cls, item: TableChangesPacket) -> bytes:
+        writer = ByteWriter()
+        writer.write_string(item.id.key())
+        writer.write_int(len(item.changes))
+        for change in item.changes:
+            writer.write_big_int(change.offset)
+            writer.write_string(change.type)
+            writer.write_string(change.key or "")
+            writer.write_boolean(change.item is not None)
+            if change.item is not None:
+                writer.write_byte_array(change.item)
+        writer.write_big_int(item.offset)
+        return writer.finish()
+
+    @classmethod
+    def deserialize(cls, item: bytes) -> TableChangesPacket:
+        with ByteReader(item) as reader:
+            id = reader.read_string()
+            change_count = reader.read_int()
+            changes: list[TableChange[bytes]] = []
+            for _ in range(change_count):
+                offset = reader.read_big_int()
+                type: TableChangeType = reader.read_string()  # type: ignore
+                key = reader.read_string() or None
+                value = reader.read_byte_array() if reader.read_boolean() else None
+                changes.append(TableChange(offset, type, key, value))
+            offset = reader.read_big_int()
+        return TableChangesPacket(
+            id=Identifier.from_key(id),
+            changes=changes,
+            offset=offset,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class TableBatchPacket:
+    writes: Sequence[TableWrite]
+
+    @classmethod
+    def serialize(cls, item: TableBatchPacket) -> bytes:
+        writer = ByteWriter()
+        writer.write_int(len(item.writes))
+        for write in item.writes:
+            writer.write_string(write.id.key())
+            writer.write_string(write.type)
+            writer.write_int(len(write.items))
+            for key, value in write.items.items():
+                writer.write_string(key)
+                writer.write_byte_array(value)
+        return writer.finish()
+
+    @classmethod
+    def deserialize(cls, item: bytes) -> TableBatchPacket:
+        with ByteReader(item) as reader:
+            write_count = reader.read_int()
+            writes: list[TableWrite] = []
+            for _ in range(write_count):
+                id = reader.read_string()
+                type: TableWriteType = reader.read_string()  # type: ignore
+                item_count = reader.read_int()
+                items: dict[str, bytes] = {}
+                for _ in range(item_count):
+                    key = reader.read_string()
+                    items[key] = reader.read_byte_array()
+                writes.append(TableWrite(Identifier.from_key(id), type, items))
+        return TableBatchPacket(writes=writes)
+
+
+@dataclass(frozen=True, slots=True)
+class TableOffsetPacket:
+    id: Identifier
+    consumer: str
+    offset: int
+
+    @classmethod
+    def serialize(cls, item: TableOffsetPacket) -> bytes:
+        writer = ByteWriter()
+        writer.write_string(item.id.key())
+        writer.write_string(item.consumer)
+        writer.write_big_int(item.offset)
+        return writer.finish()
+
+    @classmethod
+    def deserialize(cls, item: bytes) -> TableOffsetPacket:
+        with ByteReader(item) as reader:
+            id = reader.read_string()
+            consumer = reader.read_string()
+            offset = reader.read_big_int()
+        return TableOffsetPacket(
+            id=Identifier.from_key(id),
+            consumer=consumer,
+            offset=offset,
+        )
+
+
 @dataclass(frozen=True, slots=True)
 class SetConfigPacket:
     id: Identifier
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+# JSON merge patches (RFC 7396): objects are merged key by key, null removes
+# a key and any other value replaces the target.
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def encode_patch(patch: Any) -> bytes:
+    return json.dumps(patch, ensure_ascii=False).encode("utf-8")
+
+
+def decode_patch(data: bytes) -> Any:
+    return json.loads(data)
+
+
+def apply_patch(item: bytes, patch: bytes) -> bytes:
+    return encode_patch(merge_patch(json.loads(item), decode_patch(patch)))
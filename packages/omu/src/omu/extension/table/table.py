@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 import abc
-from collections.abc import AsyncGenerator, Callable, Mapping
+from collections.abc import AsyncGenerator, Callable, Mapping, Sequence
+from contextlib import AbstractAsyncContextManager
 from dataclasses import dataclass
 from typing import (
+    Any,
+    Literal,
     NotRequired,
     TypedDict,
 )
@@ -14,9 +17,153 @@ from omu.identifier import Identifier
 from omu.interface import Keyable
 from omu.serializer import JsonSerializable, Serializable, Serializer
 
+type IndexValue = str | int | float | bool
+
+
+class TableIndex(TypedDict):
+    path: str
+    exists: NotRequired[bool]
+
+
+type FilterOperator = Literal[
+    "eq", "ne", "lt", "le", "gt", "ge", "prefix", "in", "exists"
+]
+
+
+class TableFilter(TypedDict):
+    path: str
+    op: FilterOperator
+    value: NotRequired[Any]
+
+
+class TableQuery(TypedDict):
+    filters: NotRequired[list[TableFilter]]
+    order_by: NotRequired[str]
+    backward: NotRequired[bool]
+    limit: NotRequired[int]
+    fields: NotRequired[list[str]]
+
+
+type SearchOrder = Literal["rank", "newest"]
+
+
+class TableSearchQuery(TypedDict):
+    text: str
+    filters: NotRequired[list[TableFilter]]
+    order: NotRequired[SearchOrder]
+    limit: NotRequired[int]
+    cursor: NotRequired[str]
+
+
+type TableDumpFormat = Literal["binary", "ndjson"]
+
+
+class TableDump(TypedDict):
+    file: str  # file name in the server's table dump directory
+    format: NotRequired[TableDumpFormat]
+
+
+class TableRestore(TableDump):
+    replace: NotRequired[bool]  # clear the table first
+    # Send one add event per written chunk, or none at all
+    notify: NotRequired[bool]
+
+
+class TableRetention(TypedDict):
+    max_rows: NotRequired[int]
+    max_age: NotRequired[float]  # seconds
+    # Index of ISO 8601 date strings, UTC unless they carry an offset
+    timestamp_index: NotRequired[str]
+    max_rows_per_partition: NotRequired[int]
+    partition_index: NotRequired[str]
+
+
+type TableAdapterType = Literal["sqlite", "log", "memory"]
+
+
+class TableSearch(TypedDict):
+    path: str  # JSON path of the searchable value, e.g. "$.content"
+    # Only index the data of {"type": text_type, "data": "..."} nodes below
+    # path, otherwise every string below path is indexed
+    text_type: NotRequired[str]
+    tokenizer: NotRequired[Literal["trigram", "unicode61"]]
+
+
+class TablePartition(TypedDict):
+    path: str  # JSON path of the partition key, e.g. "$.room_id"
+    max_open: NotRequired[int]  # partitions kept open at once
+
+
+class TableCompression(TypedDict):
+    type: Literal["zlib"]
+    level: NotRequired[int]  # 1-9
+    # Bytes of the dictionary trained from stored items, 0 disables it
+    dictionary_size: NotRequired[int]
+
 
 class TableConfig(TypedDict):
+    adapter: NotRequired[TableAdapterType]
     cache_size: NotRequired[int]
+    indexes: NotRequired[dict[str, TableIndex]]
+    retention: NotRequired[TableRetention]
+    partition: NotRequired[TablePartition]
+    search: NotRequired[TableSearch]
+    # Values are compressed at rest and decompressed when read, not allowed
+    # together with indexes
+    compression: NotRequired[TableCompression]
+    # Seconds to hold updates so that repeated updates of a key are written
+    # and sent once with the latest value
+    update_window: NotRequired[float]
+    # Seconds to wait for each proxy before passing added items on without it
+    proxy_timeout: NotRequired[float]
+    # Added batches passing through the proxies at once
+    proxy_window: NotRequired[int]
+
+
+@dataclass(frozen=True, slots=True)
+class TablePage[T]:
+    items: Mapping[str, T]
+    cursor: str | None
+
+
+@dataclass(frozen=True, slots=True)
+class TableCacheChange[T]:
+    inserted: Mapping[str, T]
+    updated: Mapping[str, T]
+    # Removed, evicted or cleared items
+    removed: Mapping[str, T]
+
+    @property
+    def empty(self) -> bool:
+        return not (self.inserted or self.updated or self.removed)
+
+
+type TableChangeType = Literal["add", "update", "remove", "clear"]
+# Patches are recorded as updates of the merged item
+type TableWriteType = TableChangeType | Literal["patch"]
+
+
+@dataclass(frozen=True, slots=True)
+class TableChange[T]:
+    offset: int
+    type: TableChangeType
+    key: str | None
+    # Current value of the key, None for remove and clear
+    item: T | None
+
+
+@dataclass(frozen=True, slots=True)
+class TableWrite:
+    id: Identifier
+    type: TableWriteType
+    # Serialized items or merge patches, only the keys are used by remove
+    items: Mapping[str, bytes]
+
+
+@dataclass(frozen=True, slots=True)
+class TableChanges[T]:
+    changes: list[TableChange[T]]
+    offset: int
 
 
 class Table[T](abc.ABC):
@@ -27,6 +174,10 @@ class Table[T](abc.ABC):
     @abc.abstractmethod
     def set_cache_size(self, size: int) -> None: ...
 
+    # Keys that were not found are remembered for ttl seconds, None disables
+    @abc.abstractmethod
+    def set_miss_ttl(self, ttl: float | None) -> None: ...
+
     @abc.abstractmethod
     async def get(self, key: str) -> T | None: ...
 
@@ -42,9 +193,19 @@ class Table[T](abc.ABC):
     @abc.abstractmethod
     async def remove(self, *items: T) -> None: ...
 
+    # JSON merge patches of items by key, patches of missing items are ignored
+    @abc.abstractmethod
+    async def patch(self, patches: Mapping[str, Any]) -> None: ...
+
+    @abc.abstractmethod
+    async def remove_keys(self, *keys: str) -> None: ...
+
     @abc.abstractmethod
     async def clear(self) -> None: ...
 
+    @abc.abstractmethod
+    def batch(self) -> AbstractAsyncContextManager[None]: ...
+
     @abc.abstractmethod
     async def fetch_items(
         self,
@@ -53,14 +214,51 @@ class Table[T](abc.ABC):
         cursor: str | None = None,
     ) -> Mapping[str, T]: ...
 
+    @abc.abstractmethod
+    async def fetch_page(
+        self,
+        limit: int,
+        backward: bool = True,
+        cursor: str | None = None,
+    ) -> TablePage[T]: ...
+
     @abc.abstractmethod
     async def fetch_range(self, start: str, end: str) -> dict[str, T]: ...
 
+    @abc.abstractmethod
+    async def fetch_by_index(
+        self,
+        index: str,
+        value: IndexValue | None = None,
+        *,
+        start: IndexValue | None = None,
+        end: IndexValue | None = None,
+        limit: int | None = None,
+        backward: bool = False,
+    ) -> dict[str, T]: ...
+
+    @abc.abstractmethod
+    async def query(self, query: TableQuery) -> dict[str, T]: ...
+
+    @abc.abstractmethod
+    async def query_fields(
+        self, query: TableQuery, *fields: str
+    ) -> dict[str, dict[str, Any]]: ...
+
+    @abc.abstractmethod
+    async def search(self, query: TableSearchQuery) -> TablePage[T]: ...
+
     @abc.abstractmethod
     async def fetch_all(self) -> dict[str, T]: ...
 
     @abc.abstractmethod
-    async def iterate(
+    async def dump(self, dump: TableDump) -> int: ...
+
+    @abc.abstractmethod
+    async def restore(self, restore: TableRestore) -> int: ...
+
+    @abc.abstractmethod
+    def iterate(
         self,
         backward: bool = False,
         cursor: str | None = None,
@@ -69,13 +267,35 @@ class Table[T](abc.ABC):
     @abc.abstractmethod
     async def size(self) -> int: ...
 
+    @abc.abstractmethod
+    async def fetch_changes(
+        self,
+        offset: int | None = None,
+        *,
+        consumer: str | None = None,
+        limit: int = 100,
+    ) -> TableChanges[T]: ...
+
+    @abc.abstractmethod
+    async def commit_offset(self, consumer: str, offset: int) -> None: ...
+
     @abc.abstractmethod
     def listen(
-        self, listener: AsyncCallback[Mapping[str, T]] | None = None
+        self,
+        listener: AsyncCallback[Mapping[str, T]] | None = None,
+        removed_values: bool = False,
+        patches: bool = False,
+    ) -> Unlisten: ...
+
+    @abc.abstractmethod
+    def proxy(
+        self, callback: Coro[[T], T | None], concurrency: int = 1
     ) -> Unlisten: ...
 
     @abc.abstractmethod
-    def proxy(self, callback: Coro[[T], T | None]) -> Unlisten: ...
+    def proxy_batch(
+        self, callback: Coro[[list[T]], Sequence[T | None]]
+    ) -> Unlisten: ...
 
     @abc.abstractmethod
     def set_config(self, config: TableConfig) -> None: ...
@@ -95,6 +315,15 @@ class TableEvents[T]:
         def listen():
             self.unlisten = table.listen()
 
+        def listen_values():
+            # Removed items are only sent to listeners of remove
+            self.unlisten = table.listen(removed_values=True)
+
+        def listen_patches():
+            # Patched items are then sent as patches, update is still
+            # emitted with the merged items
+            self.unlisten = table.listen(patches=True)
+
         def unlisten():
             if self.unlisten:
                 self.unlisten()
@@ -106,14 +335,23 @@ class TableEvents[T]:
             on_subscribe=listen, on_empty=unlisten
         )
         self.remove: EventEmitter[Mapping[str, T]] = EventEmitter(
+            on_subscribe=listen_values, on_empty=unlisten
+        )
+        self.remove_keys: EventEmitter[Sequence[str]] = EventEmitter(
             on_subscribe=listen, on_empty=unlisten
         )
+        self.patch: EventEmitter[Mapping[str, Any]] = EventEmitter(
+            on_subscribe=listen_patches, on_empty=unlisten
+        )
         self.clear: EventEmitter[[]] = EventEmitter(
             on_subscribe=listen, on_empty=unlisten
         )
         self.cache_update: EventEmitter[Mapping[str, T]] = EventEmitter(
             on_subscribe=listen, on_empty=unlisten
         )
+        self.cache_change: EventEmitter[TableCacheChange[T]] = EventEmitter(
+            on_subscribe=listen, on_empty=unlisten
+        )
 
 
 type ModelEntry[T: Keyable, D] = JsonSerializable[T, D]
@@ -134,6 +372,11 @@ class TableType[T]:
     serializer: Serializable[T, bytes]
     key_function: Callable[[T], str]
     permissions: TablePermissions | None = None
+    indexes: Mapping[str, TableIndex] | None = None
+    adapter: TableAdapterType | None = None
+    partition: TablePartition | None = None
+    search: TableSearch | None = None
+    update_window: float | None = None
 
     @classmethod
     def create_model[_T: Keyable, _D](
@@ -142,12 +385,22 @@ class TableType[T]:
         name: str,
         model_type: type[ModelEntry[_T, _D]],
         permissions: TablePermissions | None = None,
+        indexes: Mapping[str, TableIndex] | None = None,
+        adapter: TableAdapterType | None = None,
+        partition: TablePartition | None = None,
+        search: TableSearch | None = None,
+        update_window: float | None = None,
     ) -> TableType[_T]:
         return TableType(
             id=identifier / name,
             serializer=Serializer.model(model_type).to_json(),
             key_function=lambda item: item.key(),
             permissions=permissions,
+            indexes=indexes,
+            adapter=adapter,
+            partition=partition,
+            search=search,
+            update_window=update_window,
         )
 
     @classmethod
@@ -157,10 +410,20 @@ class TableType[T]:
         name: str,
         serializer: Serializable[_T, bytes],
         permissions: TablePermissions | None = None,
+        indexes: Mapping[str, TableIndex] | None = None,
+        adapter: TableAdapterType | None = None,
+        partition: TablePartition | None = None,
+        search: TableSearch | None = None,
+        update_window: float | None = None,
     ) -> TableType[_T]:
         return TableType(
             id=identifier / name,
             serializer=serializer,
             key_function=lambda item: item.key(),
             permissions=permissions,
+            indexes=indexes,
+            adapter=adapter,
+            partition=partition,
+            search=search,
+            update_window=update_window,
         )
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Iterator, Mapping
+
+from .table import TableCacheChange
+
+# Client tables keep this many items unless the config sets cache_size
+DEFAULT_CACHE_SIZE = 1000
+
+
+class TableCache[T](Mapping[str, T]):
+    # Ordered by last write, the oldest items are evicted first
+    def __init__(self, size: int | None = None) -> None:
+        self._items: OrderedDict[str, T] = OrderedDict()
+        self._size = size
+
+    @property
+    def size(self) -> int | None:
+        return self._size
+
+    def set_size(self, size: int | None) -> TableCacheChange[T]:
+        self._size = size
+        return TableCacheChange(inserted={}, updated={}, removed=self._evict())
+
+    def update(self, items: Mapping[str, T]) -> TableCacheChange[T]:
+        inserted: dict[str, T] = {}
+        updated: dict[str, T] = {}
+        for key, item in items.items():
+            if key in self._items:
+                updated[key] = item
+                self._items.move_to_end(key)
+            else:
+                inserted[key] = item
+            self._items[key] = item
+        removed = self._evict()
+        for key in tuple(removed):
+            # Items that were inserted and evicted by the same update were
+            # never visible to listeners
+            if inserted.pop(key, None) is not None:
+                del removed[key]
+            updated.pop(key, None)
+        return TableCacheChange(inserted=inserted, updated=updated, removed=removed)
+
+    def remove(self, keys: list[str]) -> TableCacheChange[T]:
+        removed: dict[str, T] = {}
+        for key in keys:
+            if key in self._items:
+                removed[key] = self._items.pop(key)
+        return TableCacheChange(inserted={}, updated={}, removed=removed)
+
+    def clear(self) -> TableCacheChange[T]:
+        removed = dict(self._items)
+        self._items.clear()
+        return TableCacheChange(inserted={}, updated={}, removed=removed)
+
+    def _evict(self) -> dict[str, T]:
+        evicted: dict[str, T] = {}
+        if self._size is None:
+            return evicted
+        while len(self._items) > max(self._size, 0):
+            key, item = self._items.popitem(last=False)
+            evicted[key] = item
+        return evicted
+
+    def __getitem__(self, key: str) -> T:
+        return self._items[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._items
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
@@ -1,12 +1,18 @@
 from __future__ import annotations
 
-from collections.abc import AsyncGenerator, Iterable, Mapping
+import asyncio
+import json
+import time
+from collections.abc import AsyncGenerator, Iterable, Mapping, Sequence
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from contextvars import ContextVar
+from typing import Any
 
 from omu.client import Client
 from omu.event_emitter import Unlisten
 from omu.extension import Extension, ExtensionType
 from omu.extension.endpoint.endpoint import EndpointType
-from omu.helper import AsyncCallback, Coro
+from omu.helper import AsyncCallback, Coro, map_optional
 from omu.identifier import Identifier
 from omu.interface import Keyable
 from omu.network.packet.packet import PacketType
@@ -15,20 +21,45 @@ from omu.serializer import JsonSerializable, Serializer
 from .packets import (
     SetConfigPacket,
     SetPermissionPacket,
+    TableBatchPacket,
+    TableChangesPacket,
+    TableChangesSincePacket,
+    TableDumpPacket,
+    TableFetchIndexPacket,
     TableFetchPacket,
+    TableFetchPagePacket,
     TableFetchRangePacket,
     TableItemsPacket,
     TableKeysPacket,
+    TableOffsetPacket,
     TablePacket,
+    TablePagePacket,
     TableProxyPacket,
+    TableQueryPacket,
+    TableRestorePacket,
+    TableSearchPacket,
 )
+from .patch import apply_patch, decode_patch, encode_patch
 from .table import (
+    IndexValue,
     Table,
+    TableAdapterType,
+    TableCacheChange,
+    TableChange,
+    TableChanges,
     TableConfig,
+    TableDump,
     TableEvents,
+    TablePage,
     TablePermissions,
+    TableQuery,
+    TableRestore,
+    TableSearchQuery,
     TableType,
+    TableWrite,
+    TableWriteType,
 )
+from .table_cache import DEFAULT_CACHE_SIZE, TableCache
 
 type ModelType[T: Keyable, D] = JsonSerializable[T, D]
 
@@ -41,14 +72,23 @@ class TableExtension(Extension):
             TABLE_SET_PERMISSION_PACKET,
             TABLE_SET_CONFIG_PACKET,
             TABLE_LISTEN_PACKET,
+            TABLE_LISTEN_KEYS_PACKET,
+            TABLE_LISTEN_PATCHES_PACKET,
             TABLE_PROXY_LISTEN_PACKET,
             TABLE_PROXY_PACKET,
             TABLE_ITEM_ADD_PACKET,
             TABLE_ITEM_UPDATE_PACKET,
+            TABLE_ITEM_PATCH_PACKET,
             TABLE_ITEM_REMOVE_PACKET,
+            TABLE_ITEM_REMOVE_KEYS_PACKET,
             TABLE_ITEM_CLEAR_PACKET,
+            TABLE_BATCH_PACKET,
         )
 
+    def batch(self) -> AbstractAsyncContextManager[None]:
+        # Writes to any table inside are sent as one packet on exit
+        return write_batch(self._client, None)
+
     def create[T](
         self,
         table_type: TableType[T],
@@ -80,6 +120,9 @@ class TableExtension(Extension):
     def has(self, id: Identifier) -> bool:
         return id in self._tables
 
+    def find(self, id: Identifier) -> Table | None:
+        return self._tables.get(id)
+
 
 TABLE_EXTENSION_TYPE = ExtensionType(
     "table", lambda client: TableExtension(client), lambda: []
@@ -102,6 +145,18 @@ TABLE_LISTEN_PACKET = PacketType[Identifier].create_json(
     "listen",
     serializer=Serializer.model(Identifier),
 )
+# Like listen, with removals sent as keys only
+TABLE_LISTEN_KEYS_PACKET = PacketType[Identifier].create_json(
+    TABLE_EXTENSION_TYPE,
+    "listen_keys",
+    serializer=Serializer.model(Identifier),
+)
+# Patched items are sent as their patches instead of the merged items
+TABLE_LISTEN_PATCHES_PACKET = PacketType[Identifier].create_json(
+    TABLE_EXTENSION_TYPE,
+    "listen_patches",
+    serializer=Serializer.model(Identifier),
+)
 TABLE_PROXY_LISTEN_PACKET = PacketType[Identifier].create_json(
     TABLE_EXTENSION_TYPE,
     "proxy_listen",
@@ -127,6 +182,16 @@ TABLE_ITEM_REMOVE_PACKET = PacketType[TableItemsPacket].create(
     "item_remove",
     TableItemsPacket,
 )
+TABLE_ITEM_PATCH_PACKET = PacketType[TableItemsPacket].create(
+    TABLE_EXTENSION_TYPE,
+    "item_patch",
+    TableItemsPacket,
+)
+TABLE_ITEM_REMOVE_KEYS_PACKET = PacketType[TableKeysPacket].create(
+    TABLE_EXTENSION_TYPE,
+    "item_remove_keys",
+    TableKeysPacket,
+)
 TABLE_ITEM_GET_ENDPOINT = EndpointType[
     TableKeysPacket, TableItemsPacket
 ].create_serialized(
@@ -145,6 +210,15 @@ TABLE_FETCH_ENDPOINT = EndpointType[
     response_serializer=TableItemsPacket,
     permission_id=TABLE_PERMISSION_ID,
 )
+TABLE_FETCH_PAGE_ENDPOINT = EndpointType[
+    TableFetchPagePacket, TablePagePacket
+].create_serialized(
+    TABLE_EXTENSION_TYPE,
+    "fetch_page",
+    request_serializer=TableFetchPagePacket,
+    response_serializer=TablePagePacket,
+    permission_id=TABLE_PERMISSION_ID,
+)
 TABLE_FETCH_RANGE_ENDPOINT = EndpointType[
     TableFetchRangePacket, TableItemsPacket
 ].create_serialized(
@@ -154,6 +228,33 @@ TABLE_FETCH_RANGE_ENDPOINT = EndpointType[
     response_serializer=TableItemsPacket,
     permission_id=TABLE_PERMISSION_ID,
 )
+TABLE_FETCH_BY_INDEX_ENDPOINT = EndpointType[
+    TableFetchIndexPacket, TableItemsPacket
+].create_serialized(
+    TABLE_EXTENSION_TYPE,
+    "fetch_by_index",
+    request_serializer=TableFetchIndexPacket,
+    response_serializer=TableItemsPacket,
+    permission_id=TABLE_PERMISSION_ID,
+)
+TABLE_QUERY_ENDPOINT = EndpointType[
+    TableQueryPacket, TableItemsPacket
+].create_serialized(
+    TABLE_EXTENSION_TYPE,
+    "query",
+    request_serializer=TableQueryPacket,
+    response_serializer=TableItemsPacket,
+    permission_id=TABLE_PERMISSION_ID,
+)
+TABLE_SEARCH_ENDPOINT = EndpointType[
+    TableSearchPacket, TablePagePacket
+].create_serialized(
+    TABLE_EXTENSION_TYPE,
+    "search",
+    request_serializer=TableSearchPacket,
+    response_serializer=TablePagePacket,
+    permission_id=TABLE_PERMISSION_ID,
+)
 TABLE_FETCH_ALL_ENDPOINT = EndpointType[
     TablePacket, TableItemsPacket
 ].create_serialized(
@@ -170,11 +271,135 @@ TABLE_SIZE_ENDPOINT = EndpointType[TablePacket, int].create_serialized(
     response_serializer=Serializer.json(),
     permission_id=TABLE_PERMISSION_ID,
 )
+TABLE_CHANGES_SINCE_ENDPOINT = EndpointType[
+    TableChangesSincePacket, TableChangesPacket
+].create_serialized(
+    TABLE_EXTENSION_TYPE,
+    "changes_since",
+    request_serializer=TableChangesSincePacket,
+    response_serializer=TableChangesPacket,
+    permission_id=TABLE_PERMISSION_ID,
+)
+TABLE_COMMIT_OFFSET_ENDPOINT = EndpointType[TableOffsetPacket, None].create_serialized(
+    TABLE_EXTENSION_TYPE,
+    "commit_offset",
+    request_serializer=TableOffsetPacket,
+    response_serializer=Serializer.json(),
+    permission_id=TABLE_PERMISSION_ID,
+)
+TABLE_DUMP_ENDPOINT = EndpointType[TableDumpPacket, int].create_serialized(
+    TABLE_EXTENSION_TYPE,
+    "dump",
+    request_serializer=TableDumpPacket,
+    response_serializer=Serializer.json(),
+    permission_id=TABLE_PERMISSION_ID,
+)
+TABLE_RESTORE_ENDPOINT = EndpointType[TableRestorePacket, int].create_serialized(
+    TABLE_EXTENSION_TYPE,
+    "restore",
+    request_serializer=TableRestorePacket,
+    response_serializer=Serializer.json(),
+    permission_id=TABLE_PERMISSION_ID,
+)
 TABLE_ITEM_CLEAR_PACKET = PacketType[TablePacket].create(
     TABLE_EXTENSION_TYPE,
     "clear",
     TablePacket,
 )
+TABLE_BATCH_PACKET = PacketType[TableBatchPacket].create(
+    TABLE_EXTENSION_TYPE,
+    "batch",
+    TableBatchPacket,
+)
+
+
+class TableBatch:
+    def __init__(self, tables: set[Identifier] | None) -> None:
+        self.tables = tables
+        self.writes: list[TableWrite] = []
+        self.closed = False
+
+    def accepts(self, id: Identifier) -> bool:
+        if self.closed:
+            return False
+        return self.tables is None or id in self.tables
+
+    def write(self, id: Identifier, type: TableWriteType, items: Mapping[str, bytes]):
+        # Consecutive writes of the same kind to a table are merged, except
+        # patches of the same item which have to be applied one after another
+        last = self.writes[-1] if self.writes else None
+        if (
+            last is not None
+            and last.id == id
+            and last.type == type
+            and type != "clear"
+            and not (type == "patch" and last.items.keys() & items.keys())
+        ):
+            self.writes[-1] = TableWrite(id, type, {**last.items, **items})
+            return
+        self.writes.append(TableWrite(id, type, items))
+
+
+TABLE_BATCH = ContextVar[TableBatch | None]("table_batch", default=None)
+
+
+@asynccontextmanager
+async def write_batch(
+    client: Client, tables: set[Identifier] | None
+) -> AsyncGenerator[None, None]:
+    if TABLE_BATCH.get() is not None:
+        # Nested batches are part of the outer one
+        yield
+        return
+    batch = TableBatch(tables)
+    token = TABLE_BATCH.set(batch)
+    try:
+        yield
+    finally:
+        # Tasks started inside keep the batch in their context
+        batch.closed = True
+        TABLE_BATCH.reset(token)
+    if batch.writes:
+        await client.send(TABLE_BATCH_PACKET, TableBatchPacket(writes=batch.writes))
+
+
+def batch_proxy[T](
+    callback: Coro[[T], T | None], concurrency: int
+) -> Coro[[list[T]], list[T | None]]:
+    # Items are passed one at a time unless concurrency allows more
+    async def proxy_batch(items: list[T]) -> list[T | None]:
+        if concurrency <= 1:
+            return [await callback(item) for item in items]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(item: T) -> T | None:
+            async with semaphore:
+                return await callback(item)
+
+        return await asyncio.gather(*(run(item) for item in items))
+
+    return proxy_batch
+
+
+async def run_proxies[T](
+    proxies: Iterable[Coro[[list[T]], Sequence[T | None]]], items: dict[str, T]
+) -> dict[str, T]:
+    for proxy in proxies:
+        if not items:
+            break
+        keys = list(items)
+        results = await proxy(list(items.values()))
+        if len(results) != len(keys):
+            raise ValueError(
+                f"Proxy returned {len(results)} items for {len(keys)} items"
+            )
+        # None drops the item, keys stay those of the added items
+        items = {
+            key: item
+            for key, item in zip(keys, results, strict=True)
+            if item is not None
+        }
+    return items
 
 
 class TableImpl[T](Table[T]):
@@ -187,14 +412,24 @@ class TableImpl[T](Table[T]):
         self._id = table_type.id
         self._serializer = table_type.serializer
         self._key_function = table_type.key_function
-        self._cache: dict[str, T] = {}
+        self._cache = TableCache[T](DEFAULT_CACHE_SIZE)
         self._event = TableEvents[T](self)
-        self._proxies: list[Coro[[T], T | None]] = []
+        self._proxies: list[Coro[[list[T]], Sequence[T | None]]] = []
         self._chunk_size = 100
-        self._cache_size: int | None = None
         self._listening = False
+        self._removed_values = False
+        self._patches = False
         self._config: TableConfig | None = None
         self._permissions: TablePermissions | None = table_type.permissions
+        self._indexes = table_type.indexes
+        self._adapter: TableAdapterType | None = table_type.adapter
+        self._partition = table_type.partition
+        self._search = table_type.search
+        self._update_window = table_type.update_window
+        # Lookups made within one loop iteration are sent as one request
+        self._pending_gets: dict[str, asyncio.Future[T | None]] = {}
+        self._miss_ttl: float | None = None
+        self._misses: dict[str, float] = {}
 
         client.network.add_packet_handler(
             TABLE_PROXY_PACKET,
@@ -212,6 +447,14 @@ class TableImpl[T](Table[T]):
             TABLE_ITEM_REMOVE_PACKET,
             self._on_item_remove,
         )
+        client.network.add_packet_handler(
+            TABLE_ITEM_PATCH_PACKET,
+            self._on_item_patch,
+        )
+        client.network.add_packet_handler(
+            TABLE_ITEM_REMOVE_KEYS_PACKET,
+            self._on_item_remove_keys,
+        )
         client.network.add_packet_handler(
             TABLE_ITEM_CLEAR_PACKET,
             self._on_item_clear,
@@ -222,47 +465,117 @@ class TableImpl[T](Table[T]):
     def cache(self) -> Mapping[str, T]:
         return self._cache
 
+    def set_miss_ttl(self, ttl: float | None) -> None:
+        self._miss_ttl = ttl
+        if ttl is None:
+            self._misses.clear()
+
+    def _is_miss(self, key: str) -> bool:
+        expires = self._misses.get(key)
+        if expires is None:
+            return False
+        if expires > time.monotonic():
+            return True
+        del self._misses[key]
+        return False
+
+    def _forget_misses(self, keys: Iterable[str]) -> None:
+        if not self._misses:
+            return
+        for key in keys:
+            self._misses.pop(key, None)
+
     async def get(self, key: str) -> T | None:
         if key in self._cache:
             return self._cache[key]
-        res = await self._client.endpoints.call(
-            TABLE_ITEM_GET_ENDPOINT, TableKeysPacket(id=self._id, keys=[key])
-        )
-        items = self._parse_items(res.items)
-        self._cache.update(items)
-        if key in items:
-            return items[key]
-        return None
+        if self._is_miss(key):
+            return None
+        future = self._pending_gets.get(key)
+        if future is None:
+            if not self._pending_gets:
+                self._client.loop.call_soon(self._flush_gets)
+            future = self._client.loop.create_future()
+            self._pending_gets[key] = future
+        return await asyncio.shield(future)
+
+    def _flush_gets(self) -> None:
+        pending = self._pending_gets
+        self._pending_gets = {}
+        self._client.loop.create_task(self._fetch_gets(pending))
+
+    async def _fetch_gets(self, pending: dict[str, asyncio.Future[T | None]]) -> None:
+        try:
+            items = await self.get_many(*pending)
+        except Exception as e:
+            for future in pending.values():
+                future.set_exception(e)
+            return
+        expires = time.monotonic() + (self._miss_ttl or 0)
+        for key, future in pending.items():
+            item = items.get(key)
+            if item is None and self._miss_ttl is not None:
+                self._misses[key] = expires
+            future.set_result(item)
 
     async def get_many(self, *keys: str) -> dict[str, T]:
         res = await self._client.endpoints.call(
             TABLE_ITEM_GET_ENDPOINT, TableKeysPacket(id=self._id, keys=keys)
         )
         items = self._parse_items(res.items)
-        self._cache.update(items)
+        await self.update_cache(items)
         return items
 
+    def _write_batch(self, type: TableWriteType, items: Mapping[str, bytes]) -> bool:
+        batch = TABLE_BATCH.get()
+        if batch is None or not batch.accepts(self._id):
+            return False
+        batch.write(self._id, type, items)
+        return True
+
     async def add(self, *items: T) -> None:
         data = self._serialize_items(items)
+        self._forget_misses(data)
+        if self._write_batch("add", data):
+            return
         await self._client.send(
             TABLE_ITEM_ADD_PACKET, TableItemsPacket(id=self._id, items=data)
         )
 
     async def update(self, *items: T) -> None:
         data = self._serialize_items(items)
+        self._forget_misses(data)
+        if self._write_batch("update", data):
+            return
         await self._client.send(
             TABLE_ITEM_UPDATE_PACKET, TableItemsPacket(id=self._id, items=data)
         )
 
+    async def patch(self, patches: Mapping[str, Any]) -> None:
+        data = {key: encode_patch(patch) for key, patch in patches.items()}
+        if self._write_batch("patch", data):
+            return
+        await self._client.send(
+            TABLE_ITEM_PATCH_PACKET, TableItemsPacket(id=self._id, items=data)
+        )
+
     async def remove(self, *items: T) -> None:
-        data = self._serialize_items(items)
+        await self.remove_keys(*map(self._key_function, items))
+
+    async def remove_keys(self, *keys: str) -> None:
+        if self._write_batch("remove", dict.fromkeys(keys, b"")):
+            return
         await self._client.send(
-            TABLE_ITEM_REMOVE_PACKET, TableItemsPacket(id=self._id, items=data)
+            TABLE_ITEM_REMOVE_KEYS_PACKET, TableKeysPacket(id=self._id, keys=keys)
         )
 
     async def clear(self) -> None:
+        if self._write_batch("clear", {}):
+            return
         await self._client.send(TABLE_ITEM_CLEAR_PACKET, TablePacket(id=self._id))
 
+    def batch(self) -> AbstractAsyncContextManager[None]:
+        return write_batch(self._client, {self._id})
+
     async def fetch_items(
         self,
         before: int | None = None,
@@ -277,6 +590,25 @@ class TableImpl[T](Table[T]):
         await self.update_cache(items)
         return items
 
+    async def fetch_page(
+        self,
+        limit: int,
+        backward: bool = True,
+        cursor: str | None = None,
+    ) -> TablePage[T]:
+        page_response = await self._client.endpoints.call(
+            TABLE_FETCH_PAGE_ENDPOINT,
+            TableFetchPagePacket(
+                id=self._id,
+                limit=limit,
+                backward=backward,
+                cursor=cursor,
+            ),
+        )
+        items = self._parse_items(page_response.items)
+        await self.update_cache(items)
+        return TablePage(items=items, cursor=page_response.cursor)
+
     async def fetch_range(self, start: str, end: str) -> dict[str, T]:
         items_response = await self._client.endpoints.call(
             TABLE_FETCH_RANGE_ENDPOINT,
@@ -286,6 +618,62 @@ class TableImpl[T](Table[T]):
         await self.update_cache(items)
         return items
 
+    async def fetch_by_index(
+        self,
+        index: str,
+        value: IndexValue | None = None,
+        *,
+        start: IndexValue | None = None,
+        end: IndexValue | None = None,
+        limit: int | None = None,
+        backward: bool = False,
+    ) -> dict[str, T]:
+        if value is not None:
+            start = end = value
+        items_response = await self._client.endpoints.call(
+            TABLE_FETCH_BY_INDEX_ENDPOINT,
+            TableFetchIndexPacket(
+                id=self._id,
+                index=index,
+                start=start,
+                end=end,
+                limit=limit,
+                backward=backward,
+            ),
+        )
+        items = self._parse_items(items_response.items)
+        await self.update_cache(items)
+        return items
+
+    async def query(self, query: TableQuery) -> dict[str, T]:
+        if "fields" in query:
+            raise ValueError("Use query_fields to project fields")
+        items_response = await self._client.endpoints.call(
+            TABLE_QUERY_ENDPOINT,
+            TableQueryPacket(id=self._id, query=query),
+        )
+        items = self._parse_items(items_response.items)
+        await self.update_cache(items)
+        return items
+
+    async def query_fields(
+        self, query: TableQuery, *fields: str
+    ) -> dict[str, dict[str, Any]]:
+        items_response = await self._client.endpoints.call(
+            TABLE_QUERY_ENDPOINT,
+            TableQueryPacket(id=self._id, query={**query, "fields": [*fields]}),
+        )
+        return {key: json.loads(value) for key, value in items_response.items.items()}
+
+    async def search(self, query: TableSearchQuery) -> TablePage[T]:
+        page_response = await self._client.endpoints.call(
+            TABLE_SEARCH_ENDPOINT,
+            TableSearchPacket(id=self._id, query=query),
+        )
+        items = self._parse_items(page_response.items)
+        await self.update_cache(items)
+        return TablePage(items=items, cursor=page_response.cursor)
+
     async def fetch_all(self) -> dict[str, T]:
         items_response = await self._client.endpoints.call(
             TABLE_FETCH_ALL_ENDPOINT, TablePacket(id=self._id)
@@ -294,28 +682,32 @@ class TableImpl[T](Table[T]):
         await self.update_cache(items)
         return items
 
+    async def dump(self, dump: TableDump) -> int:
+        return await self._client.endpoints.call(
+            TABLE_DUMP_ENDPOINT, TableDumpPacket(id=self._id, dump=dump)
+        )
+
+    async def restore(self, restore: TableRestore) -> int:
+        return await self._client.endpoints.call(
+            TABLE_RESTORE_ENDPOINT, TableRestorePacket(id=self._id, restore=restore)
+        )
+
     async def iterate(
         self,
         backward: bool = False,
         cursor: str | None = None,
     ) -> AsyncGenerator[T, None]:
-        items = await self.fetch_items(
-            before=self._chunk_size if backward else None,
-            after=self._chunk_size if not backward else None,
-            cursor=cursor,
-        )
-        for item in items.values():
-            yield item
-        while len(items) > 0:
-            cursor = next(iter(items.keys()))
-            items = await self.fetch_items(
-                before=self._chunk_size if backward else None,
-                after=self._chunk_size if not backward else None,
+        while True:
+            page = await self.fetch_page(
+                self._chunk_size,
+                backward=backward,
                 cursor=cursor,
             )
-            for item in items.values():
+            for item in page.items.values():
                 yield item
-            items.pop(cursor, None)
+            if page.cursor is None:
+                break
+            cursor = page.cursor
 
     async def size(self) -> int:
         res = await self._client.endpoints.call(
@@ -323,22 +715,73 @@ class TableImpl[T](Table[T]):
         )
         return res
 
+    async def fetch_changes(
+        self,
+        offset: int | None = None,
+        *,
+        consumer: str | None = None,
+        limit: int = 100,
+    ) -> TableChanges[T]:
+        res = await self._client.endpoints.call(
+            TABLE_CHANGES_SINCE_ENDPOINT,
+            TableChangesSincePacket(
+                id=self._id,
+                offset=offset,
+                consumer=consumer,
+                limit=limit,
+            ),
+        )
+        return TableChanges(
+            changes=[
+                TableChange(
+                    offset=change.offset,
+                    type=change.type,
+                    key=change.key,
+                    item=map_optional(change.item, self._serializer.deserialize),
+                )
+                for change in res.changes
+            ],
+            offset=res.offset,
+        )
+
+    async def commit_offset(self, consumer: str, offset: int) -> None:
+        await self._client.endpoints.call(
+            TABLE_COMMIT_OFFSET_ENDPOINT,
+            TableOffsetPacket(id=self._id, consumer=consumer, offset=offset),
+        )
+
     def listen(
-        self, listener: AsyncCallback[Mapping[str, T]] | None = None
+        self,
+        listener: AsyncCallback[Mapping[str, T]] | None = None,
+        removed_values: bool = False,
+        patches: bool = False,
     ) -> Unlisten:
-        if not self._listening:
+        packets: list[PacketType[Identifier]] = []
+        if not self._listening or (removed_values and not self._removed_values):
+            packets.append(
+                TABLE_LISTEN_PACKET if removed_values else TABLE_LISTEN_KEYS_PACKET
+            )
+            self._listening = True
+            self._removed_values |= removed_values
+        if patches and not self._patches:
+            packets.append(TABLE_LISTEN_PATCHES_PACKET)
+            self._patches = True
+        if packets:
 
             async def on_ready():
-                await self._client.send(TABLE_LISTEN_PACKET, self._id)
+                for packet in packets:
+                    await self._client.send(packet, self._id)
 
             self._client.on_ready(on_ready)
-            self._listening = True
 
         if listener is not None:
             return self._event.cache_update.listen(listener)
         return lambda: None
 
-    def proxy(self, callback: Coro[[T], T | None]) -> Unlisten:
+    def proxy(self, callback: Coro[[T], T | None], concurrency: int = 1) -> Unlisten:
+        return self.proxy_batch(batch_proxy(callback, concurrency))
+
+    def proxy_batch(self, callback: Coro[[list[T]], Sequence[T | None]]) -> Unlisten:
         if not self._proxies:
 
             async def listen():
@@ -352,12 +795,26 @@ class TableImpl[T](Table[T]):
         if self._client.running:
             raise ValueError("Cannot set config after client has started")
         self._config = config
+        if "cache_size" in config:
+            self.set_cache_size(config["cache_size"])
 
     async def _on_ready(self) -> None:
-        if self._config is not None:
+        config: TableConfig = {**(self._config or {})}
+        if self._id.is_subpath_of(self._client.app.id):
+            if self._indexes:
+                config["indexes"] = {**self._indexes}
+            if self._adapter is not None:
+                config["adapter"] = self._adapter
+            if self._partition is not None:
+                config["partition"] = {**self._partition}
+            if self._search is not None:
+                config["search"] = {**self._search}
+            if self._update_window is not None:
+                config["update_window"] = self._update_window
+        if self._config is not None or config:
             await self._client.send(
                 TABLE_SET_CONFIG_PACKET,
-                SetConfigPacket(id=self._id, config=self._config),
+                SetConfigPacket(id=self._id, config=config),
             )
         if self._permissions is None:
             return
@@ -378,24 +835,32 @@ class TableImpl[T](Table[T]):
     async def _on_proxy(self, packet: TableProxyPacket) -> None:
         if packet.id != self._id:
             return
-        items = self._parse_items(packet.items)
-        for proxy in self._proxies:
-            for key, item in list(items.items()):
-                updated_item = await proxy(item)
-                if updated_item is None:
-                    del items[key]
-                else:
-                    items[key] = updated_item
-        serialized_items = self._serialize_items(items.values())
+        items = await self.run_proxies(self.decode_items(packet.items))
         await self._client.send(
             TABLE_PROXY_PACKET,
             TableProxyPacket(
                 id=self._id,
                 key=packet.key,
-                items=serialized_items,
+                items=self.encode_items(items),
             ),
         )
 
+    # A server running this client in its own process calls the proxies
+    # directly, decoding once for every in-process proxy in a row
+
+    @property
+    def has_proxies(self) -> bool:
+        return bool(self._proxies)
+
+    def decode_items(self, items: Mapping[str, bytes]) -> dict[str, T]:
+        return self._parse_items(items)
+
+    def encode_items(self, items: Mapping[str, T]) -> Mapping[str, bytes]:
+        return self._serialize_items(items.values())
+
+    async def run_proxies(self, items: dict[str, T]) -> dict[str, T]:
+        return await run_proxies(self._proxies, items)
+
     async def _on_item_add(self, packet: TableItemsPacket) -> None:
         if packet.id != self._id:
             return
@@ -415,26 +880,50 @@ class TableImpl[T](Table[T]):
             return
         items = self._parse_items(packet.items)
         await self._event.remove(items)
-        for key in items.keys():
+        await self._event.remove_keys(list(items))
+        await self._emit_cache_change(self._cache.remove(list(items.keys())))
+
+    async def _on_item_patch(self, packet: TableItemsPacket) -> None:
+        if packet.id != self._id:
+            return
+        patches = {key: decode_patch(patch) for key, patch in packet.items.items()}
+        await self._event.patch(patches)
+        merged: dict[str, T] = {}
+        missing: list[str] = []
+        for key, patch in packet.items.items():
             if key not in self._cache:
+                missing.append(key)
                 continue
-            del self._cache[key]
-        await self._event.cache_update(self._cache)
+            item = self._serializer.serialize(self._cache[key])
+            merged[key] = self._serializer.deserialize(apply_patch(item, patch))
+        fetched: dict[str, T] = {}
+        if missing and not self._event.update.empty:
+            # Items that are not cached are read as they are after the patch
+            fetched = await self.get_many(*missing)
+        if merged or fetched:
+            await self._event.update({**merged, **fetched})
+        if merged:
+            await self.update_cache(merged)
+
+    async def _on_item_remove_keys(self, packet: TableKeysPacket) -> None:
+        if packet.id != self._id:
+            return
+        await self._event.remove_keys(packet.keys)
+        await self._emit_cache_change(self._cache.remove(list(packet.keys)))
 
     async def _on_item_clear(self, packet: TablePacket) -> None:
         if packet.id != self._id:
             return
         await self._event.clear()
-        self._cache.clear()
-        await self._event.cache_update(self._cache)
+        await self._emit_cache_change(self._cache.clear())
 
     async def update_cache(self, items: Mapping[str, T]) -> None:
-        if self._cache_size is None:
-            self._cache = {**items}
-        else:
-            merged_cache = {**self._cache, **items}
-            cache_array = tuple(merged_cache.items())
-            self._cache = dict(cache_array[: self._cache_size])
+        self._forget_misses(items)
+        await self._emit_cache_change(self._cache.update(items))
+
+    async def _emit_cache_change(self, change: TableCacheChange[T]) -> None:
+        if not change.empty:
+            await self._event.cache_change(change)
         await self._event.cache_update(self._cache)
 
     def _parse_items(self, items: Mapping[str, bytes]) -> dict[str, T]:
@@ -454,7 +943,9 @@ class TableImpl[T](Table[T]):
         return serialized_items
 
     def set_cache_size(self, size: int | None) -> None:
-        self._cache_size = size
+        change = self._cache.set_size(size)
+        if not change.empty:
+            self._client.loop.create_task(self._emit_cache_change(change))
 
     @property
     def event(self) -> TableEvents[T]:
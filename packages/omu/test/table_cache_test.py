@@ -0,0 +1,40 @@
+from collections.abc import Callable
+
+from omu.extension.table.table_cache import DEFAULT_CACHE_SIZE, TableCache
+from omu.extension.table.table_extension import TableImpl
+
+
+def test_eviction():
+    cache = TableCache[int](3)
+    cache.update({"a": 1, "b": 2, "c": 3})
+    change = cache.update({"a": 10, "d": 4})
+    # Writing a key makes it the newest, so b is the oldest
+    assert list(cache) == ["c", "a", "d"]
+    assert change.inserted == {"d": 4}
+    assert change.updated == {"a": 10}
+    assert change.removed == {"b": 2}
+
+    change = cache.update({"e": 5, "f": 6, "g": 7, "h": 8})
+    # Items inserted and evicted by one update are never reported
+    assert change.inserted == {"f": 6, "g": 7, "h": 8}
+    assert change.removed == {"c": 3, "a": 10, "d": 4}
+    assert list(cache) == ["f", "g", "h"]
+
+
+def test_set_size():
+    cache = TableCache[int](None)
+    cache.update({str(i): i for i in range(5)})
+    assert len(cache) == 5
+    change = cache.set_size(2)
+    assert change.removed == {"0": 0, "1": 1, "2": 2}
+    assert list(cache) == ["3", "4"]
+    cache.set_size(0)
+    assert cache.update({"5": 5}).inserted == {}
+    assert len(cache) == 0
+
+
+def test_table_cache_is_bounded(create_table: Callable[..., TableImpl[dict]]):
+    table = create_table()
+    assert table._cache.size == DEFAULT_CACHE_SIZE
+    table.set_config({"cache_size": 10})
+    assert table._cache.size == 10
@@ -0,0 +1,156 @@
+import asyncio
+from collections.abc import Callable, Mapping
+from typing import Any
+
+import pytest
+from omu.extension.table.packets import TableItemsPacket
+from omu.extension.table.table_extension import TableImpl
+from omu.identifier import Identifier
+
+TABLE_ID = Identifier("com.example", "items")
+
+
+@pytest.mark.asyncio
+async def test_get_coalesces(
+    create_table: Callable[..., TableImpl[dict]], requested_keys: list[list[str]]
+):
+    table = create_table({"a": {"key": "a"}, "b": {"key": "b"}})
+    a, b, again, missing = await asyncio.gather(
+        table.get("a"), table.get("b"), table.get("a"), table.get("x")
+    )
+    # Lookups of one loop iteration are one request, each key sent once
+    assert requested_keys == [["a", "b", "x"]]
+    assert (a, b, again, missing) == ({"key": "a"}, {"key": "b"}, {"key": "a"}, None)
+
+    # Found items are served from the cache
+    assert await table.get("a") == {"key": "a"}
+    assert len(requested_keys) == 1
+
+
+@pytest.mark.asyncio
+async def test_miss_ttl(
+    create_table: Callable[..., TableImpl[dict]], requested_keys: list[list[str]]
+):
+    table = create_table({})
+    assert await table.get("x") is None
+    assert await table.get("x") is None
+    # Misses are asked again without a TTL
+    assert len(requested_keys) == 2
+
+    table.set_miss_ttl(60)
+    assert await table.get("x") is None
+    assert await table.get("x") is None
+    assert len(requested_keys) == 3
+
+    # An added item is no longer a miss
+    await table._on_item_add(
+        TableItemsPacket(id=TABLE_ID, items={"x": b'{"key": "x"}'})
+    )
+    assert await table.get("x") == {"key": "x"}
+    assert len(requested_keys) == 3
+    table._cache.clear()
+    assert await table.get("x") is None
+    assert len(requested_keys) == 4
+
+    table.set_miss_ttl(0.01)
+    assert await table.get("z") is None
+    await asyncio.sleep(0.02)
+    assert await table.get("z") is None
+    assert len(requested_keys) == 6
+
+    table.set_miss_ttl(60)
+    assert await table.get("w") is None
+    table.set_miss_ttl(None)
+    assert await table.get("w") is None
+    assert len(requested_keys) == 8
+
+
+@pytest.mark.asyncio
+async def test_patch_emits_update(
+    create_table: Callable[..., TableImpl[dict]], requested_keys: list[list[str]]
+):
+    table = create_table({"b": {"key": "b", "count": 2}})
+    await table.update_cache({"a": {"key": "a", "count": 0}})
+    patches: list[Mapping[str, Any]] = []
+    updates: list[Mapping[str, dict]] = []
+
+    async def on_patch(items: Mapping[str, Any]) -> None:
+        patches.append(items)
+
+    async def on_update(items: Mapping[str, dict]) -> None:
+        updates.append(items)
+
+    table.event.patch += on_patch
+    table.event.update += on_update
+    await table._on_item_patch(
+        TableItemsPacket(
+            id=TABLE_ID, items={"a": b'{"count": 1}', "b": b'{"count": 2}'}
+        )
+    )
+    assert patches == [{"a": {"count": 1}, "b": {"count": 2}}]
+    # Items that are not cached are read from the server after the patch
+    assert requested_keys == [["b"]]
+    assert updates == [{"a": {"key": "a", "count": 1}, "b": {"key": "b", "count": 2}}]
+
+
+@pytest.mark.asyncio
+async def test_proxy_batch(create_table: Callable[..., TableImpl[dict]]):
+    table = create_table()
+    batches: list[list[str]] = []
+
+    async def drop(items: list[dict]) -> list[dict | None]:
+        batches.append([item["key"] for item in items])
+        return [None if item["key"] == "b" else item for item in items]
+
+    async def append(items: list[dict]) -> list[dict | None]:
+        return [{**item, "text": item["text"] + "!"} for item in items]
+
+    unlisten = table.proxy_batch(drop)
+    table.proxy_batch(append)
+    assert table.has_proxies
+    items = {key: {"key": key, "text": key} for key in ("a", "b", "c")}
+    # Proxies run in the order they were added, on what the last one returned
+    assert await table.run_proxies(items) == {
+        "a": {"key": "a", "text": "a!"},
+        "c": {"key": "c", "text": "c!"},
+    }
+    assert batches == [["a", "b", "c"]]
+
+    unlisten()
+    assert await table.run_proxies({"b": {"key": "b", "text": "b"}}) == {
+        "b": {"key": "b", "text": "b!"}
+    }
+
+    async def short(items: list[dict]) -> list[dict | None]:
+        return items[1:]
+
+    table.proxy_batch(short)
+    with pytest.raises(ValueError):
+        await table.run_proxies(items)
+
+
+@pytest.mark.asyncio
+async def test_proxy_concurrency(create_table: Callable[..., TableImpl[dict]]):
+    for concurrency in (1, 3):
+        table = create_table()
+        running = 0
+        most = 0
+
+        async def callback(item: dict) -> dict | None:
+            nonlocal running, most
+            running += 1
+            most = max(most, running)
+            # Later items finish first
+            await asyncio.sleep(0.001 * (10 - item["index"]))
+            running -= 1
+            if item["index"] == 4:
+                return None
+            return {**item, "done": True}
+
+        table.proxy(callback, concurrency=concurrency)
+        items = {f"item{i}": {"index": i} for i in range(8)}
+        result = await table.run_proxies(items)
+        # Results keep the order of the items, at most concurrency at a time
+        assert list(result) == [f"item{i}" for i in range(8) if i != 4]
+        assert all(item["done"] for item in result.values())
+        assert most == concurrency
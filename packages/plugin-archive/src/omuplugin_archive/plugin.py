@@ -4,6 +4,7 @@ from pathlib import Path
 
 import yt_dlp.version
 from omu import Omu
+from omu.extension.table import TableFilter
 from omu_chat import Chat, Room, events
 
 from .archive import Archive, ArchiveConfig
@@ -14,6 +15,9 @@ from .types import (
     OPEN_OUTPUT_DIR_ENDPOINT_TYPE,
 )
 
+# Pending archives read per query on start
+PENDING_BATCH_SIZE = 10
+
 omu = Omu(APP)
 chat = Chat(omu)
 
@@ -125,11 +129,22 @@ async def refresh_ytdlp_info():
 
 
 async def process_pending_archives():
-    archive_records = await archive_table.fetch_items(after=10)
-    for archive in archive_records.values():
-        if archive.status != "pending":
-            continue
-        await start_archive(archive)
+    # Read in pages, archives stay pending while they are started
+    last_id: str | None = None
+    while True:
+        filters: list[TableFilter] = [
+            {"path": "$.status", "op": "eq", "value": "pending"}
+        ]
+        if last_id is not None:
+            filters.append({"path": "$.id", "op": "gt", "value": last_id})
+        archive_records = await archive_table.query(
+            {"filters": filters, "order_by": "$.id", "limit": PENDING_BATCH_SIZE}
+        )
+        for archive in archive_records.values():
+            await start_archive(archive)
+        if len(archive_records) < PENDING_BATCH_SIZE:
+            break
+        last_id = next(reversed(archive_records.values())).id
 
 
 @omu.on_ready
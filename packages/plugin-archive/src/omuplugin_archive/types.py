@@ -9,6 +9,7 @@ ARCHIVE_TABLE_TYPE = TableType.create_model(
     IDENTIFIER,
     "archive",
     Archive,
+    indexes={"status": {"path": "$.status"}},
 )
 CONFIG_REGISTRY_TYPE = RegistryType[ArchiveConfig].create_json(
     IDENTIFIER,
@@ -122,7 +122,17 @@ client.permissions.register(
 
 
 messages = client.tables.get(MESSAGE_TABLE)
-messages.set_config({"cache_size": 1000})
+messages.set_config(
+    {
+        "cache_size": 1000,
+        "retention": {
+            "max_age": 60 * 60 * 24 * 30,
+            "timestamp_index": "created_at",
+            "max_rows_per_partition": 10000,
+            "partition_index": "room_id",
+        },
+    }
+)
 authors = client.tables.get(AUTHOR_TABLE)
 authors.set_config({"cache_size": 500})
 channels = client.tables.get(CHANNEL_TABLE)
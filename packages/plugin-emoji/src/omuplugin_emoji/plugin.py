@@ -1,11 +1,11 @@
 import re
-from collections.abc import Mapping
 from dataclasses import dataclass
+from itertools import chain
 from typing import Literal, TypedDict
 
 from loguru import logger
 from omu import App, Identifier, Omu
-from omu.extension.table import TableType
+from omu.extension.table import TableCacheChange, TableType
 from omu.interface.keyable import Keyable
 from omu.model import Model
 from omu_chat import Chat
@@ -102,25 +102,37 @@ emoji_table.set_cache_size(1000)
 
 
 class Patterns:
-    text: list[tuple[TextPattern, Emoji]] = []
-    image: list[tuple[ImagePattern, Emoji]] = []
-    regex: list[tuple[RegexPattern, Emoji]] = []
+    # Patterns of each emoji by table key
+    text: dict[str, list[tuple[TextPattern, Emoji]]] = {}
+    image: dict[str, list[tuple[ImagePattern, Emoji]]] = {}
+    regex: dict[str, list[tuple[RegexPattern, Emoji]]] = {}
 
-
-@emoji_table.listen
-async def update_emoji_table(items: Mapping[str, Emoji]):
-    Patterns.text.clear()
-    Patterns.image.clear()
-    Patterns.regex.clear()
-
-    for emoji in items.values():
+    @classmethod
+    def add(cls, key: str, emoji: Emoji) -> None:
+        cls.text[key] = []
+        cls.image[key] = []
+        cls.regex[key] = []
         for pattern in emoji.patterns:
             if pattern["type"] == "text":
-                Patterns.text.append((pattern, emoji))
+                cls.text[key].append((pattern, emoji))
             elif pattern["type"] == "image":
-                Patterns.image.append((pattern, emoji))
+                cls.image[key].append((pattern, emoji))
             elif pattern["type"] == "regex":
-                Patterns.regex.append((pattern, emoji))
+                cls.regex[key].append((pattern, emoji))
+
+    @classmethod
+    def remove(cls, key: str) -> None:
+        cls.text.pop(key, None)
+        cls.image.pop(key, None)
+        cls.regex.pop(key, None)
+
+
+@emoji_table.event.cache_change.listen
+async def update_emoji_table(change: TableCacheChange[Emoji]):
+    for key in change.removed:
+        Patterns.remove(key)
+    for key, emoji in chain(change.inserted.items(), change.updated.items()):
+        Patterns.add(key, emoji)
 
 
 @dataclass(frozen=True, slots=True)
@@ -137,7 +149,7 @@ def transform(component: content.Component) -> content.Component:
             return parts[0]
         return content.Root(parts)
     if isinstance(component, content.Image):
-        for pattern, emoji in Patterns.image:
+        for pattern, emoji in chain.from_iterable(Patterns.image.values()):
             if component.id == pattern["id"]:
                 return content.Image.of(
                     url=omu.assets.url(emoji.asset),
@@ -174,7 +186,7 @@ def transform_text_content(
 
 def find_matching_emoji(text: str) -> EmojiMatch | None:
     match: EmojiMatch | None = None
-    for pattern, asset in Patterns.text:
+    for pattern, asset in chain.from_iterable(Patterns.text.values()):
         if match:
             search_end = match.end + len(pattern["text"])
             start = text.find(pattern["text"], None, search_end)
@@ -191,7 +203,7 @@ def find_matching_emoji(text: str) -> EmojiMatch | None:
         if match.start == 0:
             return match
         text = text[: match.start]
-    for pattern, asset in Patterns.regex:
+    for pattern, asset in chain.from_iterable(Patterns.regex.values()):
         if len(pattern["regex"]) == 0:
             continue
         result = re.search(pattern["regex"], text)
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import asyncio
 import socket
+from collections.abc import Sequence
 from html import escape
 from typing import TypedDict
 
@@ -20,6 +21,9 @@ APP = App(
 )
 client = Omu(APP)
 chat = Chat(client)
+# Messages of a deleted or unknown room would look it up for every comment
+chat.rooms.set_miss_ttl(5)
+chat.authors.set_miss_ttl(5)
 app = web.Application()
 
 
@@ -54,10 +58,13 @@ def format_content(*components: content.Component | None) -> str:
 
 
 async def to_comment(message: model.Message) -> Comment | None:
-    room = await chat.rooms.get(message.room_id.key())
-    author: model.Author | None = None
-    if message.author_id:
-        author = await chat.authors.get(message.author_id.key())
+    if not message.author_id:
+        return None
+    # Lookups of concurrent messages are sent together
+    room, author = await asyncio.gather(
+        chat.rooms.get(message.room_id.key()),
+        chat.authors.get(message.author_id.key()),
+    )
     if not room or not author:
         return None
     metadata = room.metadata or {}
@@ -119,10 +126,20 @@ sessions: set[web.WebSocketResponse] = set()
 async def handle(request: web.Request) -> web.WebSocketResponse:
     ws = web.WebSocketResponse()
     await ws.prepare(request)
-    messages = [
-        await to_comment(message)
-        for message in (await chat.messages.fetch_items(before=35)).values()
-    ]
+    messages = await asyncio.gather(
+        *(
+            to_comment(message)
+            for message in (
+                await chat.messages.query(
+                    {
+                        "filters": [{"path": "$.author_id", "op": "exists"}],
+                        "backward": True,
+                        "limit": 35,
+                    }
+                )
+            ).values()
+        )
+    )
     await ws.send_json(
         {
             "type": "connected",
@@ -175,10 +192,10 @@ async def on_message_update(message: model.Message) -> None:
         )
 
 
-@chat.on(events.message.remove)
-async def on_message_delete(message: model.Message) -> None:
+@chat.on(events.message.remove_keys)
+async def on_message_delete(keys: Sequence[str]) -> None:
     for ws in sessions:
-        await ws.send_json({"type": "deleted", "data": [message.key()]})
+        await ws.send_json({"type": "deleted", "data": [*keys]})
 
 
 def is_port_free() -> bool:
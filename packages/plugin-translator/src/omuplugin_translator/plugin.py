@@ -40,18 +40,23 @@ async def on_config_change(new_config: TrasnlatorConfig):
     logger.info(f"translator config updated: {config}")
 
 
-async def translate(component: Component, lang: Language) -> Component:
-    component = component.copy()
+async def translate(components: list[Component], lang: Language) -> list[Component]:
+    # All texts of the batch go out in a single request
+    components = [component.copy() for component in components]
     if not translator:
-        return component
-    texts = [sibling for sibling in component.iter() if isinstance(sibling, Text)]
-    translated = await translator.translate(
-        [text.text for text in texts if text.text],
-        lang,
-    )
+        return components
+    texts = [
+        sibling
+        for component in components
+        for sibling in component.iter()
+        if isinstance(sibling, Text) and sibling.text
+    ]
+    if not texts:
+        return components
+    translated = await translator.translate([text.text for text in texts], lang)
     for text, (translation, _) in zip(texts, translated, strict=False):
         text.text = translation
-    return component
+    return components
 
 
 def is_same_content(a: Component, b: Component) -> bool:
@@ -64,27 +69,13 @@ def is_same_content(a: Component, b: Component) -> bool:
     return all(a == b for a, b in zip(texts_a, texts_b, strict=False))
 
 
-@chat.messages.proxy
-async def on_message_add(message: model.Message) -> model.Message:
-    if not config["active"]:
-        return message
-    if not message.content:
-        return message
-    translations: dict[str, Component] = {}
-    if len(config["languages"]) == 1:
-        lang = config["languages"][0]
-        translated = await translate(message.content, lang)
-        message.content = translated
-        return message
-    for lang in config["languages"]:
-        translated = await translate(message.content, lang)
-        translations[lang] = translated
+def merge_translations(translations: dict[str, Component]) -> Component:
+    languages = list(translations)
     if all(
-        is_same_content(translations[lang], translations[config["languages"][0]])
-        for lang in config["languages"][1:]
+        is_same_content(translations[lang], translations[languages[0]])
+        for lang in languages[1:]
     ):
-        message.content = translations[config["languages"][0]]
-        return message
+        return translations[languages[0]]
     content = Root()
     for i, (lang, translated) in enumerate(translations.items()):
         lines = [
@@ -92,8 +83,25 @@ async def on_message_add(message: model.Message) -> model.Message:
             translated,
         ]
         content.add(System(lines))
-    message.content = content
-    return message
+    return content
+
+
+@chat.messages.proxy_batch
+async def on_messages_add(messages: list[model.Message]) -> list[model.Message]:
+    if not config["active"]:
+        return messages
+    targets = [message for message in messages if message.content]
+    if not targets:
+        return messages
+    contents = [message.content for message in targets if message.content]
+    translations = {
+        lang: await translate(contents, lang) for lang in config["languages"]
+    }
+    for i, message in enumerate(targets):
+        message.content = merge_translations(
+            {lang: translated[i] for lang, translated in translations.items()}
+        )
+    return messages
 
 
 @omu.event.ready.listen
@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from omuserver.extension.table.adapters.logtable import LogTableAdapter
+from omuserver.extension.table.adapters.sqlitetable import SqliteTableAdapter
+from omuserver.extension.table.adapters.tableadapter import TableAdapter
+
+
+def create_message(index: int) -> bytes:
+    return json.dumps(
+        {
+            "room_id": f"com.omuapps:youtube/room{index % 50}",
+            "id": f"com.omuapps:youtube/message{index}",
+            "author_id": f"com.omuapps:youtube/author{index % 5000}",
+            "content": {"type": "text", "data": f"message {index}"},
+            "created_at": "2024-01-01T00:00:00",
+        }
+    ).encode("utf-8")
+
+
+async def bench_ingest(adapter: TableAdapter, rows: int, batch: int) -> float:
+    # Chat messages arrive a few at a time, each batch is one table add
+    start = time.perf_counter()
+    for offset in range(0, rows, batch):
+        items = {
+            f"com.omuapps:youtube/message{i}": create_message(i)
+            for i in range(offset, min(offset + batch, rows))
+        }
+        await adapter.record_changes("add", list(items))
+        await adapter.set_all(items)
+    await adapter.store()
+    return time.perf_counter() - start
+
+
+async def bench_fetch_page(adapter: TableAdapter, pages: int, limit: int) -> float:
+    start = time.perf_counter()
+    cursor: str | None = None
+    for _ in range(pages):
+        page = await adapter.fetch_page(limit, backward=True, cursor=cursor)
+        cursor = page.cursor
+    return time.perf_counter() - start
+
+
+async def bench_get(adapter: TableAdapter, rows: int, gets: int) -> float:
+    keys = [f"com.omuapps:youtube/message{random.randrange(rows)}" for _ in range(gets)]
+    start = time.perf_counter()
+    for key in keys:
+        await adapter.get(key)
+    return time.perf_counter() - start
+
+
+async def main(rows: int, batch: int, pages: int, limit: int, gets: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, adapter_type in (
+            ("sqlite", SqliteTableAdapter),
+            ("log", LogTableAdapter),
+        ):
+            adapter = adapter_type.create(Path(tmp) / name)
+            elapsed = await bench_ingest(adapter, rows, batch)
+            print(
+                f"{name} ingest: {rows} rows in batches of {batch} in {elapsed:.3f}s "
+                f"({rows / elapsed:.0f} rows/s)"
+            )
+            elapsed = await bench_fetch_page(adapter, pages, limit)
+            print(
+                f"{name} fetch_page: {pages} pages of {limit} in {elapsed:.3f}s "
+                f"({elapsed / pages * 1000:.3f}ms/page)"
+            )
+            elapsed = await bench_get(adapter, rows, gets)
+            print(
+                f"{name} get: {gets} random keys in {elapsed:.3f}s "
+                f"({elapsed / gets * 1_000_000:.1f}us/get)"
+            )
+            await adapter.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Table adapter benchmark")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--gets", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.batch, args.pages, args.limit, args.gets))
@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from omuserver.extension.table.adapters.sqlitetable import SqliteTableAdapter
+
+
+def create_message(index: int) -> bytes:
+    return json.dumps(
+        {
+            "room_id": f"com.omuapps:youtube/room{index % 50}",
+            "id": f"com.omuapps:youtube/message{index}",
+            "author_id": f"com.omuapps:youtube/author{index % 5000}",
+            "content": {"type": "text", "data": f"message {index}"},
+            "created_at": "2024-01-01T00:00:00",
+        }
+    ).encode("utf-8")
+
+
+def populate(adapter: SqliteTableAdapter, rows: int, chunk: int = 10000) -> None:
+    for start in range(0, rows, chunk):
+        adapter._conn.executemany(
+            "INSERT INTO data (key, value) VALUES (?, ?)",
+            (
+                (f"com.omuapps:youtube/message{i}", create_message(i))
+                for i in range(start, min(start + chunk, rows))
+            ),
+        )
+    adapter._conn.commit()
+
+
+def legacy_fetch_items(
+    adapter: SqliteTableAdapter, before: int, cursor: str | None
+) -> dict[str, bytes]:
+    # The previous implementation: resolve the key, scan, then re-sort in Python.
+    conn = adapter._conn
+    items: dict[int, tuple[str, bytes]] = {}
+    if cursor is None:
+        rows = conn.execute(
+            "SELECT id, key, value FROM data ORDER BY id DESC LIMIT ?", (before,)
+        ).fetchall()
+    else:
+        (cursor_id,) = conn.execute(
+            "SELECT id FROM data WHERE key = ?", (cursor,)
+        ).fetchone()
+        rows = conn.execute(
+            "SELECT id, key, value FROM data WHERE id <= ? ORDER BY id DESC LIMIT ?",
+            (cursor_id, before),
+        ).fetchall()
+    items.update({row[0]: (row[1], row[2]) for row in rows})
+    return {key: value for _, (key, value) in sorted(items.items(), reverse=True)}
+
+
+async def bench_legacy(adapter: SqliteTableAdapter, pages: int, limit: int) -> float:
+    start = time.perf_counter()
+    cursor: str | None = None
+    for _ in range(pages):
+        items = legacy_fetch_items(adapter, limit + 1, cursor)
+        *_, cursor = items.keys()
+    return time.perf_counter() - start
+
+
+async def bench_fetch_items(
+    adapter: SqliteTableAdapter, pages: int, limit: int
+) -> float:
+    start = time.perf_counter()
+    cursor: str | None = None
+    for _ in range(pages):
+        items = await adapter.fetch_items(before=limit + 1, after=None, cursor=cursor)
+        *_, cursor = items.keys()
+    return time.perf_counter() - start
+
+
+async def bench_fetch_page(
+    adapter: SqliteTableAdapter, pages: int, limit: int
+) -> float:
+    start = time.perf_counter()
+    cursor: str | None = None
+    for _ in range(pages):
+        page = await adapter.fetch_page(limit, backward=True, cursor=cursor)
+        cursor = page.cursor
+    return time.perf_counter() - start
+
+
+async def main(rows: int, pages: int, limit: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        adapter = SqliteTableAdapter(Path(tmp) / "messages")
+        start = time.perf_counter()
+        populate(adapter, rows)
+        print(f"populate {rows} rows: {time.perf_counter() - start:.2f}s")
+
+        for name, bench in (
+            ("legacy fetch_items (key cursor)", bench_legacy),
+            ("fetch_items (key cursor)", bench_fetch_items),
+            ("fetch_page (opaque cursor)", bench_fetch_page),
+        ):
+            elapsed = await bench(adapter, pages, limit)
+            per_page = elapsed / pages * 1000
+            print(
+                f"{name}: {pages} pages of {limit} in {elapsed:.3f}s "
+                f"({per_page:.3f}ms/page)"
+            )
+        adapter._conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Table pagination benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.pages, args.limit))
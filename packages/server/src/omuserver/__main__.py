@@ -1,13 +1,21 @@
 import asyncio
 import io
+import sqlite3
 import sys
 import tracemalloc
+from pathlib import Path
 
 import click
 from loguru import logger
 from omu.address import Address
+from omu.extension.table import TableDumpFormat
+from omu.identifier import Identifier
 
+from omuserver.backup import DEFAULT_RATE, backup_data
 from omuserver.config import Config
+from omuserver.directories import Directories
+from omuserver.extension.table.dump import dump_adapter, restore_adapter
+from omuserver.extension.table.table_extension import find_adapter, open_adapter
 from omuserver.server.omuserver import OmuServer
 
 
@@ -27,10 +35,13 @@ def setup_logging():
     )
 
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.option("--debug", is_flag=True)
 @click.option("--token", type=str, default=None)
-def main(debug: bool, token: str | None):
+@click.pass_context
+def main(ctx: click.Context, debug: bool, token: str | None):
+    if ctx.invoked_subcommand is not None:
+        return
     loop = asyncio.get_event_loop()
 
     config = Config()
@@ -52,6 +63,87 @@ def main(debug: bool, token: str | None):
     server.run()
 
 
+def get_table_path(id: str) -> Path:
+    directories = Directories.default()
+    return directories.get("tables") / Identifier.from_key(id).get_sanitized_path()
+
+
+@main.command()
+@click.argument("file", type=click.Path(dir_okay=False, path_type=Path))
+@click.option("--rate", type=int, default=DEFAULT_RATE, help="Bytes read per second")
+def backup(file: Path, rate: int):
+    """Archive the data directory. Safe while the server is running."""
+    directories = Directories.default()
+    count = asyncio.run(backup_data(directories.data, file, rate))
+    click.echo(f"Backed up {count} files to {file}")
+
+
+DUMP_FORMAT = click.Choice(["binary", "ndjson"])
+
+
+@main.group()
+def table():
+    """Dump and restore tables. Only use while the server is stopped."""
+
+
+@table.command()
+@click.argument("id")
+@click.argument("file", type=click.Path(dir_okay=False, path_type=Path))
+@click.option("--format", type=DUMP_FORMAT, default="binary")
+def dump(id: str, file: Path, format: TableDumpFormat):
+    path = get_table_path(id)
+    if find_adapter(path) is None:
+        raise click.ClickException(f"Table {id} not found")
+
+    async def run() -> int:
+        adapter = open_adapter(path)
+        try:
+            return await dump_adapter(adapter, file, format)
+        finally:
+            await adapter.close()
+
+    count = asyncio.run(run())
+    click.echo(f"Dumped {count} items to {file}")
+
+
+@table.command()
+@click.argument("id")
+@click.argument("file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--format", type=DUMP_FORMAT, default="binary")
+@click.option("--replace", is_flag=True, help="Clear the table first")
+def restore(id: str, file: Path, format: TableDumpFormat, replace: bool):
+    path = get_table_path(id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    async def run() -> int:
+        adapter = open_adapter(path)
+        try:
+            return await restore_adapter(adapter, file, format, replace)
+        finally:
+            await adapter.close()
+
+    count = asyncio.run(run())
+    click.echo(f"Restored {count} items to {id}")
+
+
+@table.command()
+@click.argument("id")
+def migrate(id: str):
+    """Upgrade how a table is stored, rewriting its files if needed."""
+    path = get_table_path(id)
+    adapter_type = find_adapter(path)
+    if adapter_type is None:
+        raise click.ClickException(f"Table {id} not found")
+    try:
+        migrated = adapter_type.migrate(path)
+    except sqlite3.OperationalError as e:
+        raise click.ClickException(f"Failed to migrate table {id}: {e}") from e
+    if migrated:
+        click.echo(f"Migrated table {id}")
+    else:
+        click.echo(f"Table {id} is up to date")
+
+
 if __name__ == "__main__":
     setup_logging()
     main()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import tempfile
+import zipfile
+from collections.abc import Collection
+from contextlib import closing
+from pathlib import Path
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+# Bytes per second read from the data directory
+DEFAULT_RATE = 32 * 1024 * 1024
+STEP_PAGES = 64
+# A write from another connection restarts the copy of a database, after
+# this many restarts it is copied with VACUUM INTO instead
+MAX_RESTARTS = 3
+# Journals of live databases, their content is read through sqlite
+SKIPPED_SUFFIXES = ("-journal", "-wal", "-shm")
+
+
+class BackupRestarted(Exception): ...
+
+
+def is_database(path: Path) -> bool:
+    with open(path, "rb") as file:
+        return file.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+
+
+def connect_readonly(source: Path) -> sqlite3.Connection:
+    uri = f"{source.resolve().as_uri()}?mode=ro"
+    try:
+        return sqlite3.connect(uri, uri=True)
+    except sqlite3.OperationalError:
+        if source.exists():
+            raise
+        raise FileNotFoundError(source) from None
+
+
+def backup_database(source: Path, target: Path, rate: int = DEFAULT_RATE) -> None:
+    # Runs in a worker thread on its own read-only connection, so the
+    # server keeps writing and only waits for single steps
+    with (
+        closing(connect_readonly(source)) as connection,
+        closing(sqlite3.connect(target)) as destination,
+    ):
+        (page_size,) = connection.execute("PRAGMA page_size").fetchone()
+        restarts = 0
+        last_remaining: int | None = None
+
+        def progress(status: int, remaining: int, total: int) -> None:
+            nonlocal restarts, last_remaining
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                if restarts > MAX_RESTARTS:
+                    raise BackupRestarted
+            last_remaining = remaining
+
+        try:
+            connection.backup(
+                destination,
+                pages=STEP_PAGES,
+                progress=progress,
+                sleep=STEP_PAGES * page_size / rate,
+            )
+            return
+        except BackupRestarted:
+            pass
+    # Copies one snapshot in a single pass that writes cannot restart
+    target.unlink()
+    with closing(connect_readonly(source)) as connection:
+        connection.execute("VACUUM INTO ?", (str(target),))
+
+
+def _write_file(archive: zipfile.ZipFile, path: Path, name: str) -> int | None:
+    try:
+        archive.write(path, name)
+    except FileNotFoundError:
+        return None
+    return archive.getinfo(name).file_size
+
+
+async def backup_data(
+    data: Path,
+    archive: Path,
+    rate: int = DEFAULT_RATE,
+    exclude: Collection[Path] = (),
+) -> int:
+    # Every database is a consistent snapshot of itself, files are copied
+    # as they are. Returns the number of archived files.
+    archive.parent.mkdir(parents=True, exist_ok=True)
+    temp = archive.with_suffix(".tmp")
+    excluded = [path.resolve() for path in (*exclude, archive, temp)]
+    count = 0
+    try:
+        with (
+            tempfile.TemporaryDirectory() as snapshots,
+            zipfile.ZipFile(temp, "w", zipfile.ZIP_DEFLATED) as zip,
+        ):
+            for path in sorted(data.rglob("*")):
+                if not path.is_file() or path.name.endswith(SKIPPED_SUFFIXES):
+                    continue
+                if any(path.resolve().is_relative_to(other) for other in excluded):
+                    continue
+                name = path.relative_to(data).as_posix()
+                try:
+                    database = is_database(path)
+                except FileNotFoundError:
+                    continue
+                if database:
+                    snapshot = Path(snapshots) / str(count)
+                    try:
+                        await asyncio.to_thread(backup_database, path, snapshot, rate)
+                    except FileNotFoundError:
+                        # Removed while backing up, e.g. a dropped partition
+                        snapshot.unlink(missing_ok=True)
+                        continue
+                    await asyncio.to_thread(_write_file, zip, snapshot, name)
+                    snapshot.unlink()
+                else:
+                    size = await asyncio.to_thread(_write_file, zip, path, name)
+                    if size is None:
+                        # Removed while backing up, e.g. a merged log segment
+                        continue
+                    await asyncio.sleep(size / rate)
+                count += 1
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+    temp.replace(archive)
+    return count
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import sqlite3
+from collections import OrderedDict
+from collections.abc import Callable
+from pathlib import Path
+
+DEFAULT_MAX_OPEN = 64
+# Page cache shared by every open database, in KiB
+DEFAULT_CACHE_BUDGET = 64 * 1024
+MIN_CACHE_SIZE = 512
+
+
+class Database:
+    # Handle to one database file. The connection is opened on first use and
+    # may be closed by the manager while idle, the next use reopens it.
+    def __init__(self, manager: DatabaseManager, path: Path) -> None:
+        self._manager = manager
+        self.path = path
+        self.refs = 0
+        self._connection: sqlite3.Connection | None = None
+        # Run on every new connection, e.g. to register functions
+        self.on_connect: list[Callable[[sqlite3.Connection], None]] = []
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = self._manager._connect(self)
+        else:
+            self._manager._touch(self)
+        return self._connection
+
+    @property
+    def connected(self) -> bool:
+        return self._connection is not None
+
+    def close(self) -> None:
+        self._manager.release(self)
+
+
+class DatabaseManager:
+    # Every sqlite file of the server is opened through here. Handles to the
+    # same file share one connection, which is only used from the thread
+    # that opened it, so each file has a single writer.
+    def __init__(
+        self,
+        max_open: int = DEFAULT_MAX_OPEN,
+        cache_budget: int = DEFAULT_CACHE_BUDGET,
+    ) -> None:
+        self._max_open = max_open
+        self._cache_budget = cache_budget
+        self._databases: dict[Path, Database] = {}
+        self._connected: OrderedDict[Path, Database] = OrderedDict()
+
+    def open(self, path: Path) -> Database:
+        path = path.resolve()
+        database = self._databases.get(path)
+        if database is None:
+            database = Database(self, path)
+            self._databases[path] = database
+        database.refs += 1
+        return database
+
+    def release(self, database: Database) -> None:
+        database.refs -= 1
+        if database.refs > 0:
+            return
+        del self._databases[database.path]
+        self._disconnect(database)
+
+    def close(self) -> None:
+        # Handles stay valid and reconnect when used again
+        for database in tuple(self._connected.values()):
+            self._disconnect(database)
+
+    @property
+    def connected(self) -> int:
+        return len(self._connected)
+
+    def _connect(self, database: Database) -> sqlite3.Connection:
+        connection = sqlite3.connect(database.path)
+        for callback in database.on_connect:
+            callback(connection)
+        database._connection = connection
+        self._connected[database.path] = database
+        self._evict()
+        self._balance_cache()
+        return connection
+
+    def _touch(self, database: Database) -> None:
+        self._connected.move_to_end(database.path)
+
+    def _evict(self) -> None:
+        # Least recently used first, never in the middle of a transaction
+        for database in tuple(self._connected.values()):
+            if len(self._connected) <= self._max_open:
+                break
+            connection = database._connection
+            if connection is None or connection.in_transaction:
+                continue
+            self._disconnect(database)
+
+    def _disconnect(self, database: Database) -> None:
+        connection = database._connection
+        if connection is None:
+            return
+        database._connection = None
+        del self._connected[database.path]
+        connection.commit()
+        connection.close()
+        self._balance_cache()
+
+    def _balance_cache(self) -> None:
+        if not self._connected:
+            return
+        size = max(self._cache_budget // len(self._connected), MIN_CACHE_SIZE)
+        for database in self._connected.values():
+            assert database._connection is not None
+            database._connection.execute(f"PRAGMA cache_size = -{size}")
+
+
+DATABASES = DatabaseManager()
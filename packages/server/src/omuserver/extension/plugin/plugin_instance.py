@@ -64,7 +64,7 @@ class PluginInstance:
                 plugin_client.network.set_connection(connection)
                 plugin_client.network.set_token_provider(PluginTokenProvider(token))
                 await plugin_client.start()
-                session_connection = PluginSessionConnection(connection)
+                session_connection = PluginSessionConnection(connection, plugin_client)
                 session = await Session.from_connection(
                     server,
                     server.packet_dispatcher.packet_mapper,
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from loguru import logger
+from omu.client import Client
 from omu.network import Packet
 from omu.network.packet_mapper import PacketMapper
 
@@ -10,13 +11,20 @@ from .plugin_connection import PluginConnection
 
 
 class PluginSessionConnection(SessionConnection):
-    def __init__(self, connection: PluginConnection) -> None:
+    def __init__(
+        self, connection: PluginConnection, client: Client | None = None
+    ) -> None:
         self.connection = connection
+        self.client = client
 
     @property
     def closed(self) -> bool:
         return self.connection.closed
 
+    @property
+    def local_client(self) -> Client | None:
+        return self.client
+
     async def receive(self, packet_mapper: PacketMapper) -> Packet:
         return await self.connection.dequeue_to_server_packet()
 
@@ -1,6 +1,7 @@
 from omu.extension.permission import PermissionType
 from omu.extension.server import (
     SERVER_APPS_READ_PERMISSION_ID,
+    SERVER_BACKUP_PERMISSION_ID,
     SERVER_SHUTDOWN_PERMISSION_ID,
 )
 
@@ -32,3 +33,17 @@ SERVER_APPS_READ_PERMISSION = PermissionType(
         },
     },
 )
+SERVER_BACKUP_PERMISSION = PermissionType(
+    id=SERVER_BACKUP_PERMISSION_ID,
+    metadata={
+        "level": "high",
+        "name": {
+            "en": "Back up server data",
+            "ja": "サーバーデータのバックアップ",
+        },
+        "note": {
+            "en": "Permission to save a copy of all tables and settings",
+            "ja": "すべてのテーブルと設定のコピーを保存できる権限",
+        },
+    },
+)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from asyncio import Future
 from collections import defaultdict
 from collections.abc import Callable
@@ -8,19 +9,23 @@ from typing import TYPE_CHECKING
 from loguru import logger
 from omu.extension.server.server_extension import (
     APP_TABLE_TYPE,
+    BACKUP_ENDPOINT_TYPE,
     REQUIRE_APPS_PACKET_TYPE,
     SHUTDOWN_ENDPOINT_TYPE,
     VERSION_REGISTRY_TYPE,
+    ServerBackup,
 )
 from omu.identifier import Identifier
 
 from omuserver import __version__
-from omuserver.helper import get_launch_command
+from omuserver.backup import DEFAULT_RATE, backup_data
+from omuserver.helper import get_launch_command, safe_path_join
 from omuserver.server import Server
 from omuserver.session import Session
 
 from .permissions import (
     SERVER_APPS_READ_PERMISSION,
+    SERVER_BACKUP_PERMISSION,
     SERVER_SHUTDOWN_PERMISSION,
 )
 
@@ -54,6 +59,7 @@ class ServerExtension:
         server.permission_manager.register(
             SERVER_SHUTDOWN_PERMISSION,
             SERVER_APPS_READ_PERMISSION,
+            SERVER_BACKUP_PERMISSION,
         )
         self.version_registry = self._server.registry.register(VERSION_REGISTRY_TYPE)
         self.apps = self._server.tables.register(APP_TABLE_TYPE)
@@ -64,6 +70,11 @@ class ServerExtension:
             SHUTDOWN_ENDPOINT_TYPE,
             self.handle_shutdown,
         )
+        server.endpoints.bind_endpoint(
+            BACKUP_ENDPOINT_TYPE,
+            self.handle_backup,
+        )
+        self._backup_lock = asyncio.Lock()
         server.packet_dispatcher.add_packet_handler(
             REQUIRE_APPS_PACKET_TYPE, self.handle_require_apps
         )
@@ -92,6 +103,20 @@ class ServerExtension:
         self._server.loop.create_task(self.shutdown(restart))
         return True
 
+    async def handle_backup(self, session: Session, backup: ServerBackup) -> int:
+        directory = self._server.directories.get("backups")
+        archive = safe_path_join(directory, backup["file"])
+        # One at a time, concurrent backups would only split the rate
+        async with self._backup_lock:
+            count = await backup_data(
+                self._server.directories.data,
+                archive,
+                backup.get("rate", DEFAULT_RATE),
+                exclude=[directory],
+            )
+        logger.info(f"Backed up {count} files to {archive}")
+        return count
+
     async def shutdown(self, restart: bool = False) -> None:
         if restart:
             import os
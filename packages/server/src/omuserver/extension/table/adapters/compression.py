@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import re
+import zlib
+from collections import Counter
+from collections.abc import Iterable, Mapping
+
+from omu.extension.table import TableCompression
+
+# Compressed values start with a zero byte, which JSON never does. Values
+# that start with one anyway are stored behind a raw header.
+#   0x00 0x00 value                  raw
+#   0x00 0x01 dictionary deflated    raw deflate, dictionary 0 is none
+HEADER = b"\x00"
+RAW = 0
+DEFLATE = 1
+
+DEFAULT_LEVEL = 6
+DEFAULT_DICTIONARY_SIZE = 16 * 1024
+# Deflate only looks back 32 KiB, a longer dictionary is never used
+MAX_DICTIONARY_SIZE = 32 * 1024
+TRAIN_SAMPLES = 1000
+TRAIN_MIN_SAMPLES = 100
+
+# JSON strings, keys with their colon
+TOKEN_RE = re.compile(rb'"(?:[^"\\]|\\.)*"(?:\s*:)?')
+
+
+def train_dictionary(samples: Iterable[bytes], size: int) -> bytes:
+    # Strings repeated across items, the most valuable last since deflate
+    # encodes nearer matches with shorter distances
+    counts = Counter[bytes]()
+    for sample in samples:
+        counts.update(set(TOKEN_RE.findall(sample)))
+    tokens = sorted(
+        (token for token, count in counts.items() if count > 1),
+        key=lambda token: counts[token] * len(token),
+        reverse=True,
+    )
+    chosen: list[bytes] = []
+    length = 0
+    for token in tokens:
+        if length + len(token) > size:
+            continue
+        chosen.append(token)
+        length += len(token)
+    return b"".join(reversed(chosen))
+
+
+class ValueCodec:
+    def __init__(
+        self,
+        compression: TableCompression,
+        dictionaries: dict[int, bytes],
+    ) -> None:
+        if compression["type"] != "zlib":
+            raise ValueError(f"Unknown compression {compression['type']}")
+        self.level = compression.get("level", DEFAULT_LEVEL)
+        self.dictionary_size = min(
+            compression.get("dictionary_size", DEFAULT_DICTIONARY_SIZE),
+            MAX_DICTIONARY_SIZE,
+        )
+        # Shared with the owner, trained dictionaries are added to it
+        self.dictionaries = dictionaries
+        # New values use the latest dictionary
+        self.dictionary_id = max(self.dictionaries, default=0)
+
+    @property
+    def trained(self) -> bool:
+        return self.dictionary_id != 0 or self.dictionary_size == 0
+
+    def add_dictionary(self, dictionary: bytes) -> int:
+        if self.dictionary_id == 255:
+            raise ValueError("No dictionary ids left")
+        self.dictionary_id += 1
+        self.dictionaries[self.dictionary_id] = dictionary
+        return self.dictionary_id
+
+    def encode(self, value: bytes) -> bytes:
+        if self.dictionary_id:
+            compressor = zlib.compressobj(
+                self.level,
+                zlib.DEFLATED,
+                -15,
+                zdict=self.dictionaries[self.dictionary_id],
+            )
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        data = compressor.compress(value) + compressor.flush()
+        if len(data) + 3 < len(value):
+            return HEADER + bytes((DEFLATE, self.dictionary_id)) + data
+        if value[:1] == HEADER:
+            return HEADER + bytes((RAW,)) + value
+        return value
+
+    def decode(self, value: bytes) -> bytes:
+        return decode_value(value, self.dictionaries)
+
+
+def decode_value(value: bytes, dictionaries: Mapping[int, bytes]) -> bytes:
+    if value[:1] != HEADER:
+        return value
+    if value[1] == RAW:
+        return value[2:]
+    if value[1] != DEFLATE:
+        raise ValueError(f"Unknown value encoding {value[1]}")
+    dictionary_id = value[2]
+    if dictionary_id:
+        decompressor = zlib.decompressobj(-15, zdict=dictionaries[dictionary_id])
+    else:
+        decompressor = zlib.decompressobj(-15)
+    return decompressor.decompress(value[3:]) + decompressor.flush()
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import json
+import re
+from collections.abc import Iterable, Mapping
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from omu.extension.table import (
+    IndexValue,
+    TableFilter,
+    TableIndex,
+    TablePage,
+    TableQuery,
+    TableRetention,
+    TableSearch,
+    TableSearchQuery,
+)
+
+# Python evaluation of table queries for adapters that are not backed by
+# SQLite. Values follow json_extract semantics so that every adapter returns
+# the same rows: booleans compare as 0/1, objects and arrays as JSON text, and
+# NULL sorts before numbers, which sort before text.
+
+JSON_PATH_RE = re.compile(r"\$(\.\w+|\[\d+\])*")
+JSON_PATH_PART_RE = re.compile(r"\.(\w+)|\[(\d+)\]")
+
+SEARCH_LIMIT = 50
+
+type SortKey = tuple[int, Any]
+# rank (lower is better), position in insertion order, key, value
+type SearchRow = tuple[float, int, str, bytes]
+
+
+def parse_path(path: str) -> list[str | int]:
+    if not JSON_PATH_RE.fullmatch(path):
+        raise ValueError(f"Invalid JSON path {path}")
+    parts: list[str | int] = []
+    for name, index in JSON_PATH_PART_RE.findall(path[1:]):
+        parts.append(name if name else int(index))
+    return parts
+
+
+def extract_json(value: Any, path: list[str | int]) -> Any:
+    for part in path:
+        if isinstance(part, str):
+            if not isinstance(value, dict) or part not in value:
+                return None
+            value = value[part]
+        else:
+            if not isinstance(value, list) or part >= len(value):
+                return None
+            value = value[part]
+    return value
+
+
+def sql_value(value: Any) -> Any:
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, dict | list):
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+    return value
+
+
+def sort_key(value: Any) -> SortKey:
+    value = sql_value(value)
+    if value is None:
+        return (0, 0)
+    if isinstance(value, int | float):
+        return (1, value)
+    return (2, value)
+
+
+def compare(left: Any, op: str, right: Any) -> bool:
+    if left is None or right is None:
+        return False
+    left_key, right_key = sort_key(left), sort_key(right)
+    match op:
+        case "eq":
+            return left_key == right_key
+        case "ne":
+            return left_key != right_key
+        case "lt":
+            return left_key < right_key
+        case "le":
+            return left_key <= right_key
+        case "gt":
+            return left_key > right_key
+        case "ge":
+            return left_key >= right_key
+    raise ValueError(f"Unknown filter operator {op}")
+
+
+def match_filter(item: Any, filter: TableFilter) -> bool:
+    value = extract_json(item, parse_path(filter["path"]))
+    op = filter["op"]
+    expected = filter.get("value")
+    if op == "exists":
+        return (value is not None) == (expected is None or bool(expected))
+    if op == "prefix":
+        if not isinstance(expected, str):
+            raise ValueError("Operator prefix requires a string value")
+        return isinstance(value, str) and value.startswith(expected)
+    if op == "in":
+        if not isinstance(expected, list) or not expected:
+            raise ValueError("Operator in requires a non-empty list value")
+        return any(compare(value, "eq", candidate) for candidate in expected)
+    if expected is None:
+        if op == "eq":
+            return value is None
+        if op == "ne":
+            return value is not None
+        raise ValueError(f"Operator {op} requires a value")
+    return compare(value, op, expected)
+
+
+def index_value(item: Any, index: TableIndex) -> Any:
+    value = extract_json(item, parse_path(index["path"]))
+    if index.get("exists", False):
+        return int(value is not None)
+    return sql_value(value)
+
+
+def project(item: Any, fields: list[str]) -> bytes:
+    projected = {field: extract_json(item, parse_path(field)) for field in fields}
+    return json.dumps(projected, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def query_items(
+    items: Iterable[tuple[str, bytes]], query: TableQuery
+) -> dict[str, bytes]:
+    filters = query.get("filters", [])
+    for filter in filters:
+        parse_path(filter["path"])
+    order_by = query.get("order_by")
+    order_path = parse_path(order_by) if order_by is not None else None
+    fields = query.get("fields")
+    matched: list[tuple[SortKey, int, str, bytes, Any]] = []
+    for position, (key, value) in enumerate(items):
+        item = json.loads(value)
+        if not all(match_filter(item, filter) for filter in filters):
+            continue
+        order = (0, 0)
+        if order_path is not None:
+            order = sort_key(extract_json(item, order_path))
+        matched.append((order, position, key, value, item))
+    matched.sort(key=lambda entry: (entry[0], entry[1]))
+    if query.get("backward", False):
+        matched.reverse()
+    limit = query.get("limit")
+    if limit is not None:
+        matched = matched[:limit]
+    if fields is None:
+        return {key: value for _, _, key, value, _ in matched}
+    return {key: project(item, fields) for _, _, key, _, item in matched}
+
+
+def fetch_by_index(
+    items: Iterable[tuple[str, bytes]],
+    index: TableIndex,
+    start: IndexValue | None,
+    end: IndexValue | None,
+    limit: int | None,
+    backward: bool,
+) -> dict[str, bytes]:
+    matched: list[tuple[SortKey, int, str, bytes]] = []
+    for position, (key, value) in enumerate(items):
+        indexed = index_value(json.loads(value), index)
+        if start is not None and not compare(indexed, "ge", start):
+            continue
+        if end is not None and not compare(indexed, "le", end):
+            continue
+        matched.append((sort_key(indexed), position, key, value))
+    matched.sort(key=lambda entry: (entry[0], entry[1]), reverse=backward)
+    if limit is not None:
+        matched = matched[:limit]
+    return {key: value for _, _, key, value in matched}
+
+
+def fetch_expired(
+    items: Iterable[tuple[str, bytes]],
+    retention: TableRetention,
+    indexes: Mapping[str, TableIndex],
+    limit: int,
+) -> list[str]:
+    entries = [(key, json.loads(value)) for key, value in items]
+    keys: dict[str, None] = {}
+    max_rows = retention.get("max_rows")
+    if max_rows is not None and len(entries) > max_rows:
+        expired = entries[: len(entries) - max_rows]
+        keys.update(dict.fromkeys(key for key, _ in expired[:limit]))
+    max_age = retention.get("max_age")
+    if max_age is not None and len(keys) < limit:
+        index = retention_index(retention.get("timestamp_index"), indexes)
+        cutoff = datetime.now(UTC) - timedelta(seconds=max_age)
+        aged: list[tuple[datetime, int, str]] = []
+        for position, (key, item) in enumerate(entries):
+            timestamp = parse_timestamp(index_value(item, index))
+            if timestamp is not None and timestamp < cutoff:
+                aged.append((timestamp, position, key))
+        aged.sort()
+        keys.update(dict.fromkeys(key for _, _, key in aged[: limit - len(keys)]))
+    max_rows_per_partition = retention.get("max_rows_per_partition")
+    if max_rows_per_partition is not None and len(keys) < limit:
+        index = retention_index(retention.get("partition_index"), indexes)
+        counts: dict[SortKey, int] = {}
+        for key, item in reversed(entries):
+            partition = sort_key(index_value(item, index))
+            counts[partition] = counts.get(partition, 0) + 1
+            if counts[partition] > max_rows_per_partition:
+                keys[key] = None
+                if len(keys) >= limit:
+                    break
+    return list(keys)[:limit]
+
+
+def parse_timestamp(value: Any) -> datetime | None:
+    # Same as julianday in SQLite: offsets are applied and a timestamp
+    # without one is UTC
+    if not isinstance(value, str):
+        return None
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=UTC)
+    return timestamp
+
+
+def retention_index(name: str | None, indexes: Mapping[str, TableIndex]) -> TableIndex:
+    if name is None:
+        raise ValueError("Retention requires an index")
+    index = indexes.get(name)
+    if index is None:
+        raise ValueError(f"Index {name} not found")
+    return index
+
+
+def search_text(item: Any, search: TableSearch) -> str:
+    value = extract_json(item, parse_path(search["path"]))
+    text_type = search.get("text_type")
+    parts: list[str] = []
+    stack: list[Any] = [value]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            if text_type is None:
+                parts.append(node)
+        elif isinstance(node, dict):
+            data = node.get("data")
+            if text_type is not None and node.get("type") == text_type:
+                if isinstance(data, str):
+                    parts.append(data)
+                continue
+            stack.extend(reversed(node.values()))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    # Component trees read as one string, like str(Root)
+    return ("" if text_type is not None else " ").join(parts)
+
+
+def search_window(query: TableSearchQuery) -> tuple[int, int]:
+    text = query["text"].strip()
+    if not text:
+        raise ValueError("Search text is empty")
+    # Ranked results shift as items are written, so cursors are offsets
+    cursor = query.get("cursor")
+    if cursor is not None and not cursor.isdigit():
+        raise ValueError(f"Invalid cursor {cursor}")
+    return int(cursor or 0), query.get("limit", SEARCH_LIMIT)
+
+
+def sort_search_rows(rows: list[SearchRow], query: TableSearchQuery) -> None:
+    if query.get("order", "rank") == "rank":
+        rows.sort(key=lambda row: (row[0], -row[1]))
+    else:
+        rows.sort(key=lambda row: -row[1])
+
+
+def search_page(rows: list[SearchRow], offset: int, limit: int) -> TablePage[bytes]:
+    cursor = str(offset + len(rows)) if len(rows) == limit else None
+    return TablePage(items={key: value for _, _, key, value in rows}, cursor=cursor)
+
+
+def search_items(
+    items: Iterable[tuple[str, bytes]],
+    search: TableSearch,
+    query: TableSearchQuery,
+    limit: int,
+) -> list[SearchRow]:
+    needle = query["text"].strip().casefold()
+    filters = query.get("filters", [])
+    rows: list[SearchRow] = []
+    for position, (key, value) in enumerate(items):
+        item = json.loads(value)
+        if not all(match_filter(item, filter) for filter in filters):
+            continue
+        count = search_text(item, search).casefold().count(needle)
+        if count:
+            rows.append((-count, position, key, value))
+    sort_search_rows(rows, query)
+    return rows[:limit]
@@ -0,0 +1,369 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import mmap
+import os
+import shutil
+import struct
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+from omu.extension.table import TableChangeType
+
+from .orderedtable import ChangeRecord, OrderedTableAdapter
+from .tableadapter import TableAdapter
+
+# seq, type, key length, value length
+RECORD_HEADER = struct.Struct(">QBII")
+RECORD_TYPES: tuple[TableChangeType, ...] = ("add", "update", "remove", "clear")
+SEGMENT_SIZE = 16 * 1024 * 1024
+SEGMENT_SUFFIX = ".seg"
+# Closed segments are merged once at least this share of them is dead
+COMPACT_DEAD_RATIO = 0.5
+
+
+@dataclass(frozen=True, slots=True)
+class Location:
+    segment: int
+    offset: int
+    length: int
+    seq: int
+    # Whole record including header and key, used to track dead space
+    size: int
+
+
+@dataclass(frozen=True, slots=True)
+class Record:
+    seq: int
+    type: TableChangeType
+    key: str | None
+    offset: int
+    length: int
+    size: int
+
+
+def encode_record(
+    seq: int, type: TableChangeType, key: str | None, value: bytes = b""
+) -> bytes:
+    key_bytes = (key or "").encode("utf-8")
+    header = RECORD_HEADER.pack(
+        seq, RECORD_TYPES.index(type), len(key_bytes), len(value)
+    )
+    return header + key_bytes + value
+
+
+class Segment:
+    def __init__(self, path: Path, id: int) -> None:
+        self.path = path
+        self.id = id
+        self._file = open(path, "ab+")
+        self.size = self._file.seek(0, os.SEEK_END)
+        self._mmap: mmap.mmap | None = None
+
+    def append(self, data: bytes) -> int:
+        offset = self.size
+        self._file.write(data)
+        self._file.flush()
+        self.size += len(data)
+        return offset
+
+    def map(self) -> None:
+        if self._mmap is not None and len(self._mmap) == self.size:
+            return
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self.size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, offset: int, length: int) -> bytes:
+        if self._mmap is None or len(self._mmap) < offset + length:
+            self.map()
+        if self._mmap is None:
+            return b""
+        return self._mmap[offset : offset + length]
+
+    def records(self) -> Iterator[Record]:
+        offset = 0
+        while offset + RECORD_HEADER.size <= self.size:
+            header = self.read(offset, RECORD_HEADER.size)
+            seq, type, key_length, value_length = RECORD_HEADER.unpack(header)
+            key_offset = offset + RECORD_HEADER.size
+            value_offset = key_offset + key_length
+            if value_offset + value_length > self.size or type >= len(RECORD_TYPES):
+                break
+            key = self.read(key_offset, key_length).decode("utf-8")
+            yield Record(
+                seq=seq,
+                type=RECORD_TYPES[type],
+                key=key if RECORD_TYPES[type] != "clear" else None,
+                offset=value_offset,
+                length=value_length,
+                size=value_offset + value_length - offset,
+            )
+            offset = value_offset + value_length
+        if offset != self.size:
+            # A write was cut short, drop the incomplete record
+            self.truncate(offset)
+
+    def truncate(self, size: int) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.truncate(size)
+        self.size = size
+
+    def sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+
+class LogTableAdapter(OrderedTableAdapter):
+    def __init__(self, path: Path) -> None:
+        super().__init__()
+        self._path = path.with_suffix(".log")
+        self._path.mkdir(parents=True, exist_ok=True)
+        self._segments: dict[int, Segment] = {}
+        self._active: Segment | None = None
+        self._active_first_seq = 0
+        self._locations: dict[str, Location] = {}
+        self._live_bytes: dict[int, int] = {}
+        self._merging = False
+        self._load_segments()
+        self._last_segment_id = max(self._segments, default=0)
+        self._load_consumers()
+
+    @classmethod
+    def create(cls, path: Path) -> TableAdapter:
+        return cls(path)
+
+    @classmethod
+    def exists(cls, path: Path) -> bool:
+        return path.with_suffix(".log").is_dir()
+
+    def _load_segments(self) -> None:
+        puts: dict[str, Location] = {}
+        removed: dict[str, int] = {}
+        changes: dict[int, ChangeRecord] = {}
+        for segment_path in sorted(self._path.glob(f"*{SEGMENT_SUFFIX}")):
+            segment = Segment(segment_path, int(segment_path.stem))
+            self._segments[segment.id] = segment
+            self._live_bytes[segment.id] = 0
+            for record in segment.records():
+                self._seq = max(self._seq, record.seq)
+                changes[record.seq] = (record.seq, record.type, record.key)
+                if record.type == "clear":
+                    self._generation = max(self._generation, record.seq)
+                elif record.type == "remove":
+                    assert record.key is not None
+                    removed[record.key] = max(removed.get(record.key, 0), record.seq)
+                else:
+                    assert record.key is not None
+                    existing = puts.get(record.key)
+                    if existing is None or existing.seq < record.seq:
+                        puts[record.key] = Location(
+                            segment.id,
+                            record.offset,
+                            record.length,
+                            record.seq,
+                            record.size,
+                        )
+        live = sorted(
+            (location.seq, key, location)
+            for key, location in puts.items()
+            if location.seq > removed.get(key, 0) and location.seq > self._generation
+        )
+        for seq, key, location in live:
+            self._locations[key] = location
+            self._order.append(key, seq)
+            self._live_bytes[location.segment] += location.size
+        self._changes = [changes[seq] for seq in sorted(changes)]
+
+    def _load_consumers(self) -> None:
+        path = self._path / "consumers.json"
+        if path.exists():
+            self._consumers = json.loads(path.read_text(encoding="utf-8"))
+
+    def _save_consumers(self) -> None:
+        path = self._path / "consumers.json"
+        temp = path.with_suffix(".tmp")
+        temp.write_text(json.dumps(self._consumers), encoding="utf-8")
+        temp.replace(path)
+
+    def _next_segment_id(self) -> int:
+        self._last_segment_id += 1
+        return self._last_segment_id
+
+    def _append(self, data: bytes) -> tuple[Segment, int]:
+        if self._active is None or self._active.size >= SEGMENT_SIZE:
+            segment_id = self._next_segment_id()
+            path = self._path / f"{segment_id:08d}{SEGMENT_SUFFIX}"
+            self._active = Segment(path, segment_id)
+            self._active_first_seq = self._seq + 1
+            self._segments[segment_id] = self._active
+            self._live_bytes[segment_id] = 0
+        return self._active, self._active.append(data)
+
+    def _read(self, key: str) -> bytes:
+        location = self._locations[key]
+        return self._segments[location.segment].read(location.offset, location.length)
+
+    def _unlink(self, key: str) -> None:
+        location = self._locations.pop(key, None)
+        if location is not None:
+            self._live_bytes[location.segment] -= location.size
+
+    async def store(self) -> None:
+        if self._active is not None:
+            self._active.sync()
+
+    async def load(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        for segment in self._segments.values():
+            segment.close()
+        self._segments.clear()
+        self._active = None
+
+    async def drop(self) -> None:
+        await self.close()
+        shutil.rmtree(self._path, ignore_errors=True)
+
+    async def set_all(self, items: Mapping[str, bytes]) -> None:
+        records: list[tuple[int, str, int, int, int]] = []
+        buffer = bytearray()
+        for key, value in items.items():
+            seq, type = self._next_change(key)
+            record = encode_record(seq, type, key, value)
+            value_offset = len(buffer) + len(record) - len(value)
+            records.append((seq, key, value_offset, len(value), len(record)))
+            buffer += record
+        segment, offset = self._append(bytes(buffer))
+        for seq, key, value_offset, length, size in records:
+            self._unlink(key)
+            location = Location(segment.id, offset + value_offset, length, seq, size)
+            self._locations[key] = location
+            self._live_bytes[segment.id] += size
+            self._order.append(key, seq)
+
+    async def remove_all(self, keys: list[str]) -> None:
+        buffer = bytearray()
+        for key in keys:
+            self._pending_types.pop(key, None)
+            if key not in self._order:
+                continue
+            seq, _ = self._next_change(key, removed=True)
+            buffer += encode_record(seq, "remove", key)
+            self._unlink(key)
+            self._order.remove(key)
+        if buffer:
+            self._append(bytes(buffer))
+
+    async def compact(self, pages: int) -> int:
+        if self._merging:
+            return 0
+        closed = [
+            id for id in self._segments if self._active is None or id != self._active.id
+        ]
+        total = sum(self._segments[id].size for id in closed)
+        live = sum(self._live_bytes[id] for id in closed)
+        if total == 0 or (total - live) / total < COMPACT_DEAD_RATIO:
+            return 0
+        self._merging = True
+        try:
+            await self._merge(closed)
+        finally:
+            self._merging = False
+        return 0
+
+    async def _merge(self, closed: list[int]) -> None:
+        closed_ids = set(closed)
+        moved = [
+            (key, location)
+            for key, location in self._locations.items()
+            if location.segment in closed_ids
+        ]
+        moved.sort(key=lambda entry: entry[1].seq)
+        # Tombstones that consumers have not read yet must survive the merge
+        floor = self._consumer_floor()
+        tombstones: list[ChangeRecord] = [
+            (seq, type, key)
+            for seq, type, key in self._changes
+            if type in ("remove", "clear") and floor < seq < self._active_first_seq
+        ]
+        types: dict[int, TableChangeType] = {
+            seq: type for seq, type, _ in self._changes
+        }
+        segment_id = self._next_segment_id()
+        path = self._path / f"{segment_id:08d}{SEGMENT_SUFFIX}"
+        # Closed segments are immutable, once mapped they can be read off the
+        # loop while writes continue on the active segment
+        for id in closed:
+            self._segments[id].map()
+        offsets = await asyncio.to_thread(
+            self._write_merged, path, moved, tombstones, types
+        )
+        segment = Segment(path, segment_id)
+        self._segments[segment_id] = segment
+        self._live_bytes[segment_id] = 0
+        for (key, location), offset in zip(moved, offsets, strict=True):
+            if self._locations.get(key) is not location:
+                continue
+            self._live_bytes[location.segment] -= location.size
+            self._locations[key] = Location(
+                segment_id, offset, location.length, location.seq, location.size
+            )
+            self._live_bytes[segment_id] += location.size
+        for id in closed:
+            self._segments.pop(id).close()
+            del self._live_bytes[id]
+            (self._path / f"{id:08d}{SEGMENT_SUFFIX}").unlink()
+
+    def _write_merged(
+        self,
+        path: Path,
+        moved: list[tuple[str, Location]],
+        tombstones: list[ChangeRecord],
+        types: dict[int, TableChangeType],
+    ) -> list[int]:
+        offsets: list[int] = []
+        temp = path.with_suffix(".tmp")
+        with open(temp, "wb") as file:
+            position = 0
+            for key, location in moved:
+                segment = self._segments[location.segment]
+                value = segment.read(location.offset, location.length)
+                record = encode_record(
+                    location.seq, types.get(location.seq, "add"), key, value
+                )
+                offsets.append(position + len(record) - len(value))
+                file.write(record)
+                position += len(record)
+            for seq, type, key in tombstones:
+                record = encode_record(seq, type, key)
+                file.write(record)
+                position += len(record)
+            file.flush()
+            os.fsync(file.fileno())
+        temp.replace(path)
+        return offsets
+
+    async def set_consumer_offset(self, consumer: str, offset: int) -> None:
+        await super().set_consumer_offset(consumer, offset)
+        self._save_consumers()
+
+    async def clear(self) -> None:
+        seq = self._clear_order()
+        self._append(encode_record(seq, "clear", None))
+        self._locations.clear()
+        for segment_id in self._live_bytes:
+            self._live_bytes[segment_id] = 0
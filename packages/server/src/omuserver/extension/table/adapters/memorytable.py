@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from pathlib import Path
+
+from .orderedtable import OrderedTableAdapter
+from .tableadapter import TableAdapter
+
+
+class InMemoryTableAdapter(OrderedTableAdapter):
+    # Nothing is written to disk, the table starts empty on every server start
+    def __init__(self) -> None:
+        super().__init__()
+        self._values: dict[str, bytes] = {}
+
+    @classmethod
+    def create(cls, path: Path) -> TableAdapter:
+        return cls()
+
+    @classmethod
+    def exists(cls, path: Path) -> bool:
+        return False
+
+    def _read(self, key: str) -> bytes:
+        return self._values[key]
+
+    async def store(self) -> None:
+        pass
+
+    async def load(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def drop(self) -> None:
+        self._values.clear()
+
+    async def set_all(self, items: Mapping[str, bytes]) -> None:
+        for key, value in items.items():
+            seq, _ = self._next_change(key)
+            self._values[key] = value
+            self._order.append(key, seq)
+
+    async def remove_all(self, keys: list[str]) -> None:
+        for key in keys:
+            self._pending_types.pop(key, None)
+            if key not in self._order:
+                continue
+            self._next_change(key, removed=True)
+            del self._values[key]
+            self._order.remove(key)
+
+    async def compact(self, pages: int) -> int:
+        return 0
+
+    async def clear(self) -> None:
+        self._clear_order()
+        self._values.clear()
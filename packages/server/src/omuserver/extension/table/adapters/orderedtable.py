@@ -0,0 +1,341 @@
+from __future__ import annotations
+
+import abc
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterator
+
+from omu.extension.table import (
+    IndexValue,
+    TableChange,
+    TableChangeType,
+    TableConfig,
+    TableIndex,
+    TablePage,
+    TableQuery,
+    TableRetention,
+    TableSearch,
+    TableSearchQuery,
+)
+
+from . import jsonquery
+from .sqlitetable import INDEX_NAME_RE
+from .tableadapter import TableAdapter
+
+type ChangeRecord = tuple[int, TableChangeType, str | None]
+
+
+class KeyOrder:
+    # Keys ordered by the sequence number of their last write. Replaced and
+    # removed keys leave stale entries behind that are skipped on iteration
+    # and dropped once they outnumber the live ones.
+    def __init__(self) -> None:
+        self._seqs: list[int] = []
+        self._keys: list[str] = []
+        self._live: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._live
+
+    def seq(self, key: str) -> int | None:
+        return self._live.get(key)
+
+    def append(self, key: str, seq: int) -> None:
+        self._live[key] = seq
+        self._seqs.append(seq)
+        self._keys.append(key)
+        self._compact()
+
+    def remove(self, key: str) -> None:
+        if self._live.pop(key, None) is not None:
+            self._compact()
+
+    def clear(self) -> None:
+        self._seqs.clear()
+        self._keys.clear()
+        self._live.clear()
+
+    def iterate(
+        self,
+        seq: int | None = None,
+        backward: bool = False,
+        inclusive: bool = True,
+    ) -> Iterator[tuple[int, str]]:
+        if backward:
+            if seq is None:
+                start = len(self._seqs) - 1
+            elif inclusive:
+                start = bisect_right(self._seqs, seq) - 1
+            else:
+                start = bisect_left(self._seqs, seq) - 1
+            positions = range(start, -1, -1)
+        else:
+            if seq is None:
+                start = 0
+            elif inclusive:
+                start = bisect_left(self._seqs, seq)
+            else:
+                start = bisect_right(self._seqs, seq)
+            positions = range(start, len(self._seqs))
+        for position in positions:
+            seq, key = self._seqs[position], self._keys[position]
+            if self._live.get(key) == seq:
+                yield seq, key
+
+    def _compact(self) -> None:
+        if len(self._seqs) < 2 * len(self._live) + 1024:
+            return
+        live = [
+            (seq, key)
+            for seq, key in zip(self._seqs, self._keys, strict=True)
+            if self._live.get(key) == seq
+        ]
+        self._seqs = [seq for seq, _ in live]
+        self._keys = [key for _, key in live]
+
+
+class OrderedTableAdapter(TableAdapter):
+    # Base for adapters that keep keys, insertion order and the change log in
+    # memory. Items are numbered by a sequence shared with the change log, and
+    # queries are evaluated by jsonquery. Subclasses store the values.
+    def __init__(self) -> None:
+        self._order = KeyOrder()
+        self._changes: list[ChangeRecord] = []
+        self._pending_types: dict[str, TableChangeType] = {}
+        self._seq = 0
+        self._generation = 0
+        self._indexes: dict[str, TableIndex] = {}
+        self._consumers: dict[str, int] = {}
+        self._search: TableSearch | None = None
+
+    @abc.abstractmethod
+    def _read(self, key: str) -> bytes: ...
+
+    def configure(self, config: TableConfig) -> None:
+        indexes = config.get("indexes", {})
+        for name, index in indexes.items():
+            if not INDEX_NAME_RE.fullmatch(name):
+                raise ValueError(f"Invalid index name {name}")
+            jsonquery.parse_path(index["path"])
+        self._indexes = {**indexes}
+        search = config.get("search")
+        if search is not None:
+            jsonquery.parse_path(search["path"])
+        self._search = search
+
+    def _next_change(
+        self, key: str, removed: bool = False
+    ) -> tuple[int, TableChangeType]:
+        self._seq += 1
+        type = self._pending_types.pop(key, None)
+        if removed:
+            type = "remove"
+        elif type is None:
+            type = "update" if key in self._order else "add"
+        self._changes.append((self._seq, type, key))
+        return self._seq, type
+
+    def _clear_order(self) -> int:
+        self._seq += 1
+        self._changes.append((self._seq, "clear", None))
+        self._generation = self._seq
+        self._pending_types.clear()
+        self._order.clear()
+        return self._seq
+
+    def _items(self) -> Iterator[tuple[str, bytes]]:
+        for _, key in self._order.iterate():
+            yield key, self._read(key)
+
+    async def get(self, key: str) -> bytes | None:
+        if key not in self._order:
+            return None
+        return self._read(key)
+
+    async def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        return {key: self._read(key) for key in keys if key in self._order}
+
+    async def existing_keys(self, keys: list[str]) -> list[str]:
+        return [key for key in dict.fromkeys(keys) if key in self._order]
+
+    async def set(self, key: str, value: bytes) -> None:
+        await self.set_all({key: value})
+
+    async def remove(self, key: str) -> None:
+        await self.remove_all([key])
+
+    async def fetch_items(
+        self, before: int | None, after: int | None, cursor: str | None
+    ) -> dict[str, bytes]:
+        seq: int | None = None
+        if cursor is not None:
+            seq = self._order.seq(cursor)
+            if seq is None:
+                raise ValueError(f"Cursor {cursor} not found")
+
+        if before is None and after is None:
+            return dict(self._items())
+
+        newer: list[tuple[str, bytes]] = []
+        older: list[tuple[str, bytes]] = []
+        if after is not None:
+            newer = self._fetch_rows(after, backward=False, seq=seq)
+            newer.reverse()
+        if before is not None:
+            older = self._fetch_rows(before, backward=True, seq=seq)
+        items = dict(newer)
+        items.update(older)
+        return items
+
+    def _fetch_rows(
+        self, limit: int, backward: bool, seq: int | None
+    ) -> list[tuple[str, bytes]]:
+        rows: list[tuple[str, bytes]] = []
+        for _, key in self._order.iterate(seq, backward):
+            if len(rows) >= limit:
+                break
+            rows.append((key, self._read(key)))
+        return rows
+
+    async def fetch_page(
+        self, limit: int, backward: bool, cursor: str | None
+    ) -> TablePage[bytes]:
+        seq: int | None = None
+        if cursor is not None:
+            seq = self._decode_cursor(cursor)
+        rows: list[tuple[int, str]] = []
+        for row in self._order.iterate(seq, backward, inclusive=False):
+            if len(rows) >= limit:
+                break
+            rows.append(row)
+        next_cursor: str | None = None
+        if len(rows) == limit:
+            next_cursor = f"{self._generation}:{rows[-1][0]}"
+        return TablePage(
+            items={key: self._read(key) for _, key in rows},
+            cursor=next_cursor,
+        )
+
+    def _decode_cursor(self, cursor: str) -> int:
+        generation, sep, seq = cursor.partition(":")
+        if not sep or not generation.isdigit() or not seq.isdigit():
+            raise ValueError(f"Invalid cursor {cursor}")
+        if int(generation) != self._generation:
+            raise ValueError(f"Cursor {cursor} expired, table was cleared")
+        return int(seq)
+
+    async def fetch_range(self, start: str, end: str) -> dict[str, bytes]:
+        start_seq = self._order.seq(start)
+        if start_seq is None:
+            raise ValueError(f"start key {start} not found")
+        end_seq = self._order.seq(end)
+        if end_seq is None:
+            raise ValueError(f"end key {end} not found")
+        items: dict[str, bytes] = {}
+        for seq, key in self._order.iterate(start_seq):
+            if seq > end_seq:
+                break
+            items[key] = self._read(key)
+        return items
+
+    async def fetch_by_index(
+        self,
+        index: str,
+        start: IndexValue | None,
+        end: IndexValue | None,
+        limit: int | None,
+        backward: bool,
+    ) -> dict[str, bytes]:
+        table_index = self._indexes.get(index)
+        if table_index is None:
+            raise ValueError(f"Index {index} not found")
+        return jsonquery.fetch_by_index(
+            self._items(), table_index, start, end, limit, backward
+        )
+
+    async def query(self, query: TableQuery) -> dict[str, bytes]:
+        return jsonquery.query_items(self._items(), query)
+
+    async def search(self, query: TableSearchQuery) -> TablePage[bytes]:
+        if self._search is None:
+            raise ValueError("Search is not enabled for this table")
+        offset, limit = jsonquery.search_window(query)
+        rows = jsonquery.search_items(
+            self._items(), self._search, query, offset + limit
+        )
+        return jsonquery.search_page(rows[offset:], offset, limit)
+
+    async def fetch_expired(self, retention: TableRetention, limit: int) -> list[str]:
+        return jsonquery.fetch_expired(self._items(), retention, self._indexes, limit)
+
+    def _consumer_floor(self) -> int:
+        if self._consumers:
+            return min(self._consumers.values())
+        return self._seq
+
+    async def record_changes(self, type: TableChangeType, keys: list[str]) -> None:
+        # Writes number their own changes, only remember the change type
+        if type in ("add", "update"):
+            for key in keys:
+                self._pending_types[key] = type
+
+    async def fetch_changes(self, offset: int, limit: int) -> list[TableChange[bytes]]:
+        start = bisect_right(self._changes, offset, key=lambda change: change[0])
+        changes: list[TableChange[bytes]] = []
+        for seq, type, key in self._changes[start : start + limit]:
+            item: bytes | None = None
+            if type in ("add", "update") and key is not None and key in self._order:
+                item = self._read(key)
+            changes.append(TableChange(offset=seq, type=type, key=key, item=item))
+        return changes
+
+    async def get_consumer_offset(self, consumer: str) -> int:
+        return self._consumers.get(consumer, 0)
+
+    async def set_consumer_offset(self, consumer: str, offset: int) -> None:
+        self._consumers[consumer] = offset
+
+    async def get_consumer_offsets(self) -> dict[str, int]:
+        return dict(self._consumers)
+
+    async def get_last_offset(self) -> int:
+        return self._seq
+
+    async def compact_changes(self) -> int:
+        # Same rules as the sqlite change log: only the latest record per key,
+        # nothing before the last clear and no tombstones every consumer read
+        count = len(self._changes)
+        last_clear = max(
+            (seq for seq, type, _ in self._changes if type == "clear"), default=0
+        )
+        latest: dict[str, int] = {}
+        for seq, _, key in self._changes:
+            if key is not None:
+                latest[key] = seq
+        floor = self._consumer_floor()
+        self._changes = [
+            (seq, type, key)
+            for seq, type, key in self._changes
+            if seq >= last_clear
+            and (key is None or latest[key] == seq)
+            and not (type in ("remove", "clear") and seq <= floor)
+        ]
+        return count - len(self._changes)
+
+    async def fetch_all(self) -> dict[str, bytes]:
+        return dict(self._items())
+
+    async def first(self) -> str | None:
+        for _, key in self._order.iterate():
+            return key
+        return None
+
+    async def last(self) -> str | None:
+        for _, key in self._order.iterate(backward=True):
+            return key
+        return None
+
+    async def size(self) -> int:
+        return len(self._order)
@@ -0,0 +1,550 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import shutil
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from omu.extension.table import (
+    IndexValue,
+    TableChange,
+    TableConfig,
+    TableFilter,
+    TableIndex,
+    TablePage,
+    TableQuery,
+    TableRetention,
+    TableSearchQuery,
+)
+
+from . import jsonquery
+from .sqlitetable import SqliteTableAdapter, json_path_expression
+from .tableadapter import TableAdapter
+
+DEFAULT_MAX_OPEN = 16
+PARTITION_NAME_RE = re.compile(r"[^\w-]")
+# Directory index on the partition of each item, not usable as an index name
+PARTITION_INDEX = "_partition"
+PARTITION_EXPRESSION = json_path_expression("$.partition")
+
+
+def partition_file_name(partition: str) -> str:
+    # Readable prefix for humans, hash so that sanitized names cannot collide
+    digest = hashlib.sha1(partition.encode("utf-8")).hexdigest()[:8]
+    return f"{PARTITION_NAME_RE.sub('_', partition)[:64]}-{digest}"
+
+
+class PartitionedTableAdapter(SqliteTableAdapter):
+    # Items live in one sqlite file per partition key. The inherited data
+    # table is the directory: it maps each key to its partition, keeps the
+    # global insertion order for paging and holds the change log. Directory
+    # values also hold the indexed values of each item, so that index reads
+    # and retention only open the partitions of the items they return.
+    def __init__(self, path: Path) -> None:
+        self._root = path.with_suffix(".parts")
+        self._root.mkdir(parents=True, exist_ok=True)
+        super().__init__(self._root / "directory")
+        self._partition_path: list[str | int] | None = None
+        self._index_paths: dict[str, list[str | int]] = {}
+        self._directory_indexes: dict[str, TableIndex] = {}
+        self._config: TableConfig = {}
+        self._max_open = DEFAULT_MAX_OPEN
+        self._partitions: OrderedDict[str, SqliteTableAdapter] = OrderedDict()
+        # Emptied inside a batch, dropped once it is committed
+        self._emptied: set[str] = set()
+
+    @classmethod
+    def create(cls, path: Path) -> TableAdapter:
+        return cls(path)
+
+    @classmethod
+    def exists(cls, path: Path) -> bool:
+        return path.with_suffix(".parts").is_dir()
+
+    @classmethod
+    def migrate(cls, path: Path) -> bool:
+        # The directory and every partition are sqlite databases
+        migrated = False
+        for database in sorted(path.with_suffix(".parts").glob("*.db")):
+            migrated = SqliteTableAdapter.migrate(database) or migrated
+        return migrated
+
+    def configure(self, config: TableConfig) -> None:
+        # The partition path is stored so that the table opens before its
+        # config arrives, and cannot change once items were partitioned by it
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'partition_path'"
+        ).fetchone()
+        stored_path: str | None = row[0] if row is not None else None
+        partition = config.get("partition")
+        if partition is not None:
+            if stored_path is not None and stored_path != partition["path"]:
+                raise ValueError(
+                    f"Partition path cannot change from {stored_path} "
+                    f"to {partition['path']}"
+                )
+            stored_path = partition["path"]
+            self._conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('partition_path', ?)",
+                (stored_path,),
+            )
+            self._max_open = partition.get("max_open", DEFAULT_MAX_OPEN)
+        if stored_path is not None:
+            self._partition_path = jsonquery.parse_path(stored_path)
+        self._config = config
+        for adapter in self._partitions.values():
+            adapter.configure(config)
+        self._configure_directory(config if partition is not None else None)
+        self._close_idle()
+
+    def _configure_directory(self, config: TableConfig | None) -> None:
+        # Like the partition path, the directory keeps its indexes until a
+        # config with a partition arrives
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'directory'"
+        ).fetchone()
+        stored: TableConfig | None = json.loads(row[0]) if row is not None else None
+        if config is None:
+            config = stored or {}
+        indexes = config.get("indexes", {})
+        if PARTITION_INDEX in indexes:
+            raise ValueError(f"Index name {PARTITION_INDEX} is reserved")
+        self._directory_indexes = indexes
+        self._index_paths = {
+            name: jsonquery.parse_path(index["path"]) for name, index in indexes.items()
+        }
+        directory: TableConfig = {"indexes": {**indexes}}
+        if "retention" in config:
+            directory["retention"] = config["retention"]
+        if stored is None or stored.get("indexes", {}) != indexes:
+            self._rebuild_directory(stored is None)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('directory', ?)",
+            (json.dumps(directory, sort_keys=True),),
+        )
+        directory_indexes: dict[str, TableIndex] = {
+            name: {**index, "path": f"$.indexes.{name}"}
+            for name, index in indexes.items()
+        }
+        directory_indexes[PARTITION_INDEX] = {"path": "$.partition"}
+        super().configure({**directory, "indexes": directory_indexes})
+
+    def _rebuild_directory(self, legacy: bool) -> None:
+        # Directory values of other indexes, or only the partition name in
+        # directories written before they held indexed values
+        self._conn.execute("DROP INDEX IF EXISTS directory_partition")
+        for name in self._expression_indexes():
+            self._conn.execute(f'DROP INDEX "{name}"')
+        _cursor = self._conn.execute("SELECT key, value FROM data")
+        groups: dict[str, list[str]] = {}
+        for key, value in _cursor.fetchall():
+            partition = value.decode("utf-8") if legacy else self._entry(value)
+            groups.setdefault(partition, []).append(key)
+        for partition, keys in groups.items():
+            adapter = self._open(partition)
+            for start in range(0, len(keys), 500):
+                _cursor = adapter._conn.execute(
+                    "SELECT key, value FROM data WHERE key IN "
+                    f"({','.join('?' for _ in keys[start : start + 500])})",
+                    keys[start : start + 500],
+                )
+                self._conn.executemany(
+                    "UPDATE data SET value = ? WHERE key = ?",
+                    (
+                        (self._directory_value(partition, adapter._decode(value)), key)
+                        for key, value in _cursor.fetchall()
+                    ),
+                )
+        self._conn.commit()
+
+    def _directory_value(self, partition: str, value: bytes) -> bytes:
+        item = json.loads(value)
+        indexes = {
+            name: jsonquery.extract_json(item, path)
+            for name, path in self._index_paths.items()
+        }
+        return json.dumps(
+            {"partition": partition, "indexes": indexes},
+            separators=(",", ":"),
+            ensure_ascii=False,
+        ).encode()
+
+    def _entry(self, value: bytes) -> str:
+        # Partition of a directory value
+        return json.loads(value)["partition"]
+
+    def fetch_latest(self, limit: int) -> dict[str, bytes] | None:
+        # Items are resolved through partitions opened on the loop
+        return None
+
+    def partition_of(self, value: bytes) -> str:
+        if self._partition_path is None:
+            raise ValueError("Partitioned table is not configured")
+        item = json.loads(value)
+        partition = jsonquery.sql_value(
+            jsonquery.extract_json(item, self._partition_path)
+        )
+        return "" if partition is None else str(partition)
+
+    def _open(self, partition: str) -> SqliteTableAdapter:
+        adapter = self._partitions.get(partition)
+        if adapter is not None:
+            self._partitions.move_to_end(partition)
+            return adapter
+        adapter = SqliteTableAdapter(self._root / partition_file_name(partition))
+        adapter.configure(self._config)
+        adapter._batch_depth = self._batch_depth
+        self._partitions[partition] = adapter
+        self._close_idle()
+        return adapter
+
+    def _close_idle(self) -> None:
+        # Closing commits, so partitions in a batch stay open until its end
+        if self._batch_depth:
+            return
+        while len(self._partitions) > max(self._max_open, 1):
+            _, adapter = self._partitions.popitem(last=False)
+            adapter._database.close()
+
+    def _drop(self, partition: str) -> None:
+        adapter = self._partitions.pop(partition, None)
+        if adapter is None:
+            adapter = SqliteTableAdapter(self._root / partition_file_name(partition))
+        adapter._database.close()
+        adapter._path.with_suffix(".db").unlink(missing_ok=True)
+
+    def _all_partitions(self) -> list[str]:
+        _cursor = self._conn.execute(
+            f"SELECT DISTINCT {PARTITION_EXPRESSION} FROM data "
+            f"ORDER BY {PARTITION_EXPRESSION}"
+        )
+        return [row[0] for row in _cursor.fetchall()]
+
+    def _known_partitions(self, partitions: list[str]) -> list[str]:
+        # Partitions that hold items, reads never create the others
+        _cursor = self._conn.execute(
+            f"SELECT DISTINCT {PARTITION_EXPRESSION} FROM data "
+            f"WHERE {PARTITION_EXPRESSION} IN ({','.join('?' for _ in partitions)})",
+            partitions,
+        )
+        known = {row[0] for row in _cursor.fetchall()}
+        return [
+            partition for partition in dict.fromkeys(partitions) if partition in known
+        ]
+
+    def _group(self, directory: Mapping[str, bytes]) -> dict[str, list[str]]:
+        groups: dict[str, list[str]] = {}
+        for key, value in directory.items():
+            groups.setdefault(self._entry(value), []).append(key)
+        return groups
+
+    async def _resolve(self, directory: Mapping[str, bytes]) -> dict[str, bytes]:
+        # Values come from the partitions, the order from the directory
+        values: dict[str, bytes] = {}
+        for partition, keys in self._group(directory).items():
+            values.update(await self._open(partition).get_many(keys))
+        return {key: values[key] for key in directory if key in values}
+
+    def _positions(self, keys: Iterable[str]) -> dict[str, int]:
+        keys = list(keys)
+        _cursor = self._conn.execute(
+            f"SELECT key, id FROM data WHERE key IN ({','.join('?' for _ in keys)})",
+            keys,
+        )
+        return dict(_cursor.fetchall())
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        # Partitions are separate databases, each commits once at the end
+        for adapter in self._partitions.values():
+            adapter._batch_depth += 1
+        try:
+            with super().batch():
+                yield
+        except BaseException:
+            self._end_partition_batch(rollback=True)
+            raise
+        self._end_partition_batch(rollback=False)
+
+    def _end_partition_batch(self, rollback: bool) -> None:
+        for adapter in self._partitions.values():
+            adapter._batch_depth -= 1
+            if adapter._batch_depth:
+                continue
+            if rollback:
+                adapter._conn.rollback()
+            else:
+                adapter._conn.commit()
+        if self._batch_depth:
+            return
+        emptied = self._emptied
+        self._emptied = set()
+        if not rollback:
+            self._drop_emptied(emptied)
+        self._close_idle()
+
+    def _drop_emptied(self, partitions: Iterable[str]) -> None:
+        # Drops the partitions left without items in the directory. Dropping a
+        # file cannot be rolled back, so inside a batch it waits for the commit.
+        partitions = list(partitions)
+        if not partitions:
+            return
+        if self._batch_depth:
+            self._emptied.update(partitions)
+            return
+        known = set(self._known_partitions(partitions))
+        for partition in set(partitions) - known:
+            self._drop(partition)
+
+    async def store(self) -> None:
+        for adapter in self._partitions.values():
+            await adapter.store()
+
+    async def close(self) -> None:
+        for adapter in self._partitions.values():
+            await adapter.close()
+        self._partitions.clear()
+        await super().close()
+
+    async def drop(self) -> None:
+        await self.close()
+        shutil.rmtree(self._root, ignore_errors=True)
+
+    async def get(self, key: str) -> bytes | None:
+        entry = await super().get(key)
+        if entry is None:
+            return None
+        return await self._open(self._entry(entry)).get(key)
+
+    async def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        return await self._resolve(await super().get_many(keys))
+
+    async def set(self, key: str, value: bytes) -> None:
+        await self.set_all({key: value})
+
+    async def set_all(self, items: Mapping[str, bytes]) -> None:
+        previous = self._group(await super().get_many(list(items)))
+        groups: dict[str, dict[str, bytes]] = {}
+        directory: dict[str, bytes] = {}
+        for key, value in items.items():
+            partition = self.partition_of(value)
+            groups.setdefault(partition, {})[key] = value
+            directory[key] = self._directory_value(partition, value)
+        left: list[str] = []
+        for partition, keys in previous.items():
+            # Items whose partition key changed move to their new partition
+            moved = [key for key in keys if key not in groups.get(partition, {})]
+            if moved:
+                await self._open(partition).remove_all(moved)
+                left.append(partition)
+        for partition, partition_items in groups.items():
+            await self._open(partition).set_all(partition_items)
+        await super().set_all(directory)
+        self._drop_emptied(left)
+
+    async def remove(self, key: str) -> None:
+        await self.remove_all([key])
+
+    async def remove_all(self, keys: list[str]) -> None:
+        groups = self._group(await super().get_many(keys))
+        for partition, partition_keys in groups.items():
+            await self._open(partition).remove_all(partition_keys)
+        await super().remove_all(keys)
+        self._drop_emptied(groups)
+
+    async def fetch_items(
+        self, before: int | None, after: int | None, cursor: str | None
+    ) -> dict[str, bytes]:
+        return await self._resolve(await super().fetch_items(before, after, cursor))
+
+    async def fetch_page(
+        self, limit: int, backward: bool, cursor: str | None
+    ) -> TablePage[bytes]:
+        page = await super().fetch_page(limit, backward, cursor)
+        return TablePage(items=await self._resolve(page.items), cursor=page.cursor)
+
+    async def fetch_range(self, start: str, end: str) -> dict[str, bytes]:
+        return await self._resolve(await super().fetch_range(start, end))
+
+    async def fetch_all(self) -> dict[str, bytes]:
+        _cursor = self._conn.execute("SELECT key, value FROM data ORDER BY id")
+        return await self._resolve(dict(_cursor.fetchall()))
+
+    async def fetch_by_index(
+        self,
+        index: str,
+        start: IndexValue | None,
+        end: IndexValue | None,
+        limit: int | None,
+        backward: bool,
+    ) -> dict[str, bytes]:
+        if index == PARTITION_INDEX:
+            raise ValueError(f"Index {index} not found")
+        directory = await super().fetch_by_index(index, start, end, limit, backward)
+        return await self._resolve(directory)
+
+    async def query(self, query: TableQuery) -> dict[str, bytes]:
+        fields = query.get("fields")
+        order_by = query.get("order_by")
+        if not query.get("filters"):
+            directory_order = self._directory_order(order_by)
+            if order_by is None or directory_order is not None:
+                # The directory has the order, only returned items are read
+                directory_query: TableQuery = {"backward": query.get("backward", False)}
+                if directory_order is not None:
+                    directory_query["order_by"] = directory_order
+                if "limit" in query:
+                    directory_query["limit"] = query["limit"]
+                items = await self._resolve(await super().query(directory_query))
+                if fields is None:
+                    return items
+                return {
+                    key: jsonquery.project(json.loads(value), fields)
+                    for key, value in items.items()
+                }
+        partition_query: TableQuery = {**query}
+        if fields is not None and order_by is not None:
+            # The sort value may not be projected, merge on whole items
+            del partition_query["fields"]
+        rows: dict[str, bytes] = {}
+        for partition in self._query_partitions(query.get("filters", [])):
+            rows.update(await self._open(partition).query(partition_query))
+        order_path = jsonquery.parse_path(order_by) if order_by is not None else None
+        merged = self._merge(
+            rows,
+            (lambda item: jsonquery.extract_json(item, order_path))
+            if order_path is not None
+            else None,
+            query.get("limit"),
+            query.get("backward", False),
+        )
+        if fields is None or order_by is None:
+            return merged
+        return {
+            key: jsonquery.project(json.loads(value), fields)
+            for key, value in merged.items()
+        }
+
+    def _directory_order(self, order_by: str | None) -> str | None:
+        # Path of an indexed value in the directory
+        if order_by is None:
+            return None
+        path = jsonquery.parse_path(order_by)
+        for name, index_path in self._index_paths.items():
+            exists = self._directory_indexes[name].get("exists", False)
+            if index_path == path and not exists:
+                return f"$.indexes.{name}"
+        return None
+
+    def _query_partitions(self, filters: list[TableFilter]) -> list[str]:
+        # A filter on the partition key reads only the matching partitions
+        if self._partition_path is not None:
+            for filter in filters:
+                if jsonquery.parse_path(filter["path"]) != self._partition_path:
+                    continue
+                value = filter.get("value")
+                if filter["op"] == "eq" and value is not None:
+                    return self._known_partitions([str(jsonquery.sql_value(value))])
+                if filter["op"] == "in" and isinstance(value, list):
+                    return self._known_partitions(
+                        [str(jsonquery.sql_value(item)) for item in value]
+                    )
+        return self._all_partitions()
+
+    def _merge(
+        self,
+        rows: dict[str, bytes],
+        sort_value: Callable[[Any], Any] | None,
+        limit: int | None,
+        backward: bool,
+    ) -> dict[str, bytes]:
+        positions = self._positions(rows)
+        entries: list[tuple[jsonquery.SortKey, int, str]] = []
+        for key, value in rows.items():
+            order = (0, 0)
+            if sort_value is not None:
+                order = jsonquery.sort_key(sort_value(json.loads(value)))
+            entries.append((order, positions.get(key, 0), key))
+        entries.sort(reverse=backward)
+        if limit is not None:
+            entries = entries[:limit]
+        return {key: rows[key] for _, _, key in entries}
+
+    async def search(self, query: TableSearchQuery) -> TablePage[bytes]:
+        offset, limit = jsonquery.search_window(query)
+        search = self._config.get("search")
+        if search is None:
+            raise ValueError("Search is not enabled for this table")
+        partitions = self._query_partitions(query.get("filters", []))
+        rows: list[jsonquery.SearchRow] = []
+        for partition in partitions:
+            rows.extend(self._open(partition).search_rows(query, offset + limit))
+        # Positions within the directory. BM25 ranks depend on the statistics
+        # of each index, so across partitions the candidates are ranked by
+        # their number of matches like in the in-memory adapter.
+        positions = self._positions(key for _, _, key, _ in rows)
+        needle = query["text"].strip().casefold()
+        rows = [
+            (
+                rank
+                if len(partitions) == 1
+                else -jsonquery.search_text(json.loads(value), search)
+                .casefold()
+                .count(needle),
+                positions.get(key, 0),
+                key,
+                value,
+            )
+            for rank, _, key, value in rows
+        ]
+        jsonquery.sort_search_rows(rows, query)
+        return jsonquery.search_page(rows[offset : offset + limit], offset, limit)
+
+    async def fetch_expired(self, retention: TableRetention, limit: int) -> list[str]:
+        # The directory has the indexed values, no partition is opened
+        for name in ("timestamp_index", "partition_index"):
+            if retention.get(name) == PARTITION_INDEX:
+                raise ValueError(f"Index {PARTITION_INDEX} not found")
+        return await super().fetch_expired(retention, limit)
+
+    async def compact(self, pages: int) -> int:
+        remaining = await super().compact(pages)
+        for adapter in tuple(self._partitions.values()):
+            remaining += await adapter.compact(pages)
+        return remaining
+
+    async def fetch_changes(self, offset: int, limit: int) -> list[TableChange[bytes]]:
+        changes = await super().fetch_changes(offset, limit)
+        directory = {
+            change.key: change.item
+            for change in changes
+            if change.key is not None and change.item is not None
+        }
+        values = await self._resolve(directory)
+        return [
+            TableChange(
+                offset=change.offset,
+                type=change.type,
+                key=change.key,
+                item=values.get(change.key) if change.item is not None else None,
+            )
+            if change.key is not None
+            else change
+            for change in changes
+        ]
+
+    async def clear(self) -> None:
+        if self._batch_depth:
+            # Cleared inside the batch, dropped once it is committed
+            for partition in self._all_partitions():
+                await self._open(partition).clear()
+                self._emptied.add(partition)
+        else:
+            for partition in (*self._all_partitions(), *self._partitions):
+                self._drop(partition)
+        await super().clear()
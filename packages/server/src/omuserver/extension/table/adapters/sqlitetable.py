@@ -1,16 +1,137 @@
 from __future__ import annotations
 
+import json
+import re
 import sqlite3
-from collections.abc import Mapping
+from collections.abc import Iterator, Mapping
+from contextlib import closing, contextmanager
+from datetime import UTC, datetime, timedelta
 from pathlib import Path
+from typing import Any, Literal
 
+from omu.extension.table import (
+    IndexValue,
+    TableChange,
+    TableChangeType,
+    TableCompression,
+    TableConfig,
+    TableFilter,
+    TableIndex,
+    TablePage,
+    TableQuery,
+    TableRetention,
+    TableSearch,
+    TableSearchQuery,
+)
+
+from omuserver.database import DATABASES
+
+from . import jsonquery
+from .compression import (
+    TRAIN_MIN_SAMPLES,
+    TRAIN_SAMPLES,
+    ValueCodec,
+    decode_value,
+    train_dictionary,
+)
+from .jsonquery import JSON_PATH_RE
 from .tableadapter import TableAdapter
 
+INDEX_NAME_RE = re.compile(r"\w+")
+# Index on the julian day of the retention timestamp, user indexes are index_*
+AGE_INDEX = "retention_age"
+# Partitions checked for max_rows_per_partition per fetch_expired call
+RETENTION_PARTITIONS = 100
+# Changes checked per compact_changes call
+COMPACT_CHANGES_BATCH = 10_000
+# Rows rewritten at once when compression is changed
+COMPRESSION_BATCH = 1000
+
+
+# Compressed values are read through omu_inflate
+VALUE_COLUMN = "value"
+INFLATED_COLUMN = "omu_inflate(value)"
+
+
+def json_path_expression(path: str, column: str = VALUE_COLUMN) -> str:
+    if not JSON_PATH_RE.fullmatch(path):
+        raise ValueError(f"Invalid JSON path {path}")
+    return f"json_extract(CAST({column} AS TEXT), '{path}')"
+
+
+def index_expression(index: TableIndex, column: str = VALUE_COLUMN) -> str:
+    expression = json_path_expression(index["path"], column)
+    if index.get("exists", False):
+        return f"({expression} IS NOT NULL)"
+    return expression
+
+
+COMPARISON_OPERATORS = {
+    "eq": "=",
+    "ne": "!=",
+    "lt": "<",
+    "le": "<=",
+    "gt": ">",
+    "ge": ">=",
+}
+
+
+def filter_expression(
+    filter: TableFilter, params: list[Any], column: str = VALUE_COLUMN
+) -> str:
+    expression = json_path_expression(filter["path"], column)
+    op = filter["op"]
+    value = filter.get("value")
+    if op in COMPARISON_OPERATORS:
+        if value is None:
+            if op == "eq":
+                return f"{expression} IS NULL"
+            if op == "ne":
+                return f"{expression} IS NOT NULL"
+            raise ValueError(f"Operator {op} requires a value")
+        params.append(value)
+        return f"{expression} {COMPARISON_OPERATORS[op]} ?"
+    if op == "exists":
+        # Same text as index_expression so that an exists index is used
+        params.append(value is None or bool(value))
+        return f"({expression} IS NOT NULL) = ?"
+    if op == "prefix":
+        if not isinstance(value, str):
+            raise ValueError("Operator prefix requires a string value")
+        if not value:
+            return f"{expression} >= ''"
+        params.append(value)
+        params.append(value[:-1] + chr(ord(value[-1]) + 1))
+        return f"{expression} >= ? AND {expression} < ?"
+    if op == "in":
+        if not isinstance(value, list) or not value:
+            raise ValueError("Operator in requires a non-empty list value")
+        params.extend(value)
+        placeholders = ", ".join("?" * len(value))
+        return f"{expression} IN ({placeholders})"
+    raise ValueError(f"Unknown filter operator {op}")
+
+
+def projection_expression(fields: list[str], column: str = VALUE_COLUMN) -> str:
+    arguments: list[str] = []
+    for field in fields:
+        if not JSON_PATH_RE.fullmatch(field):
+            raise ValueError(f"Invalid JSON path {field}")
+        arguments.append(f"'{field}', CAST({column} AS TEXT) -> '{field}'")
+    return f"json_object({', '.join(arguments)})"
+
 
 class SqliteTableAdapter(TableAdapter):
     def __init__(self, path: Path) -> None:
         self._path = path
-        self._conn = sqlite3.connect(path.with_suffix(".db"))
+        self._database = DATABASES.open(path.with_suffix(".db"))
+        self._dictionaries: dict[int, bytes] = {}
+        self._codec: ValueCodec | None = None
+        self._database.on_connect.append(self._register_functions)
+        if self._database.connected:
+            self._register_functions(self._conn)
+        # Only takes effect on new databases, see compact for existing ones
+        self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
         self._conn.execute(
             # index, key, value
             "CREATE TABLE IF NOT EXISTS data ("
@@ -19,58 +140,338 @@ class SqliteTableAdapter(TableAdapter):
             "value BLOB"
             ")"
         )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)"
+        )
+        self._conn.execute(
+            # offset, change type, key; values are read from data
+            "CREATE TABLE IF NOT EXISTS changes ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            "type TEXT,"
+            "key TEXT"
+            ")"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS changes_key ON changes (key, id)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS consumers ("
+            "name TEXT PRIMARY KEY,"
+            "position INTEGER"
+            ")"
+        )
+        self._conn.execute(
+            # compression dictionaries, referenced by id from stored values
+            "CREATE TABLE IF NOT EXISTS dictionaries (id INTEGER PRIMARY KEY,data BLOB)"
+        )
         self._conn.commit()
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'generation'"
+        ).fetchone()
+        self._generation: int = row[0]
+        self._indexes: dict[str, str] = {}
+        # Where the bounded retention and compaction scans continue
+        self._partition_after: tuple[Any] | None = None
+        self._changes_after = 0
+        self._batch_depth = 0
+        # Keep an existing search table current until the adapter is configured
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'search'"
+        ).fetchone()
+        self._search: TableSearch | None = json.loads(row[0]) if row else None
+        # Stored values stay readable until the adapter is configured
+        _cursor = self._conn.execute("SELECT id, data FROM dictionaries")
+        self._dictionaries.update(_cursor.fetchall())
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'compression'"
+        ).fetchone()
+        if row is not None:
+            self._codec = ValueCodec(json.loads(row[0]), self._dictionaries)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return self._database.connection
+
+    @property
+    def _column(self) -> str:
+        return VALUE_COLUMN if self._codec is None else INFLATED_COLUMN
+
+    def _register_functions(self, connection: sqlite3.Connection) -> None:
+        connection.create_function("omu_inflate", 1, self._decode, deterministic=True)
+
+    def _encode(self, value: bytes) -> bytes:
+        if self._codec is None:
+            return value
+        return self._codec.encode(value)
+
+    def _decode(self, value: bytes) -> bytes:
+        if self._codec is None:
+            return value
+        return self._codec.decode(value)
+
+    def _decode_items(self, rows: list[tuple[str, bytes]]) -> dict[str, bytes]:
+        return {key: self._decode(value) for key, value in rows}
 
     @classmethod
     def create(cls, path: Path) -> TableAdapter:
         return cls(path)
 
+    @classmethod
+    def exists(cls, path: Path) -> bool:
+        return path.with_suffix(".db").exists()
+
+    def configure(self, config: TableConfig) -> None:
+        # Every lookup of an index on compressed values would decompress
+        if "compression" in config and config.get("indexes"):
+            raise ValueError("Compressed tables cannot have indexes")
+        self._configure_compression(config.get("compression"))
+        statements: dict[str, str] = {}
+        expressions: dict[str, str] = {}
+        for name, index in config.get("indexes", {}).items():
+            if not INDEX_NAME_RE.fullmatch(name):
+                raise ValueError(f"Invalid index name {name}")
+            expressions[name] = index_expression(index)
+            statements[f"index_{name}"] = (
+                f'CREATE INDEX "index_{name}" ON data ({expressions[name]}, id)'
+            )
+        retention = config.get("retention", {})
+        timestamp_index = retention.get("timestamp_index")
+        if "max_age" in retention and timestamp_index in expressions:
+            # Timestamps with different offsets only compare as julian days
+            expression = f"julianday({expressions[timestamp_index]})"
+            statements[AGE_INDEX] = (
+                f'CREATE INDEX "{AGE_INDEX}" ON data ({expression}, id)'
+            )
+        existing = self._expression_indexes()
+        for name, sql in tuple(existing.items()):
+            if statements.get(name) != sql:
+                self._conn.execute(f'DROP INDEX "{name}"')
+                del existing[name]
+        for name, statement in statements.items():
+            if name not in existing:
+                self._conn.execute(statement)
+        self._conn.commit()
+        self._indexes = expressions
+        self._partition_after = None
+        self._configure_search(config.get("search"))
+
+    def _expression_indexes(self) -> dict[str, str]:
+        _cursor = self._conn.execute(
+            "SELECT name, sql FROM sqlite_master "
+            "WHERE type = 'index' AND tbl_name = 'data' "
+            "AND (name LIKE 'index_%' OR name = ?)",
+            (AGE_INDEX,),
+        )
+        return dict(_cursor.fetchall())
+
+    def _configure_compression(self, compression: TableCompression | None) -> None:
+        spec = (
+            json.dumps(compression, sort_keys=True) if compression is not None else None
+        )
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'compression'"
+        ).fetchone()
+        if (row[0] if row is not None else None) == spec:
+            return
+        # Indexes read values through the old codec, configure recreates them
+        for name in self._expression_indexes():
+            self._conn.execute(f'DROP INDEX "{name}"')
+        self._conn.execute("DELETE FROM meta WHERE key = 'compression'")
+        # Stored values are decoded with any dictionary until the rewrite ends
+        if compression is None:
+            self._codec = None
+        else:
+            self._codec = ValueCodec(compression, self._dictionaries)
+            _cursor = self._conn.execute(
+                "SELECT value FROM data ORDER BY id DESC LIMIT ?", (TRAIN_SAMPLES,)
+            )
+            self._train([decode_value(row[0], self._dictionaries) for row in _cursor])
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('compression', ?)", (spec,)
+            )
+        # Row ids are kept, so search entries and changes stay valid
+        last_id = 0
+        while True:
+            rows = self._conn.execute(
+                "SELECT id, value FROM data WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, COMPRESSION_BATCH),
+            ).fetchall()
+            if not rows:
+                break
+            self._conn.executemany(
+                "UPDATE data SET value = ? WHERE id = ?",
+                (
+                    (self._encode(decode_value(value, self._dictionaries)), row_id)
+                    for row_id, value in rows
+                ),
+            )
+            last_id = rows[-1][0]
+        if compression is None:
+            self._conn.execute("DELETE FROM dictionaries")
+            self._dictionaries.clear()
+        self._conn.commit()
+
+    def _train(self, samples: list[bytes]) -> None:
+        # New values use the dictionary, stored ones keep the one they used
+        assert self._codec is not None
+        if self._codec.trained or len(samples) < TRAIN_MIN_SAMPLES:
+            return
+        dictionary = train_dictionary(samples, self._codec.dictionary_size)
+        if not dictionary:
+            return
+        dictionary_id = self._codec.add_dictionary(dictionary)
+        self._conn.execute(
+            "INSERT INTO dictionaries (id, data) VALUES (?, ?)",
+            (dictionary_id, dictionary),
+        )
+
+    def _configure_search(self, search: TableSearch | None) -> None:
+        spec = json.dumps(search, sort_keys=True) if search is not None else None
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'search'"
+        ).fetchone()
+        if (row[0] if row is not None else None) == spec:
+            self._search = search
+            return
+        self._conn.execute("DROP TABLE IF EXISTS search")
+        self._conn.execute("DELETE FROM meta WHERE key = 'search'")
+        self._search = search
+        if search is not None:
+            tokenizer = search.get("tokenizer", "trigram")
+            if tokenizer not in ("trigram", "unicode61"):
+                raise ValueError(f"Unknown tokenizer {tokenizer}")
+            jsonquery.parse_path(search["path"])
+            self._conn.execute(
+                f"CREATE VIRTUAL TABLE search USING fts5(text, tokenize='{tokenizer}')"
+            )
+            rows = self._conn.execute("SELECT id, value FROM data")
+            self._conn.executemany(
+                "INSERT INTO search (rowid, text) VALUES (?, ?)",
+                (
+                    (row_id, self._search_text(self._decode(value)))
+                    for row_id, value in rows
+                ),
+            )
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('search', ?)", (spec,)
+            )
+        self._conn.commit()
+
+    def _search_text(self, value: bytes) -> str:
+        assert self._search is not None
+        try:
+            item = json.loads(value)
+        except ValueError:
+            return ""
+        return jsonquery.search_text(item, self._search)
+
+    def _unindex_search(self, keys: list[str]) -> None:
+        # Replaced rows get a new id, so their old entries go first
+        if self._search is None:
+            return
+        self._conn.execute(
+            "DELETE FROM search WHERE rowid IN ("
+            f"SELECT id FROM data WHERE key IN ({','.join('?' for _ in keys)})"
+            ")",
+            keys,
+        )
+
+    def _index_search(self, items: Mapping[str, bytes]) -> None:
+        if self._search is None:
+            return
+        self._conn.executemany(
+            "INSERT INTO search (rowid, text) SELECT id, ? FROM data WHERE key = ?",
+            ((self._search_text(value), key) for key, value in items.items()),
+        )
+
+    def _commit(self) -> None:
+        if self._batch_depth == 0:
+            self._conn.commit()
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        self._batch_depth += 1
+        try:
+            yield
+        except BaseException:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._conn.rollback()
+                (self._generation,) = self._conn.execute(
+                    "SELECT value FROM meta WHERE key = 'generation'"
+                ).fetchone()
+            raise
+        self._batch_depth -= 1
+        self._commit()
+
     async def store(self) -> None:
         pass
 
     async def load(self) -> None:
         pass
 
+    async def close(self) -> None:
+        self._database.close()
+
+    async def drop(self) -> None:
+        self._database.close()
+        self._path.with_suffix(".db").unlink(missing_ok=True)
+
     async def get(self, key: str) -> bytes | None:
         cursor = self._conn.execute("SELECT value FROM data WHERE key = ?", (key,))
         row = cursor.fetchone()
         if row is None:
             return None
-        return row[0]
+        return self._decode(row[0])
 
     async def get_many(self, keys: list[str]) -> dict[str, bytes]:
         cursor = self._conn.execute(
             f"SELECT key, value FROM data WHERE key IN ({','.join('?' for _ in keys)})",
             keys,
         )
-        rows = cursor.fetchall()
-        return {row[0]: row[1] for row in rows}
+        return self._decode_items(cursor.fetchall())
+
+    async def existing_keys(self, keys: list[str]) -> list[str]:
+        cursor = self._conn.execute(
+            f"SELECT key FROM data WHERE key IN ({','.join('?' for _ in keys)})",
+            keys,
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        return [key for key in dict.fromkeys(keys) if key in existing]
 
     async def set(self, key: str, value: bytes) -> None:
+        self._unindex_search([key])
         self._conn.execute(
             "INSERT OR REPLACE INTO data (key, value) VALUES (?, ?)",
-            (key, value),
+            (key, self._encode(value)),
         )
-        self._conn.commit()
+        self._index_search({key: value})
+        self._commit()
 
     async def set_all(self, items: Mapping[str, bytes]) -> None:
-        query = list(items.items())
+        self._unindex_search(list(items))
         self._conn.executemany(
             "INSERT OR REPLACE INTO data (key, value) VALUES (?, ?)",
-            query,
+            ((key, self._encode(value)) for key, value in items.items()),
         )
-        self._conn.commit()
+        self._index_search(items)
+        self._commit()
 
     async def remove(self, key: str) -> None:
+        self._unindex_search([key])
         self._conn.execute("DELETE FROM data WHERE key = ?", (key,))
-        self._conn.commit()
+        self._commit()
 
     async def remove_all(self, keys: list[str]) -> None:
+        self._unindex_search(keys)
         self._conn.execute(
             f"DELETE FROM data WHERE key IN ({','.join('?' for _ in keys)})",
             keys,
         )
-        self._conn.commit()
+        self._commit()
 
     async def fetch_items(
         self, before: int | None, after: int | None, cursor: str | None
@@ -85,61 +486,441 @@ class SqliteTableAdapter(TableAdapter):
 
         if before is None and after is None:
             _cursor = self._conn.execute("SELECT key, value FROM data")
-            return {row[0]: (row[1]) for row in _cursor.fetchall()}
+            return self._decode_items(_cursor.fetchall())
 
-        items: dict[int, tuple[str, bytes]] = {}
-        if before is not None:
-            if cursor_id is None:
-                _cursor = self._conn.execute(
-                    "SELECT id, key, value FROM data ORDER BY id DESC LIMIT ?",
-                    (before,),
-                )
-            else:
-                _cursor = self._conn.execute(
-                    "SELECT id, key, value FROM data WHERE id <= ? "
-                    "ORDER BY id DESC LIMIT ?",
-                    (cursor_id, before),
-                )
-            items.update({row[0]: (row[1], (row[2])) for row in _cursor.fetchall()})
+        # Both ranges come back already ordered by id, so the newest-first
+        # result is the ascending range reversed followed by the descending one.
+        newer: list[tuple[str, bytes]] = []
+        older: list[tuple[str, bytes]] = []
         if after is not None:
-            if cursor_id is None:
-                _cursor = self._conn.execute(
-                    "SELECT id, key, value FROM data ORDER BY id LIMIT ?",
-                    (after,),
-                )
-            else:
-                _cursor = self._conn.execute(
-                    "SELECT id, key, value FROM data WHERE id >= ? "
-                    "ORDER BY id ASC LIMIT ?",
-                    (cursor_id, after),
-                )
-            items.update({row[0]: (row[1], (row[2])) for row in _cursor.fetchall()})
-        return {key: value for _, (key, value) in sorted(items.items(), reverse=True)}
+            newer = self._fetch_rows(after, backward=False, start_id=cursor_id)
+            newer.reverse()
+        if before is not None:
+            older = self._fetch_rows(before, backward=True, start_id=cursor_id)
+        items = dict(newer)
+        items.update(older)
+        return items
+
+    async def fetch_page(
+        self, limit: int, backward: bool, cursor: str | None
+    ) -> TablePage[bytes]:
+        start_id: int | None = None
+        if cursor is not None:
+            start_id = self._decode_cursor(cursor)
+        order = "DESC" if backward else "ASC"
+        if start_id is None:
+            _cursor = self._conn.execute(
+                f"SELECT id, key, value FROM data ORDER BY id {order} LIMIT ?",
+                (limit,),
+            )
+        else:
+            op = "<" if backward else ">"
+            _cursor = self._conn.execute(
+                f"SELECT id, key, value FROM data WHERE id {op} ? "
+                f"ORDER BY id {order} LIMIT ?",
+                (start_id, limit),
+            )
+        rows = _cursor.fetchall()
+        next_cursor: str | None = None
+        if len(rows) == limit:
+            next_cursor = self._encode_cursor(rows[-1][0])
+        return TablePage(
+            items={row[1]: self._decode(row[2]) for row in rows},
+            cursor=next_cursor,
+        )
+
+    def _fetch_rows(
+        self, limit: int, backward: bool, start_id: int | None
+    ) -> list[tuple[str, bytes]]:
+        order = "DESC" if backward else "ASC"
+        if start_id is None:
+            _cursor = self._conn.execute(
+                f"SELECT key, value FROM data ORDER BY id {order} LIMIT ?",
+                (limit,),
+            )
+        else:
+            op = "<=" if backward else ">="
+            _cursor = self._conn.execute(
+                f"SELECT key, value FROM data WHERE id {op} ? "
+                f"ORDER BY id {order} LIMIT ?",
+                (start_id, limit),
+            )
+        return [(key, self._decode(value)) for key, value in _cursor.fetchall()]
+
+    def _encode_cursor(self, row_id: int) -> str:
+        return f"{self._generation}:{row_id}"
+
+    def _decode_cursor(self, cursor: str) -> int:
+        generation, sep, row_id = cursor.partition(":")
+        if not sep or not generation.isdigit() or not row_id.isdigit():
+            raise ValueError(f"Invalid cursor {cursor}")
+        if int(generation) != self._generation:
+            raise ValueError(f"Cursor {cursor} expired, table was cleared")
+        return int(row_id)
 
     async def fetch_range(self, start: str, end: str) -> dict[str, bytes]:
-        start_id: int
-        end_id: int
-        _cursor = self._conn.execute("SELECT id FROM data WHERE key = ?", (start,))
-        row = _cursor.fetchone()
-        if row is None:
+        _cursor = self._conn.execute(
+            "SELECT "
+            "(SELECT id FROM data WHERE key = ?), "
+            "(SELECT id FROM data WHERE key = ?)",
+            (start, end),
+        )
+        start_id, end_id = _cursor.fetchone()
+        if start_id is None:
             raise ValueError(f"start key {start} not found")
-        start_id = row[0]
+        if end_id is None:
+            raise ValueError(f"end key {end} not found")
+
+        _cursor = self._conn.execute(
+            "SELECT key, value FROM data WHERE id >= ? AND id <= ? ORDER BY id",
+            (start_id, end_id),
+        )
+        return self._decode_items(_cursor.fetchall())
+
+    async def fetch_by_index(
+        self,
+        index: str,
+        start: IndexValue | None,
+        end: IndexValue | None,
+        limit: int | None,
+        backward: bool,
+    ) -> dict[str, bytes]:
+        expression = self._indexes.get(index)
+        if expression is None:
+            raise ValueError(f"Index {index} not found")
+        conditions: list[str] = []
+        params: list[IndexValue] = []
+        if start is not None:
+            conditions.append(f"{expression} >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append(f"{expression} <= ?")
+            params.append(end)
+        order = "DESC" if backward else "ASC"
+        query = "SELECT key, value FROM data"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {expression} {order}, id {order}"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        _cursor = self._conn.execute(query, params)
+        return self._decode_items(_cursor.fetchall())
+
+    async def query(self, query: TableQuery) -> dict[str, bytes]:
+        params: list[Any] = []
+        conditions = [
+            filter_expression(filter, params, self._column)
+            for filter in query.get("filters", [])
+        ]
+        fields = query.get("fields")
+        column = (
+            "value" if fields is None else projection_expression(fields, self._column)
+        )
+        statement = f"SELECT key, {column} FROM data"
+        if conditions:
+            statement += " WHERE " + " AND ".join(conditions)
+        order = "DESC" if query.get("backward", False) else "ASC"
+        order_by = query.get("order_by")
+        if order_by is not None:
+            expression = json_path_expression(order_by, self._column)
+            statement += f" ORDER BY {expression} {order}, id {order}"
+        else:
+            statement += f" ORDER BY id {order}"
+        limit = query.get("limit")
+        if limit is not None:
+            statement += " LIMIT ?"
+            params.append(limit)
+        _cursor = self._conn.execute(statement, params)
+        if fields is None:
+            return self._decode_items(_cursor.fetchall())
+        return {row[0]: row[1].encode("utf-8") for row in _cursor.fetchall()}
+
+    async def search(self, query: TableSearchQuery) -> TablePage[bytes]:
+        offset, limit = jsonquery.search_window(query)
+        return jsonquery.search_page(
+            self.search_rows(query, limit, offset), offset, limit
+        )
+
+    def search_rows(
+        self, query: TableSearchQuery, limit: int, offset: int = 0
+    ) -> list[jsonquery.SearchRow]:
+        if self._search is None:
+            raise ValueError("Search is not enabled for this table")
+        text = query["text"].strip()
+        params: list[Any] = []
+        if len(text) < 3 and self._search.get("tokenizer", "trigram") == "trigram":
+            # Trigrams cannot match shorter text, fall back to a scan
+            escaped = re.sub(r"([\\%_])", r"\\\1", text)
+            conditions = ["search.text LIKE ? ESCAPE '\\'"]
+            params.append(f"%{escaped}%")
+            rank = "0"
+        else:
+            # Quoted as one phrase so that user input is never FTS syntax
+            conditions = ["search MATCH ?"]
+            params.append('"' + text.replace('"', '""') + '"')
+            rank = "search.rank"
+        conditions.extend(
+            filter_expression(filter, params, self._column)
+            for filter in query.get("filters", [])
+        )
+        if query.get("order", "rank") == "rank":
+            order = "search.rank, data.id DESC" if rank != "0" else "data.id DESC"
+        else:
+            order = "data.id DESC"
+        _cursor = self._conn.execute(
+            f"SELECT {rank}, data.id, data.key, data.value FROM search "
+            "JOIN data ON data.id = search.rowid "
+            f"WHERE {' AND '.join(conditions)} ORDER BY {order} LIMIT ? OFFSET ?",
+            [*params, limit, offset],
+        )
+        return [
+            (rank, row_id, key, self._decode(value))
+            for rank, row_id, key, value in _cursor.fetchall()
+        ]
+
+    async def fetch_expired(self, retention: TableRetention, limit: int) -> list[str]:
+        keys: dict[str, None] = {}
+        max_rows = retention.get("max_rows")
+        if max_rows is not None:
+            _cursor = self._conn.execute(
+                "SELECT key FROM data WHERE id <= ("
+                "SELECT id FROM data ORDER BY id DESC LIMIT 1 OFFSET ?"
+                ") ORDER BY id LIMIT ?",
+                (max_rows, limit),
+            )
+            keys.update(dict.fromkeys(row[0] for row in _cursor.fetchall()))
+        max_age = retention.get("max_age")
+        if max_age is not None and len(keys) < limit:
+            index = self._retention_index(retention, "timestamp_index")
+            # Same text as the age index that configure creates
+            expression = f"julianday({index})"
+            cutoff = datetime.now(UTC) - timedelta(seconds=max_age)
+            _cursor = self._conn.execute(
+                f"SELECT key FROM data WHERE {expression} < julianday(?) "
+                f"ORDER BY {expression}, id LIMIT ?",
+                (cutoff.isoformat(), limit - len(keys)),
+            )
+            keys.update(dict.fromkeys(row[0] for row in _cursor.fetchall()))
+        max_rows_per_partition = retention.get("max_rows_per_partition")
+        if max_rows_per_partition is not None and len(keys) < limit:
+            expression = self._retention_index(retention, "partition_index")
+            expired = self._fetch_partition_overflow(
+                expression, max_rows_per_partition, limit - len(keys)
+            )
+            keys.update(dict.fromkeys(expired))
+        return list(keys)[:limit]
+
+    def _fetch_partition_overflow(
+        self, expression: str, max_rows: int, limit: int
+    ) -> list[str]:
+        # Walks the partition index a few partitions per call, continuing
+        # where the previous call stopped, instead of numbering every row
+        keys: list[str] = []
+        for _ in range(RETENTION_PARTITIONS):
+            partition = self._next_partition(expression)
+            if partition is None:
+                self._partition_after = None
+                break
+            _cursor = self._conn.execute(
+                f"SELECT key FROM data WHERE {expression} IS ? "
+                "ORDER BY id DESC LIMIT ? OFFSET ?",
+                (partition[0], limit - len(keys), max_rows),
+            )
+            keys.extend(row[0] for row in _cursor.fetchall())
+            if len(keys) >= limit:
+                # Checked again by the next call, after these are removed
+                break
+            self._partition_after = partition
+        return keys
 
-        _cursor = self._conn.execute("SELECT id FROM data WHERE key = ?", (end,))
+    def _next_partition(self, expression: str) -> tuple[Any] | None:
+        if self._partition_after is None:
+            condition, params = "", ()
+        elif self._partition_after[0] is None:
+            condition, params = f"WHERE {expression} IS NOT NULL", ()
+        else:
+            condition, params = f"WHERE {expression} > ?", self._partition_after
+        _cursor = self._conn.execute(
+            f"SELECT {expression} FROM data {condition} ORDER BY {expression} LIMIT 1",
+            params,
+        )
+        return _cursor.fetchone()
+
+    def _retention_index(
+        self,
+        retention: TableRetention,
+        name: Literal["timestamp_index", "partition_index"],
+    ) -> str:
+        index = retention.get(name)
+        if index is None:
+            raise ValueError(f"Retention requires {name}")
+        expression = self._indexes.get(index)
+        if expression is None:
+            raise ValueError(f"Index {index} not found")
+        return expression
+
+    async def compact(self, pages: int) -> int:
+        if self._codec is not None and not self._codec.trained:
+            _cursor = self._conn.execute(
+                "SELECT value FROM data ORDER BY id DESC LIMIT ?", (TRAIN_SAMPLES,)
+            )
+            self._train([self._decode(row[0]) for row in _cursor.fetchall()])
+            self._conn.commit()
+        (free_pages,) = self._conn.execute("PRAGMA freelist_count").fetchone()
+        if free_pages == 0:
+            return 0
+        (auto_vacuum,) = self._conn.execute("PRAGMA auto_vacuum").fetchone()
+        if auto_vacuum != 2:
+            # Freed pages stay in the file until migrate has run
+            return 0
+        # Each step of the pragma frees one page, so drain the cursor
+        self._conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+        (free_pages,) = self._conn.execute("PRAGMA freelist_count").fetchone()
+        return free_pages
+
+    def fetch_latest(self, limit: int) -> dict[str, bytes] | None:
+        # On its own connection, the shared one belongs to the loop
+        uri = f"{self._path.with_suffix('.db').resolve().as_uri()}?mode=ro"
+        with closing(sqlite3.connect(uri, uri=True)) as connection:
+            _cursor = connection.execute(
+                "SELECT key, value FROM data ORDER BY id DESC LIMIT ?", (limit,)
+            )
+            return self._decode_items(_cursor.fetchall())
+
+    @classmethod
+    def migrate(cls, path: Path) -> bool:
+        # Databases created before incremental vacuum need one full VACUUM
+        # for the auto_vacuum mode to take effect. It rewrites the whole file
+        # and fails while another connection uses it, so it is not run on
+        # start.
+        with closing(sqlite3.connect(path.with_suffix(".db"))) as connection:
+            (auto_vacuum,) = connection.execute("PRAGMA auto_vacuum").fetchone()
+            if auto_vacuum == 2:
+                return False
+            connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            connection.execute("VACUUM")
+        return True
+
+    async def record_changes(self, type: TableChangeType, keys: list[str]) -> None:
+        # Committed together with the write that follows
+        if type == "clear":
+            self._conn.execute("INSERT INTO changes (type, key) VALUES ('clear', NULL)")
+            return
+        self._conn.executemany(
+            "INSERT INTO changes (type, key) VALUES (?, ?)",
+            ((type, key) for key in keys),
+        )
+
+    async def fetch_changes(self, offset: int, limit: int) -> list[TableChange[bytes]]:
+        _cursor = self._conn.execute(
+            "SELECT changes.id, changes.type, changes.key, data.value FROM changes "
+            "LEFT JOIN data ON data.key = changes.key "
+            "WHERE changes.id > ? ORDER BY changes.id LIMIT ?",
+            (offset, limit),
+        )
+        return [
+            TableChange(
+                offset=row[0],
+                type=row[1],
+                key=row[2],
+                item=self._decode(row[3])
+                if row[1] in ("add", "update") and row[3] is not None
+                else None,
+            )
+            for row in _cursor.fetchall()
+        ]
+
+    async def get_consumer_offset(self, consumer: str) -> int:
+        _cursor = self._conn.execute(
+            "SELECT position FROM consumers WHERE name = ?", (consumer,)
+        )
         row = _cursor.fetchone()
         if row is None:
-            raise ValueError(f"end key {end} not found")
-        end_id = row[0]
+            return 0
+        return row[0]
+
+    async def set_consumer_offset(self, consumer: str, offset: int) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO consumers (name, position) VALUES (?, ?)",
+            (consumer, offset),
+        )
+        self._conn.commit()
 
+    async def get_consumer_offsets(self) -> dict[str, int]:
+        _cursor = self._conn.execute("SELECT name, position FROM consumers")
+        return dict(_cursor.fetchall())
+
+    async def get_last_offset(self) -> int:
+        # Also counts changes that compaction removed
+        row = self._conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'changes'"
+        ).fetchone()
+        return row[0] if row is not None else 0
+
+    async def compact_changes(self) -> int:
+        # Each call checks the next COMPACT_CHANGES_BATCH changes and wraps
+        # around at the end, so a call never scans the whole log
+        removed = 0
+        # Clears are the only changes without a key
+        (clear_id,) = self._conn.execute(
+            "SELECT MAX(id) FROM changes WHERE key IS NULL AND type = 'clear'"
+        ).fetchone()
+        if clear_id is not None:
+            _cursor = self._conn.execute(
+                "DELETE FROM changes WHERE id IN ("
+                "SELECT id FROM changes WHERE id < ? ORDER BY id LIMIT ?"
+                ")",
+                (clear_id, COMPACT_CHANGES_BATCH),
+            )
+            removed += _cursor.rowcount
+        start = self._changes_after
+        (end,) = self._conn.execute(
+            "SELECT MAX(id) FROM ("
+            "SELECT id FROM changes WHERE id > ? ORDER BY id LIMIT ?"
+            ")",
+            (start, COMPACT_CHANGES_BATCH),
+        ).fetchone()
+        if end is None and start > 0:
+            start = 0
+            (end,) = self._conn.execute(
+                "SELECT MAX(id) FROM (SELECT id FROM changes ORDER BY id LIMIT ?)",
+                (COMPACT_CHANGES_BATCH,),
+            ).fetchone()
+        if end is None:
+            self._changes_after = 0
+            self._conn.commit()
+            return removed
+        self._changes_after = end
+        # Only the latest change of each key is needed to rebuild the table
         _cursor = self._conn.execute(
-            "SELECT key, value FROM data WHERE id >= ? AND id <= ?",
-            (start_id, end_id),
+            "DELETE FROM changes WHERE id > ? AND id <= ? "
+            "AND key IS NOT NULL AND EXISTS ("
+            "SELECT 1 FROM changes AS newer "
+            "WHERE newer.key = changes.key AND newer.id > changes.id"
+            ")",
+            (start, end),
         )
-        return {row[0]: (row[1]) for row in _cursor.fetchall()}
+        removed += _cursor.rowcount
+        # Tombstones are kept until every consumer has read past them
+        (floor,) = self._conn.execute(
+            "SELECT COALESCE("
+            "(SELECT MIN(position) FROM consumers), (SELECT MAX(id) FROM changes)"
+            ")"
+        ).fetchone()
+        if floor is not None:
+            _cursor = self._conn.execute(
+                "DELETE FROM changes WHERE id > ? AND id <= ? AND id <= ? "
+                "AND type IN ('remove', 'clear')",
+                (start, end, floor),
+            )
+            removed += _cursor.rowcount
+        self._conn.commit()
+        return removed
 
     async def fetch_all(self) -> dict[str, bytes]:
         _cursor = self._conn.execute("SELECT key, value FROM data")
-        return {row[0]: (row[1]) for row in _cursor.fetchall()}
+        return self._decode_items(_cursor.fetchall())
 
     async def first(self) -> str | None:
         _cursor = self._conn.execute("SELECT key FROM data ORDER BY id LIMIT 1")
@@ -156,8 +937,15 @@ class SqliteTableAdapter(TableAdapter):
         return row[0]
 
     async def clear(self) -> None:
+        self._generation += 1
         self._conn.execute("DELETE FROM data")
-        self._conn.commit()
+        if self._search is not None:
+            self._conn.execute("DELETE FROM search")
+        self._conn.execute(
+            "UPDATE meta SET value = ? WHERE key = 'generation'",
+            (self._generation,),
+        )
+        self._commit()
 
     async def size(self) -> int:
         _cursor = self._conn.execute("SELECT COUNT(*) FROM data")
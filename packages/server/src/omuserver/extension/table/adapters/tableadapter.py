@@ -1,27 +1,73 @@
 from __future__ import annotations
 
 import abc
-from collections.abc import Mapping
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
 from pathlib import Path
 
+from omu.extension.table import (
+    IndexValue,
+    TableChange,
+    TableChangeType,
+    TableConfig,
+    TablePage,
+    TableQuery,
+    TableRetention,
+    TableSearchQuery,
+)
+
 
 class TableAdapter(abc.ABC):
     @classmethod
     @abc.abstractmethod
     def create(cls, path: Path) -> TableAdapter: ...
 
+    @classmethod
+    @abc.abstractmethod
+    def exists(cls, path: Path) -> bool: ...
+
+    @abc.abstractmethod
+    def configure(self, config: TableConfig) -> None: ...
+
     @abc.abstractmethod
     async def store(self): ...
 
     @abc.abstractmethod
     async def load(self): ...
 
+    @abc.abstractmethod
+    async def close(self) -> None: ...
+
+    @classmethod
+    def migrate(cls, path: Path) -> bool:
+        # One-time upgrades of the stored data, run by the table migrate
+        # command while no connection is open. True if anything changed.
+        return False
+
+    def fetch_latest(self, limit: int) -> dict[str, bytes] | None:
+        # Newest items first, read in a worker thread to fill the cache on
+        # start. None where items can only be read on the loop.
+        return None
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        # Writes inside are committed together where the storage supports it.
+        # Elsewhere, as in the memory and log adapters, each write applies at
+        # once and the ones before an error are kept.
+        yield
+
+    @abc.abstractmethod
+    async def drop(self) -> None: ...
+
     @abc.abstractmethod
     async def get(self, key: str) -> bytes | None: ...
 
     @abc.abstractmethod
     async def get_many(self, keys: list[str]) -> dict[str, bytes]: ...
 
+    @abc.abstractmethod
+    async def existing_keys(self, keys: list[str]) -> list[str]: ...
+
     @abc.abstractmethod
     async def set(self, key: str, value: bytes) -> None: ...
 
@@ -39,9 +85,61 @@ class TableAdapter(abc.ABC):
         self, before: int | None, after: int | None, cursor: str | None
     ) -> dict[str, bytes]: ...
 
+    @abc.abstractmethod
+    async def fetch_page(
+        self, limit: int, backward: bool, cursor: str | None
+    ) -> TablePage[bytes]: ...
+
     @abc.abstractmethod
     async def fetch_range(self, start: str, end: str) -> dict[str, bytes]: ...
 
+    @abc.abstractmethod
+    async def fetch_by_index(
+        self,
+        index: str,
+        start: IndexValue | None,
+        end: IndexValue | None,
+        limit: int | None,
+        backward: bool,
+    ) -> dict[str, bytes]: ...
+
+    @abc.abstractmethod
+    async def query(self, query: TableQuery) -> dict[str, bytes]: ...
+
+    @abc.abstractmethod
+    async def search(self, query: TableSearchQuery) -> TablePage[bytes]: ...
+
+    @abc.abstractmethod
+    async def fetch_expired(
+        self, retention: TableRetention, limit: int
+    ) -> list[str]: ...
+
+    @abc.abstractmethod
+    async def compact(self, pages: int) -> int: ...
+
+    @abc.abstractmethod
+    async def record_changes(self, type: TableChangeType, keys: list[str]) -> None: ...
+
+    @abc.abstractmethod
+    async def fetch_changes(
+        self, offset: int, limit: int
+    ) -> list[TableChange[bytes]]: ...
+
+    @abc.abstractmethod
+    async def get_consumer_offset(self, consumer: str) -> int: ...
+
+    @abc.abstractmethod
+    async def set_consumer_offset(self, consumer: str, offset: int) -> None: ...
+
+    @abc.abstractmethod
+    async def get_consumer_offsets(self) -> dict[str, int]: ...
+
+    @abc.abstractmethod
+    async def get_last_offset(self) -> int: ...
+
+    @abc.abstractmethod
+    async def compact_changes(self) -> int: ...
+
     @abc.abstractmethod
     async def fetch_all(self) -> dict[str, bytes]: ...
 
@@ -1,17 +1,41 @@
 from __future__ import annotations
 
 import asyncio
-from collections.abc import AsyncGenerator, Mapping
-
-from omu.extension.table import TableConfig, TablePermissions
-from omu.extension.table.table_extension import TABLE_PROXY_PACKET, TableProxyPacket
+import time
+from collections.abc import AsyncGenerator, Mapping, Sequence
+from pathlib import Path
+
+from omu.extension.table import (
+    IndexValue,
+    TableCacheChange,
+    TableChanges,
+    TableConfig,
+    TableDump,
+    TablePage,
+    TablePermissions,
+    TableQuery,
+    TableRestore,
+    TableSearchQuery,
+    TableWrite,
+)
+from omu.extension.table.patch import apply_patch
+from omu.extension.table.table_cache import TableCache
 from omu.identifier import Identifier
 
+from omuserver.helper import safe_path_join
 from omuserver.server import Server
 from omuserver.session import Session
 
 from .adapters.tableadapter import TableAdapter
-from .server_table import ServerTable, ServerTableEvents
+from .dump import DUMP_CHUNK_SIZE, dump_adapter, read_dump
+from .proxy_pipeline import DEFAULT_PROXY_TIMEOUT, DEFAULT_PROXY_WINDOW, ProxyPipeline
+from .server_table import (
+    LocalProxy,
+    ProxyStats,
+    ServerTable,
+    ServerTableEvents,
+    UpdateStats,
+)
 from .session_table_handler import SessionTableListener
 
 
@@ -26,18 +50,26 @@ class CachedTable(ServerTable):
         self._event = ServerTableEvents()
         self._sessions: dict[Session, SessionTableListener] = {}
         self._permissions: TablePermissions | None = None
-        self._proxy_sessions: dict[str, Session] = {}
+        self._proxy = ProxyPipeline(id, self._write_added)
         self._changed = False
-        self._proxy_id = 0
         self._save_task: asyncio.Task | None = None
         self._adapter: TableAdapter | None = None
         self.config: TableConfig = {}
-        self._cache: dict[str, bytes] = {}
-        self._cache_size: int | None = None
+        # Nothing is cached unless a cache size is configured
+        self._cache = TableCache[bytes](0)
+        self._last_changed = time.monotonic()
+        # Updates held back by the update window
+        self._pending_updates: dict[str, bytes] = {}
+        self._flush_task: asyncio.Task | None = None
+        self._update_stats = UpdateStats()
 
     def set_config(self, config: TableConfig) -> None:
         self.config = config
-        self._cache_size = config.get("cache_size", None)
+        self.set_cache_size(config.get("cache_size", 0))
+        self._proxy.timeout = config.get("proxy_timeout", DEFAULT_PROXY_TIMEOUT)
+        self._proxy.window = config.get("proxy_window", DEFAULT_PROXY_WINDOW)
+        if self._adapter is not None:
+            self._adapter.configure(config)
 
     @property
     def permissions(self) -> TablePermissions | None:
@@ -48,34 +80,59 @@ class CachedTable(ServerTable):
 
     def set_adapter(self, adapter: TableAdapter) -> None:
         self._adapter = adapter
+        adapter.configure(self.config)
 
     async def load(self) -> None:
         if self._adapter is None:
             raise Exception("Table not set")
         await self._adapter.load()
 
+    async def warm_up(self) -> int:
+        # Loads the adapter and fills the cache with the latest items so the
+        # first fetch after a restart does not read a cold file
+        assert self._adapter is not None
+        await self.load()
+        if not self.cache_size:
+            return 0
+        last_changed = self._last_changed
+        items = await asyncio.to_thread(self._adapter.fetch_latest, self.cache_size)
+        if items is None or self._last_changed != last_changed:
+            # Read again on the loop, written items may be newer than the read
+            items = await self._adapter.fetch_items(self.cache_size, None, None)
+        # Newest last, so they are the last to be evicted
+        await self.update_cache(dict(reversed(items.items())))
+        return len(items)
+
     async def store(self) -> None:
         if self._adapter is None:
             raise Exception("Table not set")
+        await self.flush_updates()
         if not self._changed:
             return
         await self._adapter.store()
         self._changed = False
 
-    def attach_session(self, session: Session) -> None:
+    def attach_session(
+        self, session: Session, removed_values: bool = True, patches: bool = False
+    ) -> None:
         if session in self._sessions:
+            handler = self._sessions[session]
+            if removed_values:
+                handler.request_removed_values()
+            handler.patches |= patches
             return
         handler = SessionTableListener(
             id=self._id,
             session=session,
             table=self,
+            removed_values=removed_values,
+            patches=patches,
         )
         self._sessions[session] = handler
         session.event.disconnected += self.handle_disconnection
 
     def detach_session(self, session: Session) -> None:
-        if session in self._proxy_sessions:
-            del self._proxy_sessions[session.app.key()]
+        self._proxy.detach(session)
         if session in self._sessions:
             handler = self._sessions.pop(session)
             handler.close()
@@ -84,11 +141,16 @@ class CachedTable(ServerTable):
         self.detach_session(session)
 
     def attach_proxy_session(self, session: Session) -> None:
-        self._proxy_sessions[session.app.key()] = session
+        self._proxy.attach(session)
+
+    def attach_local_proxy(self, proxy: LocalProxy) -> None:
+        self._proxy.attach_local(proxy)
 
     async def get(self, key: str) -> bytes | None:
         if self._adapter is None:
             raise Exception("Table not set")
+        if key in self._pending_updates:
+            return self._pending_updates[key]
         if key in self._cache:
             return self._cache[key]
         data = await self._adapter.get(key)
@@ -103,7 +165,10 @@ class CachedTable(ServerTable):
             raise Exception("Table not set")
         items: dict[str, bytes] = {}
         for key in tuple(key_list):
-            if key in self._cache:
+            if key in self._pending_updates:
+                items[key] = self._pending_updates[key]
+                key_list.remove(key)
+            elif key in self._cache:
                 items[key] = self._cache[key]
                 key_list.remove(key)
         if len(key_list) == 0:
@@ -117,81 +182,242 @@ class CachedTable(ServerTable):
     async def add(self, items: Mapping[str, bytes]) -> None:
         if self._adapter is None:
             raise Exception("Table not set")
-        if len(self._proxy_sessions) > 0:
-            await self.send_proxy_event(items)
+        await self.flush_updates()
+        if self._proxy.active:
+            await self._proxy.send(items)
             return
+        await self._write_added(items)
+
+    async def _write_added(self, items: Mapping[str, bytes]) -> None:
+        if self._adapter is None:
+            raise Exception("Table not set")
+        await self.flush_updates()
+        await self._adapter.record_changes("add", list(items))
         await self._adapter.set_all(items)
         await self._event.add(items)
         await self.update_cache(items)
         self.mark_changed()
 
-    async def send_proxy_event(self, items: Mapping[str, bytes]) -> None:
-        session = tuple(self._proxy_sessions.values())[0]
-        self._proxy_id += 1
-        await session.send(
-            TABLE_PROXY_PACKET,
-            TableProxyPacket(
-                id=self._id,
-                items=items,
-                key=self._proxy_id,
-            ),
-        )
-
     async def proxy(
         self, session: Session, key: int, items: Mapping[str, bytes]
     ) -> int:
-        adapter = self._adapter
-        if adapter is None:
+        if self._adapter is None:
             raise Exception("Table not set")
-        if session.app.key() not in self._proxy_sessions:
+        if session.app.key() not in self._proxy.sessions:
             raise ValueError("Session not in proxy sessions")
-        session_key = session.app.key()
-        index = tuple(self._proxy_sessions.keys()).index(session_key)
-        if index == len(self._proxy_sessions) - 1:
-            adapter = self._adapter
-            if adapter is None:
-                raise Exception("Table not set")
-            await adapter.set_all(items)
-            await self._event.add(items)
-            await self.update_cache(items)
-            self.mark_changed()
-            return 0
-        session = tuple(self._proxy_sessions.values())[index + 1]
-        await session.send(
-            TABLE_PROXY_PACKET,
-            TableProxyPacket(
-                id=self._id,
-                items=items,
-                key=self._proxy_id,
-            ),
-        )
-        return self._proxy_id
+        await self._proxy.receive(session, key, items)
+        return key
+
+    @property
+    def proxy_stats(self) -> Mapping[str, ProxyStats]:
+        return self._proxy.stats
 
     async def update(self, items: Mapping[str, bytes]) -> None:
         if self._adapter is None:
             raise Exception("Table not set")
+        self._update_stats.received += len(items)
+        window = self.config.get("update_window", 0)
+        if window <= 0:
+            await self.flush_updates()
+            await self._write_updates(items)
+            return
+        # Last write wins, the whole window is written and sent at once
+        for key in items:
+            if key in self._pending_updates:
+                self._update_stats.coalesced += 1
+        self._pending_updates.update(items)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later(window))
+
+    async def _flush_later(self, window: float) -> None:
+        await asyncio.sleep(window)
+        self._flush_task = None
+        await self.flush_updates()
+
+    async def flush_updates(self) -> None:
+        # Other writes flush first so that they apply in order
+        if not self._pending_updates:
+            return
+        items = self._pending_updates
+        self._pending_updates = {}
+        await self._write_updates(items)
+
+    async def _write_updates(self, items: Mapping[str, bytes]) -> None:
+        if self._adapter is None:
+            raise Exception("Table not set")
+        await self._adapter.record_changes("update", list(items))
         await self._adapter.set_all(items)
         await self._event.update(items)
         await self.update_cache(items)
         self.mark_changed()
 
+    async def patch(self, patches: Mapping[str, bytes]) -> None:
+        if self._adapter is None:
+            raise Exception("Table not set")
+        # Patches apply to the latest value, including held updates
+        current: dict[str, bytes] = {}
+        missing: list[str] = []
+        for key in patches:
+            if key in self._pending_updates:
+                current[key] = self._pending_updates[key]
+            elif key in self._cache:
+                current[key] = self._cache[key]
+            else:
+                missing.append(key)
+        if missing:
+            current.update(await self._adapter.get_many(missing))
+        merged = {
+            key: apply_patch(current[key], patch)
+            for key, patch in patches.items()
+            if key in current
+        }
+        if not merged:
+            return
+        if self.config.get("update_window", 0) > 0:
+            # Held and sent as merged items like any other update
+            await self.update(merged)
+            return
+        await self.flush_updates()
+        await self._adapter.record_changes("update", list(merged))
+        await self._adapter.set_all(merged)
+        await self._event.patch({key: patches[key] for key in merged}, merged)
+        await self._event.update(merged)
+        await self.update_cache(merged)
+        self.mark_changed()
+
+    @property
+    def update_stats(self) -> UpdateStats:
+        return self._update_stats
+
     async def remove(self, keys: list[str]) -> None:
         if self._adapter is None:
             raise Exception("Table not set")
-        removed = await self._adapter.get_many(keys)
+        await self.flush_updates()
+        # Keys that were never there are neither recorded nor sent
+        keys = await self._adapter.existing_keys(keys)
+        if not keys:
+            return
+        removed: dict[str, bytes] | None = None
+        if not self._event.remove.empty:
+            removed = await self._adapter.get_many(keys)
+        await self._adapter.record_changes("remove", keys)
         await self._adapter.remove_all(keys)
-        for key in keys:
-            if key in self._cache:
-                del self._cache[key]
-        await self._event.remove(removed)
+        await self._emit_cache_change(self._cache.remove(keys))
+        if removed is not None:
+            await self._event.remove(removed)
+        await self._event.remove_keys(keys)
         self.mark_changed()
 
     async def clear(self) -> None:
         if self._adapter is None:
             raise Exception("Table not set")
+        self._pending_updates.clear()
+        await self._adapter.record_changes("clear", [])
         await self._adapter.clear()
         await self._event.clear()
-        self._cache.clear()
+        await self._emit_cache_change(self._cache.clear())
+        self.mark_changed()
+
+    async def write_batch(self, writes: Sequence[TableWrite]) -> None:
+        adapter = self._adapter
+        if adapter is None:
+            raise Exception("Table not set")
+        await self.flush_updates()
+        # Events are coalesced to their net effect and sent after the commit
+        cleared = False
+        added: dict[str, bytes] = {}
+        updated: dict[str, bytes] = {}
+        removed: dict[str, bytes] = {}
+        removed_keys: dict[str, None] = {}
+        removed_values = not self._event.remove.empty
+        # Items patched once in the batch are sent as their patch
+        patched: dict[str, bytes] = {}
+        patched_items: dict[str, bytes] = {}
+        # Added items pass the proxies first, so that every write applies in
+        # the order it was submitted
+        proxied: dict[int, Mapping[str, bytes]] = {}
+        if self._proxy.active:
+            indexes = [i for i, write in enumerate(writes) if write.type == "add"]
+            results = await asyncio.gather(
+                *(self._proxy.run(writes[i].items) for i in indexes)
+            )
+            proxied = dict(zip(indexes, results, strict=True))
+        with adapter.batch():
+            for index, write in enumerate(writes):
+                if write.type == "clear":
+                    await adapter.record_changes("clear", [])
+                    await adapter.clear()
+                    cleared = True
+                    added.clear()
+                    updated.clear()
+                    removed.clear()
+                    removed_keys.clear()
+                    patched.clear()
+                    patched_items.clear()
+                elif write.type == "remove":
+                    keys = await adapter.existing_keys(list(write.items))
+                    if not keys:
+                        continue
+                    if removed_values:
+                        removed.update(await adapter.get_many(keys))
+                    await adapter.record_changes("remove", keys)
+                    await adapter.remove_all(keys)
+                    for key in keys:
+                        added.pop(key, None)
+                        updated.pop(key, None)
+                        patched.pop(key, None)
+                        patched_items.pop(key, None)
+                        removed_keys[key] = None
+                elif write.type == "patch":
+                    current = await adapter.get_many(list(write.items))
+                    merged = {
+                        key: apply_patch(current[key], patch)
+                        for key, patch in write.items.items()
+                        if key in current
+                    }
+                    await adapter.record_changes("update", list(merged))
+                    await adapter.set_all(merged)
+                    for key, value in merged.items():
+                        if key in added:
+                            added[key] = value
+                        elif key in updated or key in patched:
+                            patched.pop(key, None)
+                            patched_items.pop(key, None)
+                            updated[key] = value
+                        else:
+                            patched[key] = write.items[key]
+                            patched_items[key] = value
+                else:
+                    items = proxied.get(index, write.items)
+                    if not items:
+                        continue
+                    await adapter.record_changes(write.type, list(items))
+                    await adapter.set_all(items)
+                    for key, value in items.items():
+                        removed.pop(key, None)
+                        removed_keys.pop(key, None)
+                        patched.pop(key, None)
+                        patched_items.pop(key, None)
+                        if key in added or write.type == "add":
+                            added[key] = value
+                        else:
+                            updated[key] = value
+        if cleared:
+            await self._event.clear()
+            await self._emit_cache_change(self._cache.clear())
+        if removed_keys:
+            await self._emit_cache_change(self._cache.remove(list(removed_keys)))
+            if removed:
+                await self._event.remove(removed)
+            await self._event.remove_keys(list(removed_keys))
+        if added:
+            await self._event.add(added)
+        if patched:
+            await self._event.patch(patched, patched_items)
+        if updated or patched_items:
+            await self._event.update({**updated, **patched_items})
+        if added or updated or patched_items:
+            await self.update_cache({**added, **updated, **patched_items})
         self.mark_changed()
 
     async def fetch_items(
@@ -204,28 +430,139 @@ class CachedTable(ServerTable):
             raise Exception("Table not set")
         return await self._adapter.fetch_items(before, after, cursor)
 
+    async def fetch_page(
+        self, limit: int, backward: bool = True, cursor: str | None = None
+    ) -> TablePage[bytes]:
+        if self._adapter is None:
+            raise Exception("Table not set")
+        return await self._adapter.fetch_page(limit, backward, cursor)
+
     async def fetch_range(self, start: str, end: str) -> dict[str, bytes]:
         if self._adapter is None:
             raise Exception("Table not set")
         return await self._adapter.fetch_range(start, end)
 
+    async def fetch_by_index(
+        self,
+        index: str,
+        start: IndexValue | None = None,
+        end: IndexValue | None = None,
+        limit: int | None = None,
+        backward: bool = False,
+    ) -> dict[str, bytes]:
+        if self._adapter is None:
+            raise Exception("Table not set")
+        return await self._adapter.fetch_by_index(index, start, end, limit, backward)
+
+    async def query(self, query: TableQuery) -> dict[str, bytes]:
+        if self._adapter is None:
+            raise Exception("Table not set")
+        return await self._adapter.query(query)
+
+    async def search(self, query: TableSearchQuery) -> TablePage[bytes]:
+        if self._adapter is None:
+            raise Exception("Table not set")
+        return await self._adapter.search(query)
+
     async def fetch_all(self) -> dict[str, bytes]:
         if self._adapter is None:
             raise Exception("Table not set")
         return await self._adapter.fetch_all()
 
+    def _dump_path(self, file: str) -> Path:
+        return safe_path_join(self._server.directories.get("table_dumps"), file)
+
+    async def dump(self, dump: TableDump) -> int:
+        if self._adapter is None:
+            raise Exception("Table not set")
+        return await dump_adapter(
+            self._adapter,
+            self._dump_path(dump["file"]),
+            dump.get("format", "binary"),
+        )
+
+    async def restore(self, restore: TableRestore) -> int:
+        if self._adapter is None:
+            raise Exception("Table not set")
+        path = self._dump_path(restore["file"])
+        if not path.is_file():
+            raise ValueError(f"Dump {restore['file']} not found")
+        await self.flush_updates()
+        if restore.get("replace", False):
+            await self.clear()
+        # Bypasses proxies, listeners get one add event per chunk if any
+        notify = restore.get("notify", True)
+        count = 0
+        for chunk in read_dump(path, restore.get("format", "binary"), DUMP_CHUNK_SIZE):
+            await self._adapter.record_changes("add", list(chunk))
+            await self._adapter.set_all(chunk)
+            if notify:
+                await self._event.add(chunk)
+            await self.update_cache(chunk)
+            count += len(chunk)
+            await asyncio.sleep(0)
+        self.mark_changed()
+        return count
+
+    async def fetch_changes(self, offset: int, limit: int) -> TableChanges[bytes]:
+        if self._adapter is None:
+            raise Exception("Table not set")
+        changes = await self._adapter.fetch_changes(offset, limit)
+        if len(changes) > 0:
+            offset = changes[-1].offset
+        return TableChanges(changes=changes, offset=offset)
+
+    async def get_consumer_offset(self, consumer: str) -> int:
+        if self._adapter is None:
+            raise Exception("Table not set")
+        return await self._adapter.get_consumer_offset(consumer)
+
+    async def commit_offset(self, consumer: str, offset: int) -> None:
+        if self._adapter is None:
+            raise Exception("Table not set")
+        await self._adapter.set_consumer_offset(consumer, offset)
+
+    async def compact_changes(self) -> int:
+        if self._adapter is None:
+            raise Exception("Table not set")
+        return await self._adapter.compact_changes()
+
+    async def enforce_retention(self, batch_size: int) -> int:
+        retention = self.config.get("retention")
+        if self._adapter is None or retention is None:
+            return 0
+        removed = 0
+        while True:
+            keys = await self._adapter.fetch_expired(retention, batch_size)
+            if len(keys) == 0:
+                break
+            await self.remove(keys)
+            removed += len(keys)
+            # Let other tasks run between batches
+            await asyncio.sleep(0)
+        return removed
+
+    async def compact(self, pages: int) -> int:
+        if self._adapter is None:
+            raise Exception("Table not set")
+        return await self._adapter.compact(pages)
+
+    @property
+    def idle_time(self) -> float:
+        return time.monotonic() - self._last_changed
+
     async def iterate(self) -> AsyncGenerator[bytes, None]:
         cursor: str | None = None
         while True:
-            items = await self.fetch_items(
-                before=self.config.get("chunk_size", 100),
+            page = await self.fetch_page(
+                self.config.get("chunk_size", 100),
                 cursor=cursor,
             )
-            if len(items) == 0:
-                break
-            for item in items.values():
+            for item in page.items.values():
                 yield item
-            *_, cursor = items.keys()
+            if page.cursor is None:
+                break
+            cursor = page.cursor
 
     async def size(self) -> int:
         return len(self._cache)
@@ -237,19 +574,28 @@ class CachedTable(ServerTable):
 
     def mark_changed(self) -> None:
         self._changed = True
+        self._last_changed = time.monotonic()
         if self._save_task is None:
             self._save_task = asyncio.create_task(self.save_task())
 
-    def set_cache_size(self, size: int) -> None:
-        self._cache_size = size
+    @property
+    def cache_size(self) -> int:
+        return self._cache.size or 0
+
+    def set_cache_size(self, size: int | None) -> None:
+        change = self._cache.set_size(size or 0)
+        if not change.empty:
+            asyncio.create_task(self._emit_cache_change(change))
 
     async def update_cache(self, items: Mapping[str, bytes]) -> None:
-        if self._cache_size is None or self._cache_size <= 0:
+        if not self._cache.size:
+            return
+        await self._emit_cache_change(self._cache.update(items))
+
+    async def _emit_cache_change(self, change: TableCacheChange[bytes]) -> None:
+        if change.empty:
             return
-        for key, item in items.items():
-            self._cache[key] = item
-            if len(self._cache) > self._cache_size:
-                del self._cache[next(iter(self._cache))]
+        await self._event.cache_change(change)
         await self._event.cache_update(self._cache)
 
     @property
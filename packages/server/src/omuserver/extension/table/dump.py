@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+from typing import BinaryIO
+
+from omu.bytebuffer import ByteWriter
+from omu.extension.table import TableDumpFormat
+
+from .adapters.tableadapter import TableAdapter
+
+DUMP_MAGIC = b"OMUTABLE"
+DUMP_VERSION = 1
+DUMP_CHUNK_SIZE = 1000
+
+
+def encode_chunk(items: Mapping[str, bytes], format: TableDumpFormat) -> bytes:
+    if format == "binary":
+        # Same framing as TableItemsPacket, without the item count
+        writer = ByteWriter()
+        for key, value in items.items():
+            writer.write_string(key)
+            writer.write_byte_array(value)
+        return writer.finish()
+    if format == "ndjson":
+        lines: list[str] = []
+        for key, value in items.items():
+            try:
+                item = json.loads(value)
+            except ValueError as e:
+                raise ValueError(f"Item {key} is not JSON, use binary") from e
+            lines.append(json.dumps({"key": key, "value": item}, ensure_ascii=False))
+        return "".join(f"{line}\n" for line in lines).encode("utf-8")
+    raise ValueError(f"Unknown dump format {format}")
+
+
+async def dump_adapter(
+    adapter: TableAdapter,
+    path: Path,
+    format: TableDumpFormat = "binary",
+    chunk_size: int = DUMP_CHUNK_SIZE,
+) -> int:
+    # Items are written page by page, oldest first, so restoring keeps the
+    # order. Items updated while dumping may appear twice, the later wins.
+    temp_path = path.with_name(f"{path.name}.tmp")
+    count = 0
+    try:
+        with temp_path.open("wb") as file:
+            if format == "binary":
+                file.write(DUMP_MAGIC + DUMP_VERSION.to_bytes(1, "big"))
+            cursor: str | None = None
+            while True:
+                page = await adapter.fetch_page(chunk_size, False, cursor)
+                file.write(encode_chunk(page.items, format))
+                count += len(page.items)
+                if page.cursor is None:
+                    break
+                cursor = page.cursor
+                await asyncio.sleep(0)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    temp_path.replace(path)
+    return count
+
+
+def read_exact(file: BinaryIO, size: int) -> bytes:
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("Dump is truncated")
+    return data
+
+
+def read_binary(file: BinaryIO) -> Iterator[tuple[str, bytes]]:
+    header = file.read(len(DUMP_MAGIC) + 1)
+    if header[:-1] != DUMP_MAGIC:
+        raise ValueError("Not a table dump")
+    if header[-1] != DUMP_VERSION:
+        raise ValueError(f"Unsupported dump version {header[-1]}")
+    while length := file.read(4):
+        if len(length) != 4:
+            raise ValueError("Dump is truncated")
+        key = read_exact(file, int.from_bytes(length, "big")).decode("utf-8")
+        size = int.from_bytes(read_exact(file, 4), "big")
+        yield key, read_exact(file, size)
+
+
+def read_ndjson(file: BinaryIO) -> Iterator[tuple[str, bytes]]:
+    for line in file:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        key = record.get("key")
+        if not isinstance(key, str) or "value" not in record:
+            raise ValueError(f"Invalid dump record {line[:100]!r}")
+        yield key, json.dumps(record["value"]).encode("utf-8")
+
+
+def read_dump(
+    path: Path,
+    format: TableDumpFormat = "binary",
+    chunk_size: int = DUMP_CHUNK_SIZE,
+) -> Iterator[dict[str, bytes]]:
+    if format == "binary":
+        read = read_binary
+    elif format == "ndjson":
+        read = read_ndjson
+    else:
+        raise ValueError(f"Unknown dump format {format}")
+    with path.open("rb") as file:
+        chunk: dict[str, bytes] = {}
+        for key, value in read(file):
+            chunk[key] = value
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = {}
+        if chunk:
+            yield chunk
+
+
+async def restore_adapter(
+    adapter: TableAdapter,
+    path: Path,
+    format: TableDumpFormat = "binary",
+    replace: bool = False,
+    chunk_size: int = DUMP_CHUNK_SIZE,
+) -> int:
+    # Writes directly to the adapter without any listeners, for use while the
+    # server is stopped. Each chunk is written in one transaction.
+    if replace:
+        await adapter.record_changes("clear", [])
+        await adapter.clear()
+    count = 0
+    for chunk in read_dump(path, format, chunk_size):
+        await adapter.record_changes("add", list(chunk))
+        await adapter.set_all(chunk)
+        count += len(chunk)
+    await adapter.store()
+    return count
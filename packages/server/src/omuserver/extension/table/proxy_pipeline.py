@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Coroutine, Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+from loguru import logger
+from omu.extension.table.table_extension import (
+    TABLE_PROXY_PACKET,
+    TableImpl,
+    TableProxyPacket,
+)
+from omu.helper import Coro
+from omu.identifier import Identifier
+
+from omuserver.session import Session
+
+from .server_table import LocalProxy, ProxyStats
+
+DEFAULT_PROXY_TIMEOUT = 5.0
+DEFAULT_PROXY_WINDOW = 16
+
+
+@dataclass(slots=True)
+class ProxyBatch:
+    key: int
+    items: Mapping[str, bytes]
+    # Proxies still to visit, in the order they were attached
+    route: list[str]
+    # Proxy currently holding the batch
+    session: str | None = None
+    sent_at: float = 0.0
+    timeout: asyncio.TimerHandle | None = field(default=None, repr=False)
+    done: bool = False
+    # Receives the items instead of writing them
+    result: asyncio.Future[Mapping[str, bytes]] | None = field(default=None, repr=False)
+
+
+class ProxyPipeline:
+    # Added items pass through every proxy session before they are written.
+    # Up to window batches are in flight at once, each with its own key, and
+    # they are written in the order they were added. A proxy that does not
+    # answer within the timeout is skipped with the items it was given.
+    # Proxies of plugins in this process are called directly, and a row of
+    # them shares one decode and one encode of the items. Proxies of the
+    # server's own tables run the same way, before those of any session.
+    def __init__(
+        self,
+        id: Identifier,
+        commit: Coro[[Mapping[str, bytes]], None],
+    ) -> None:
+        self._id = id
+        self._commit = commit
+        self.sessions: dict[str, Session] = {}
+        self.locals: dict[str, LocalProxy] = {}
+        self.timeout = DEFAULT_PROXY_TIMEOUT
+        self.window = DEFAULT_PROXY_WINDOW
+        self.stats: dict[str, ProxyStats] = {}
+        self._key = 0
+        # In flight, in the order they were added
+        self._batches: dict[int, ProxyBatch] = {}
+        self._space = asyncio.Condition()
+        self._flushing = False
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def active(self) -> bool:
+        return bool(self.sessions) or any(
+            local.has_proxies for local in self.locals.values()
+        )
+
+    def attach(self, session: Session) -> None:
+        self.sessions[session.app.key()] = session
+
+    def attach_local(self, local: LocalProxy) -> None:
+        self.locals[f"server/{len(self.locals)}"] = local
+
+    def detach(self, session: Session) -> None:
+        key = session.app.key()
+        if self.sessions.pop(key, None) is None:
+            return
+        # Batches held by the proxy move on without waiting for the timeout
+        for batch in tuple(self._batches.values()):
+            if batch.session == key:
+                self._cancel_timeout(batch)
+                self._spawn(self._forward(batch))
+
+    async def send(
+        self,
+        items: Mapping[str, bytes],
+        result: asyncio.Future[Mapping[str, bytes]] | None = None,
+    ) -> None:
+        async with self._space:
+            await self._space.wait_for(lambda: len(self._batches) < self.window)
+            self._key += 1
+            batch = ProxyBatch(
+                key=self._key,
+                items=items,
+                route=[*self.locals, *self.sessions],
+                result=result,
+            )
+            self._batches[batch.key] = batch
+        await self._forward(batch)
+
+    async def run(self, items: Mapping[str, bytes]) -> Mapping[str, bytes]:
+        # Passes the items through the proxies and returns them unwritten
+        result = asyncio.get_running_loop().create_future()
+        await self.send(items, result)
+        return await result
+
+    async def receive(
+        self, session: Session, key: int, items: Mapping[str, bytes]
+    ) -> bool:
+        batch = self._batches.get(key)
+        session_key = session.app.key()
+        if batch is None or batch.session != session_key:
+            # Answered after its timeout, the batch has already moved on
+            return False
+        self._cancel_timeout(batch)
+        latency = time.monotonic() - batch.sent_at
+        stats = self.stats.setdefault(session_key, ProxyStats())
+        stats.batches += 1
+        stats.total_latency += latency
+        stats.max_latency = max(stats.max_latency, latency)
+        batch.items = items
+        await self._forward(batch)
+        return True
+
+    async def _forward(self, batch: ProxyBatch) -> None:
+        batch.session = None
+        while batch.route and batch.items:
+            key = batch.route.pop(0)
+            local = self._find_local(key)
+            if local is not None:
+                self._spawn(self._run_local(batch, key, local))
+                return
+            session = self.sessions.get(key)
+            if session is None or session.closed:
+                continue
+            batch.session = key
+            batch.sent_at = time.monotonic()
+            batch.timeout = asyncio.get_running_loop().call_later(
+                self.timeout, self._on_timeout, batch
+            )
+            await session.send(
+                TABLE_PROXY_PACKET,
+                TableProxyPacket(id=self._id, items=batch.items, key=batch.key),
+            )
+            return
+        batch.done = True
+        await self._flush()
+
+    async def _run_local(self, batch: ProxyBatch, key: str, local: LocalProxy) -> None:
+        items = local.decode_items(batch.items)
+        encoder = local
+        while True:
+            stats = self.stats.setdefault(key, ProxyStats())
+            started = time.monotonic()
+            try:
+                # Items are shared objects, a proxy cut off by the timeout
+                # may already have changed them
+                items = await asyncio.wait_for(local.run_proxies(items), self.timeout)
+            except TimeoutError:
+                stats.timeouts += 1
+                logger.warning(
+                    f"Proxy {key} did not finish within {self.timeout}s "
+                    f"on {self._id}, passing {len(items)} items through"
+                )
+            except Exception as e:
+                stats.errors += 1
+                logger.opt(exception=e).error(f"Proxy {key} failed on {self._id}")
+            else:
+                latency = time.monotonic() - started
+                stats.batches += 1
+                stats.total_latency += latency
+                stats.max_latency = max(stats.max_latency, latency)
+                encoder = local
+            next_local = self._next_local(batch) if items else None
+            if next_local is None:
+                break
+            key, local = next_local
+        batch.items = encoder.encode_items(items)
+        await self._forward(batch)
+
+    def _next_local(self, batch: ProxyBatch) -> tuple[str, LocalProxy] | None:
+        while batch.route:
+            key = batch.route[0]
+            local = self._find_local(key)
+            if local is not None:
+                return batch.route.pop(0), local
+            session = self.sessions.get(key)
+            if key in self.locals or session is None or session.closed:
+                # Nothing to run, skipped without ending the row
+                batch.route.pop(0)
+                continue
+            return None
+        return None
+
+    def _find_local(self, key: str) -> LocalProxy | None:
+        local = self.locals.get(key)
+        if local is not None:
+            return local if local.has_proxies else None
+        session = self.sessions.get(key)
+        if session is None or session.closed:
+            return None
+        return find_local_proxy(session, self._id)
+
+    def _on_timeout(self, batch: ProxyBatch) -> None:
+        assert batch.session is not None
+        batch.timeout = None
+        stats = self.stats.setdefault(batch.session, ProxyStats())
+        stats.timeouts += 1
+        logger.warning(
+            f"Proxy {batch.session} did not answer within {self.timeout}s "
+            f"on {self._id}, passing {len(batch.items)} items through"
+        )
+        self._spawn(self._forward(batch))
+
+    def _cancel_timeout(self, batch: ProxyBatch) -> None:
+        if batch.timeout is not None:
+            batch.timeout.cancel()
+            batch.timeout = None
+
+    def _spawn(self, coro: Coroutine[Any, Any, None]) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self) -> None:
+        # Finished batches wait for earlier ones so that items keep their order
+        if self._flushing:
+            return
+        self._flushing = True
+        try:
+            while self._batches:
+                batch = next(iter(self._batches.values()))
+                if not batch.done:
+                    break
+                del self._batches[batch.key]
+                if batch.result is not None:
+                    if not batch.result.done():
+                        batch.result.set_result(batch.items)
+                elif batch.items:
+                    try:
+                        await self._commit(batch.items)
+                    except Exception as e:
+                        # Only this batch is lost, the ones after it are written
+                        logger.opt(exception=e).error(
+                            f"Failed to write {len(batch.items)} proxied items "
+                            f"on {self._id}"
+                        )
+        finally:
+            self._flushing = False
+            async with self._space:
+                self._space.notify_all()
+
+
+def find_local_proxy(session: Session, id: Identifier) -> TableImpl[Any] | None:
+    client = session.connection.local_client
+    if client is None:
+        return None
+    table = client.tables.find(id)
+    if not isinstance(table, TableImpl) or not table.has_proxies:
+        return None
+    return table
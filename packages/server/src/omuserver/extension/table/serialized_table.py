@@ -1,23 +1,54 @@
-from collections.abc import AsyncGenerator, Mapping
+import json
+from collections.abc import AsyncGenerator, Callable, Iterator, Mapping, Sequence
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from itertools import chain
+from typing import Any
 
 from omu.event_emitter import Unlisten
-from omu.extension.table import Table, TableConfig, TableType
-from omu.extension.table.table import TableEvents, TablePermissions
-from omu.helper import AsyncCallback, Coro
+from omu.extension.table import (
+    IndexValue,
+    Table,
+    TableCacheChange,
+    TableChange,
+    TableChanges,
+    TableConfig,
+    TableDump,
+    TablePage,
+    TableQuery,
+    TableRestore,
+    TableSearchQuery,
+    TableType,
+)
+from omu.extension.table.patch import decode_patch, encode_patch
+from omu.extension.table.table import TableEvents, TablePermissions, TableWriteType
+from omu.extension.table.table_extension import (
+    TableBatch,
+    batch_proxy,
+    run_proxies,
+)
+from omu.helper import AsyncCallback, Coro, map_optional
 from omu.identifier import Identifier
 from omu.interface import Keyable
-from omu.serializer import Serializable
 
 from .server_table import ServerTable
 
 
 class SerializeAdapter[T: Keyable](Mapping[str, T]):
-    def __init__(self, cache: Mapping[str, bytes], serializer: Serializable[T, bytes]):
+    def __init__(
+        self, cache: Mapping[str, bytes], deserialize: Callable[[str, bytes], T]
+    ):
         self._cache = cache
-        self._serializer = serializer
+        self._deserialize = deserialize
 
     def __getitem__(self, key: str) -> T:
-        return self._serializer.deserialize(self._cache[key])
+        return self._deserialize(key, self._cache[key])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._cache)
+
+    def __len__(self) -> int:
+        return len(self._cache)
 
 
 class SerializedTable[T: Keyable](Table[T]):
@@ -25,21 +56,33 @@ class SerializedTable[T: Keyable](Table[T]):
         self._table = table
         self._type = type
         self._event = TableEvents[T](self)
-        self._proxies: list[Coro[[T], T | None]] = []
         self._chunk_size = 100
         self._permissions: TablePermissions | None = None
         self.permission_read: Identifier | None = None
         self.permission_write: Identifier | None = None
         self._listening = False
+        self._removed_values = False
+        # Decoded items of the byte cache, evicted along with it and shared
+        # by every read of the same bytes
+        self._decoded: dict[str, tuple[bytes, T]] = {}
+        # Items decoded by the last add or update event, before being cached
+        self._pending: dict[str, tuple[bytes, T]] = {}
+        self._proxies: list[Coro[[list[T]], Sequence[T | None]]] = []
+        self._proxying = False
+        self._batch = ContextVar[TableBatch | None](
+            f"table_batch_{type.id.key()}", default=None
+        )
         table.event.cache_update += self.on_cache_update
+        table.event.cache_change += self.on_cache_change
         table.event.add += self.on_add
         table.event.update += self.on_update
-        table.event.remove += self.on_remove
+        table.event.patch += self.on_patch
+        table.event.remove_keys += self.on_remove_keys
         table.event.clear += self.on_clear
 
     @property
     def cache(self) -> Mapping[str, T]:
-        return SerializeAdapter(self._table.cache, self._type.serializer)
+        return SerializeAdapter(self._table.cache, self._decode)
 
     def set_permissions(
         self,
@@ -65,34 +108,75 @@ class SerializedTable[T: Keyable](Table[T]):
     def set_cache_size(self, size: int) -> None:
         self._table.set_cache_size(size)
 
+    def set_miss_ttl(self, ttl: float | None) -> None:
+        # Lookups do not leave the server, there is no round trip to save
+        pass
+
     async def get(self, key: str) -> T | None:
         if key in self._table.cache:
-            return self._type.serializer.deserialize(self._table.cache[key])
+            return self._decode(key, self._table.cache[key])
         item = await self._table.get(key)
         if item is None:
             return None
-        return self._type.serializer.deserialize(item)
+        return self._decode(key, item)
 
     async def get_many(self, *keys: str) -> dict[str, T]:
         items = await self._table.get_many(*keys)
-        return {
-            key: self._type.serializer.deserialize(item) for key, item in items.items()
-        }
+        return self._parse_items(items)
 
     async def add(self, *items: T) -> None:
         data = {item.key(): self._type.serializer.serialize(item) for item in items}
+        if self._write_batch("add", data):
+            return
         await self._table.add(data)
 
     async def update(self, *items: T) -> None:
         data = {item.key(): self._type.serializer.serialize(item) for item in items}
+        if self._write_batch("update", data):
+            return
         await self._table.update(data)
 
+    async def patch(self, patches: Mapping[str, Any]) -> None:
+        data = {key: encode_patch(patch) for key, patch in patches.items()}
+        if self._write_batch("patch", data):
+            return
+        await self._table.patch(data)
+
     async def remove(self, *items: T) -> None:
-        await self._table.remove([item.key() for item in items])
+        await self.remove_keys(*(item.key() for item in items))
+
+    async def remove_keys(self, *keys: str) -> None:
+        if self._write_batch("remove", dict.fromkeys(keys, b"")):
+            return
+        await self._table.remove(list(keys))
 
     async def clear(self) -> None:
+        if self._write_batch("clear", {}):
+            return
         await self._table.clear()
 
+    def _write_batch(self, type: TableWriteType, items: Mapping[str, bytes]) -> bool:
+        batch = self._batch.get()
+        if batch is None or not batch.accepts(self._type.id):
+            return False
+        batch.write(self._type.id, type, items)
+        return True
+
+    @asynccontextmanager
+    async def batch(self) -> AsyncGenerator[None, None]:
+        if self._batch.get() is not None:
+            yield
+            return
+        batch = TableBatch({self._type.id})
+        token = self._batch.set(batch)
+        try:
+            yield
+        finally:
+            batch.closed = True
+            self._batch.reset(token)
+        if batch.writes:
+            await self._table.write_batch(batch.writes)
+
     async def fetch_items(
         self,
         before: int | None = None,
@@ -102,78 +186,231 @@ class SerializedTable[T: Keyable](Table[T]):
         items = await self._table.fetch_items(before, after, cursor)
         return self._parse_items(items)
 
+    async def fetch_page(
+        self,
+        limit: int,
+        backward: bool = True,
+        cursor: str | None = None,
+    ) -> TablePage[T]:
+        page = await self._table.fetch_page(limit, backward, cursor)
+        return TablePage(items=self._parse_items(page.items), cursor=page.cursor)
+
     async def fetch_range(self, start: str, end: str) -> dict[str, T]:
         items = await self._table.fetch_range(start, end)
         return self._parse_items(items)
 
+    async def fetch_by_index(
+        self,
+        index: str,
+        value: IndexValue | None = None,
+        *,
+        start: IndexValue | None = None,
+        end: IndexValue | None = None,
+        limit: int | None = None,
+        backward: bool = False,
+    ) -> dict[str, T]:
+        if value is not None:
+            start = end = value
+        items = await self._table.fetch_by_index(index, start, end, limit, backward)
+        return self._parse_items(items)
+
+    async def query(self, query: TableQuery) -> dict[str, T]:
+        if "fields" in query:
+            raise ValueError("Use query_fields to project fields")
+        items = await self._table.query(query)
+        return self._parse_items(items)
+
+    async def query_fields(
+        self, query: TableQuery, *fields: str
+    ) -> dict[str, dict[str, Any]]:
+        items = await self._table.query({**query, "fields": [*fields]})
+        return {key: json.loads(value) for key, value in items.items()}
+
+    async def search(self, query: TableSearchQuery) -> TablePage[T]:
+        page = await self._table.search(query)
+        return TablePage(items=self._parse_items(page.items), cursor=page.cursor)
+
     async def fetch_all(self) -> dict[str, T]:
         items = await self._table.fetch_all()
         return self._parse_items(items)
 
+    async def dump(self, dump: TableDump) -> int:
+        return await self._table.dump(dump)
+
+    async def restore(self, restore: TableRestore) -> int:
+        return await self._table.restore(restore)
+
     async def iterate(
         self,
         backward: bool = False,
         cursor: str | None = None,
     ) -> AsyncGenerator[T, None]:
-        items = await self.fetch_items(
-            before=self._chunk_size if backward else None,
-            after=self._chunk_size if not backward else None,
-            cursor=cursor,
-        )
-        for item in items.values():
-            yield item
-        while len(items) > 0:
-            cursor = next(iter(items.keys()))
-            items = await self.fetch_items(
-                before=self._chunk_size if backward else None,
-                after=self._chunk_size if not backward else None,
+        while True:
+            page = await self.fetch_page(
+                self._chunk_size,
+                backward=backward,
                 cursor=cursor,
             )
-            for item in items.values():
+            for item in page.items.values():
                 yield item
-            items.pop(cursor, None)
+            if page.cursor is None:
+                break
+            cursor = page.cursor
 
     async def size(self) -> int:
         return await self._table.size()
 
+    async def fetch_changes(
+        self,
+        offset: int | None = None,
+        *,
+        consumer: str | None = None,
+        limit: int = 100,
+    ) -> TableChanges[T]:
+        if offset is None:
+            offset = 0
+            if consumer is not None:
+                offset = await self._table.get_consumer_offset(consumer)
+        changes = await self._table.fetch_changes(offset, limit)
+        return TableChanges(
+            changes=[
+                TableChange(
+                    offset=change.offset,
+                    type=change.type,
+                    key=change.key,
+                    item=map_optional(change.item, self._type.serializer.deserialize),
+                )
+                for change in changes.changes
+            ],
+            offset=changes.offset,
+        )
+
+    async def commit_offset(self, consumer: str, offset: int) -> None:
+        await self._table.commit_offset(consumer, offset)
+
     @property
     def event(self) -> TableEvents[T]:
         return self._event
 
     def listen(
-        self, listener: AsyncCallback[Mapping[str, T]] | None = None
+        self,
+        listener: AsyncCallback[Mapping[str, T]] | None = None,
+        removed_values: bool = False,
+        patches: bool = False,
     ) -> Unlisten:
+        # Patches are always emitted, there is no transfer to save here
         self._listening = True
+        if removed_values and not self._removed_values:
+            self._table.event.remove += self.on_remove
+            self._removed_values = True
         if listener:
             return self._event.cache_update.listen(listener)
         return lambda: None
 
     async def on_cache_update(self, cache: Mapping[str, bytes]) -> None:
-        await self._event.cache_update(self._parse_items(cache))
+        if self._event.cache_update.empty:
+            return
+        await self._event.cache_update(SerializeAdapter(cache, self._decode))
+
+    async def on_cache_change(self, change: TableCacheChange[bytes]) -> None:
+        for key, data in chain(change.inserted.items(), change.updated.items()):
+            entry = self._pending.get(key)
+            if entry is not None and entry[0] is data:
+                self._decoded[key] = entry
+            else:
+                self._decoded.pop(key, None)
+        self._pending = {}
+        parsed: TableCacheChange[T] | None = None
+        if not self._event.cache_change.empty:
+            parsed = TableCacheChange(
+                inserted=self._parse_items(change.inserted),
+                updated=self._parse_items(change.updated),
+                removed=self._parse_items(change.removed),
+            )
+        for key in change.removed:
+            self._decoded.pop(key, None)
+        if parsed is not None:
+            await self._event.cache_change(parsed)
 
     async def on_add(self, items: Mapping[str, bytes]) -> None:
-        _items = self._parse_items(items)
+        self._pending = {}
+        _items = self._parse_items(items, self._pending)
         await self._event.add(_items)
 
     async def on_update(self, items: Mapping[str, bytes]) -> None:
-        _items = self._parse_items(items)
+        self._pending = {}
+        _items = self._parse_items(items, self._pending)
         await self._event.update(_items)
 
+    async def on_patch(
+        self, patches: Mapping[str, bytes], items: Mapping[str, bytes]
+    ) -> None:
+        # The merged items follow as an update
+        if not self._event.patch.empty:
+            await self._event.patch(
+                {key: decode_patch(patch) for key, patch in patches.items()}
+            )
+
     async def on_remove(self, items: Mapping[str, bytes]) -> None:
         _items = self._parse_items(items)
         await self._event.remove(_items)
 
+    async def on_remove_keys(self, keys: Sequence[str]) -> None:
+        await self._event.remove_keys(keys)
+
     async def on_clear(self) -> None:
         await self._event.clear()
 
-    def proxy(self, callback: Coro[[T], T | None]) -> Unlisten:
-        raise NotImplementedError
+    def proxy(self, callback: Coro[[T], T | None], concurrency: int = 1) -> Unlisten:
+        return self.proxy_batch(batch_proxy(callback, concurrency))
 
-    def _parse_items(self, items: Mapping[str, bytes]) -> dict[str, T]:
-        parsed: dict[str, T] = {}
-        for key, item in items.items():
-            item = self._type.serializer.deserialize(item)
+    def proxy_batch(self, callback: Coro[[list[T]], Sequence[T | None]]) -> Unlisten:
+        # Run in process by the proxy pipeline of the table, before the
+        # proxies of sessions
+        if not self._proxying:
+            self._table.attach_local_proxy(self)
+            self._proxying = True
+        self._proxies.append(callback)
+        return lambda: self._proxies.remove(callback)
+
+    @property
+    def has_proxies(self) -> bool:
+        return bool(self._proxies)
+
+    def decode_items(self, items: Mapping[str, bytes]) -> dict[str, T]:
+        return self._parse_items(items)
+
+    def encode_items(self, items: Mapping[str, T]) -> Mapping[str, bytes]:
+        return {
+            key: self._type.serializer.serialize(item) for key, item in items.items()
+        }
+
+    async def run_proxies(self, items: dict[str, T]) -> dict[str, T]:
+        return await run_proxies(self._proxies, items)
+
+    def _parse_items(
+        self,
+        items: Mapping[str, bytes],
+        pending: dict[str, tuple[bytes, T]] | None = None,
+    ) -> dict[str, T]:
+        return {key: self._decode(key, item, pending) for key, item in items.items()}
+
+    def _decode(
+        self,
+        key: str,
+        data: bytes,
+        pending: dict[str, tuple[bytes, T]] | None = None,
+    ) -> T:
+        entry = self._decoded.get(key)
+        if entry is None or entry[0] != data:
+            item = self._type.serializer.deserialize(data)
             if not item:
                 raise Exception(f"Failed to deserialize item {key}")
-            parsed[key] = item
-        return parsed
+            entry = (data, item)
+            if self._table.cache.get(key) == data:
+                self._decoded[key] = entry
+            elif pending is not None:
+                pending[key] = entry
+        # Shared like the items of the client cache, so callers must not change
+        # them in place but write a changed item back
+        return entry[1]
@@ -1,10 +1,23 @@
 from __future__ import annotations
 
 import abc
-from collections.abc import AsyncGenerator, Mapping
+from collections.abc import AsyncGenerator, Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any, Protocol
 
 from omu.event_emitter import EventEmitter
-from omu.extension.table import TableConfig
+from omu.extension.table import (
+    IndexValue,
+    TableCacheChange,
+    TableChanges,
+    TableConfig,
+    TableDump,
+    TablePage,
+    TableQuery,
+    TableRestore,
+    TableSearchQuery,
+    TableWrite,
+)
 from omu.extension.table.table import TablePermissions
 from omu.identifier import Identifier
 
@@ -15,6 +28,41 @@ from .adapters.tableadapter import TableAdapter
 type Json = str | int | float | bool | None | dict[str, Json] | list[Json]
 
 
+@dataclass(slots=True)
+class UpdateStats:
+    received: int = 0
+    # Updates replaced by a newer one within the update window
+    coalesced: int = 0
+
+
+@dataclass(slots=True)
+class ProxyStats:
+    batches: int = 0
+    # Batches passed on without the proxy's answer
+    timeouts: int = 0
+    # Batches passed on after the proxy raised, in-process proxies only
+    errors: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / self.batches if self.batches else 0.0
+
+
+class LocalProxy(Protocol):
+    # Proxies called in this process on decoded items, like those of a
+    # TableImpl of an in-process plugin
+    @property
+    def has_proxies(self) -> bool: ...
+
+    def decode_items(self, items: Mapping[str, bytes]) -> dict[str, Any]: ...
+
+    def encode_items(self, items: Mapping[str, Any]) -> Mapping[str, bytes]: ...
+
+    async def run_proxies(self, items: dict[str, Any]) -> dict[str, Any]: ...
+
+
 class ServerTable(abc.ABC):
     @abc.abstractmethod
     async def load(self) -> None: ...
@@ -22,6 +70,9 @@ class ServerTable(abc.ABC):
     @abc.abstractmethod
     async def store(self) -> None: ...
 
+    @abc.abstractmethod
+    async def warm_up(self) -> int: ...
+
     @property
     @abc.abstractmethod
     def id(self) -> Identifier: ...
@@ -40,6 +91,10 @@ class ServerTable(abc.ABC):
     @abc.abstractmethod
     def set_permissions(self, permissions: TablePermissions) -> None: ...
 
+    @property
+    @abc.abstractmethod
+    def cache_size(self) -> int: ...
+
     @abc.abstractmethod
     def set_cache_size(self, size: int) -> None: ...
 
@@ -51,7 +106,9 @@ class ServerTable(abc.ABC):
     def set_adapter(self, adapter: TableAdapter) -> None: ...
 
     @abc.abstractmethod
-    def attach_session(self, session: Session) -> None: ...
+    def attach_session(
+        self, session: Session, removed_values: bool = True, patches: bool = False
+    ) -> None: ...
 
     @abc.abstractmethod
     def detach_session(self, session: Session) -> None: ...
@@ -59,6 +116,9 @@ class ServerTable(abc.ABC):
     @abc.abstractmethod
     def attach_proxy_session(self, session: Session) -> None: ...
 
+    @abc.abstractmethod
+    def attach_local_proxy(self, proxy: LocalProxy) -> None: ...
+
     @abc.abstractmethod
     async def proxy(
         self, session: Session, key: int, items: Mapping[str, bytes]
@@ -76,12 +136,18 @@ class ServerTable(abc.ABC):
     @abc.abstractmethod
     async def update(self, items: Mapping[str, bytes]) -> None: ...
 
+    @abc.abstractmethod
+    async def patch(self, patches: Mapping[str, bytes]) -> None: ...
+
     @abc.abstractmethod
     async def remove(self, keys: list[str]) -> None: ...
 
     @abc.abstractmethod
     async def clear(self) -> None: ...
 
+    @abc.abstractmethod
+    async def write_batch(self, writes: Sequence[TableWrite]) -> None: ...
+
     @abc.abstractmethod
     async def fetch_items(
         self,
@@ -90,14 +156,74 @@ class ServerTable(abc.ABC):
         cursor: str | None = None,
     ) -> dict[str, bytes]: ...
 
+    @abc.abstractmethod
+    async def fetch_page(
+        self, limit: int, backward: bool = True, cursor: str | None = None
+    ) -> TablePage[bytes]: ...
+
     @abc.abstractmethod
     async def fetch_range(self, start: str, end: str) -> dict[str, bytes]: ...
 
+    @abc.abstractmethod
+    async def fetch_by_index(
+        self,
+        index: str,
+        start: IndexValue | None = None,
+        end: IndexValue | None = None,
+        limit: int | None = None,
+        backward: bool = False,
+    ) -> dict[str, bytes]: ...
+
+    @abc.abstractmethod
+    async def query(self, query: TableQuery) -> dict[str, bytes]: ...
+
+    @abc.abstractmethod
+    async def search(self, query: TableSearchQuery) -> TablePage[bytes]: ...
+
     @abc.abstractmethod
     async def fetch_all(self) -> dict[str, bytes]: ...
 
     @abc.abstractmethod
-    async def iterate(self) -> AsyncGenerator[bytes, None]: ...
+    async def dump(self, dump: TableDump) -> int: ...
+
+    @abc.abstractmethod
+    async def restore(self, restore: TableRestore) -> int: ...
+
+    @abc.abstractmethod
+    async def fetch_changes(self, offset: int, limit: int) -> TableChanges[bytes]: ...
+
+    @abc.abstractmethod
+    async def get_consumer_offset(self, consumer: str) -> int: ...
+
+    @abc.abstractmethod
+    async def commit_offset(self, consumer: str, offset: int) -> None: ...
+
+    @abc.abstractmethod
+    async def compact_changes(self) -> int: ...
+
+    @abc.abstractmethod
+    async def enforce_retention(self, batch_size: int) -> int: ...
+
+    @abc.abstractmethod
+    async def compact(self, pages: int) -> int: ...
+
+    @abc.abstractmethod
+    async def flush_updates(self) -> None: ...
+
+    @property
+    @abc.abstractmethod
+    def update_stats(self) -> UpdateStats: ...
+
+    @property
+    @abc.abstractmethod
+    def proxy_stats(self) -> Mapping[str, ProxyStats]: ...
+
+    @property
+    @abc.abstractmethod
+    def idle_time(self) -> float: ...
+
+    @abc.abstractmethod
+    def iterate(self) -> AsyncGenerator[bytes, None]: ...
 
     @abc.abstractmethod
     async def size(self) -> int: ...
@@ -111,6 +237,11 @@ class ServerTableEvents:
     def __init__(self) -> None:
         self.add = EventEmitter[Mapping[str, bytes]]()
         self.update = EventEmitter[Mapping[str, bytes]]()
+        # Merge patches and the merged items, which then follow as an update
+        self.patch = EventEmitter[Mapping[str, bytes], Mapping[str, bytes]]()
+        # Removed values are only read while remove has listeners
         self.remove = EventEmitter[Mapping[str, bytes]]()
+        self.remove_keys = EventEmitter[Sequence[str]]()
         self.clear = EventEmitter[[]]()
         self.cache_update = EventEmitter[Mapping[str, bytes]]()
+        self.cache_change = EventEmitter[TableCacheChange[bytes]]()
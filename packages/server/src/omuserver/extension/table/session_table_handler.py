@@ -1,14 +1,17 @@
 from __future__ import annotations
 
-from collections.abc import Mapping
+from collections.abc import Mapping, Sequence
 from typing import Any
 
 from omu.extension.table.table_extension import (
     TABLE_ITEM_ADD_PACKET,
     TABLE_ITEM_CLEAR_PACKET,
+    TABLE_ITEM_PATCH_PACKET,
+    TABLE_ITEM_REMOVE_KEYS_PACKET,
     TABLE_ITEM_REMOVE_PACKET,
     TABLE_ITEM_UPDATE_PACKET,
     TableItemsPacket,
+    TableKeysPacket,
     TablePacket,
 )
 from omu.helper import batch_call
@@ -19,19 +22,43 @@ from omuserver.session import Session
 
 
 class SessionTableListener:
-    def __init__(self, id: Identifier, session: Session, table: ServerTable) -> None:
+    def __init__(
+        self,
+        id: Identifier,
+        session: Session,
+        table: ServerTable,
+        removed_values: bool = True,
+        patches: bool = False,
+    ) -> None:
         self.id = id
         self.session = session
         self.table = table
+        self.removed_values = removed_values
+        self.patches = patches
+        # Patched items are emitted as update right after their patch, and
+        # are not sent again to a session that was sent the patch
+        self._patched: dict[str, bytes] = {}
         self.unlisten = batch_call(
             table.event.add.listen(self.on_add),
             table.event.update.listen(self.on_update),
-            table.event.remove.listen(self.on_remove),
+            table.event.patch.listen(self.on_patch),
             table.event.clear.listen(self.on_clear),
         )
+        if removed_values:
+            self.unlisten_remove = table.event.remove.listen(self.on_remove)
+        else:
+            self.unlisten_remove = table.event.remove_keys.listen(self.on_remove_keys)
+
+    def request_removed_values(self) -> None:
+        if self.removed_values:
+            return
+        self.unlisten_remove()
+        self.unlisten_remove = self.table.event.remove.listen(self.on_remove)
+        self.removed_values = True
 
     def close(self) -> None:
         self.unlisten()
+        self.unlisten_remove()
 
     async def on_add(self, items: Mapping[str, Any]) -> None:
         if self.session.closed:
@@ -47,6 +74,14 @@ class SessionTableListener:
     async def on_update(self, items: Mapping[str, Any]) -> None:
         if self.session.closed:
             return
+        if self._patched:
+            items = {
+                key: value
+                for key, value in items.items()
+                if self._patched.pop(key, None) is not value
+            }
+            if not items:
+                return
         await self.session.send(
             TABLE_ITEM_UPDATE_PACKET,
             TableItemsPacket(
@@ -55,6 +90,20 @@ class SessionTableListener:
             ),
         )
 
+    async def on_patch(
+        self, patches: Mapping[str, bytes], items: Mapping[str, bytes]
+    ) -> None:
+        if self.session.closed or not self.patches:
+            return
+        self._patched.update(items)
+        await self.session.send(
+            TABLE_ITEM_PATCH_PACKET,
+            TableItemsPacket(
+                id=self.id,
+                items=patches,
+            ),
+        )
+
     async def on_remove(self, items: Mapping[str, Any]) -> None:
         if self.session.closed:
             return
@@ -66,6 +115,17 @@ class SessionTableListener:
             ),
         )
 
+    async def on_remove_keys(self, keys: Sequence[str]) -> None:
+        if self.session.closed:
+            return
+        await self.session.send(
+            TABLE_ITEM_REMOVE_KEYS_PACKET,
+            TableKeysPacket(
+                id=self.id,
+                keys=keys,
+            ),
+        )
+
     async def on_clear(self) -> None:
         if self.session.closed:
             return
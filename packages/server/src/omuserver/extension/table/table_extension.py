@@ -1,34 +1,69 @@
 from __future__ import annotations
 
-from collections.abc import Callable
+import asyncio
+import json
+import time
+from collections.abc import Callable, Mapping, Sequence
 from pathlib import Path
 
+from loguru import logger
 from omu.errors import PermissionDenied
 from omu.extension.permission import PermissionType
-from omu.extension.table import Table, TablePermissions, TableType
+from omu.extension.table import (
+    Table,
+    TableAdapterType,
+    TableConfig,
+    TablePermissions,
+    TableType,
+    TableWrite,
+)
 from omu.extension.table.packets import (
     SetConfigPacket,
     SetPermissionPacket,
+    TableBatchPacket,
+    TableChangesPacket,
+    TableChangesSincePacket,
+    TableDumpPacket,
+    TableFetchIndexPacket,
     TableFetchPacket,
+    TableFetchPagePacket,
     TableFetchRangePacket,
     TableItemsPacket,
     TableKeysPacket,
+    TableOffsetPacket,
     TablePacket,
+    TablePagePacket,
     TableProxyPacket,
+    TableQueryPacket,
+    TableRestorePacket,
+    TableSearchPacket,
 )
 from omu.extension.table.table_extension import (
+    TABLE_BATCH_PACKET,
+    TABLE_CHANGES_SINCE_ENDPOINT,
+    TABLE_COMMIT_OFFSET_ENDPOINT,
+    TABLE_DUMP_ENDPOINT,
     TABLE_FETCH_ALL_ENDPOINT,
+    TABLE_FETCH_BY_INDEX_ENDPOINT,
     TABLE_FETCH_ENDPOINT,
+    TABLE_FETCH_PAGE_ENDPOINT,
     TABLE_FETCH_RANGE_ENDPOINT,
     TABLE_ITEM_ADD_PACKET,
     TABLE_ITEM_CLEAR_PACKET,
     TABLE_ITEM_GET_ENDPOINT,
+    TABLE_ITEM_PATCH_PACKET,
+    TABLE_ITEM_REMOVE_KEYS_PACKET,
     TABLE_ITEM_REMOVE_PACKET,
     TABLE_ITEM_UPDATE_PACKET,
+    TABLE_LISTEN_KEYS_PACKET,
     TABLE_LISTEN_PACKET,
+    TABLE_LISTEN_PATCHES_PACKET,
     TABLE_PERMISSION_ID,
     TABLE_PROXY_LISTEN_PACKET,
     TABLE_PROXY_PACKET,
+    TABLE_QUERY_ENDPOINT,
+    TABLE_RESTORE_ENDPOINT,
+    TABLE_SEARCH_ENDPOINT,
     TABLE_SET_CONFIG_PACKET,
     TABLE_SET_PERMISSION_PACKET,
     TABLE_SIZE_ENDPOINT,
@@ -39,6 +74,9 @@ from omu.interface import Keyable
 from omuserver.server import Server
 from omuserver.session import Session
 
+from .adapters.logtable import LogTableAdapter
+from .adapters.memorytable import InMemoryTableAdapter
+from .adapters.partitionedtable import PartitionedTableAdapter
 from .adapters.sqlitetable import SqliteTableAdapter
 from .adapters.tableadapter import TableAdapter
 from .cached_table import CachedTable
@@ -61,22 +99,70 @@ TABLE_PERMISSION = PermissionType(
 )
 
 
+RETENTION_INTERVAL = 60
+RETENTION_BATCH_SIZE = 500
+COMPACT_IDLE_TIME = 30
+COMPACT_PAGES = 256
+MIGRATE_BATCH_SIZE = 1000
+WARM_UP_FILE = "warm_up.json"
+ADAPTER_TYPES: dict[TableAdapterType, type[TableAdapter]] = {
+    "sqlite": SqliteTableAdapter,
+    "log": LogTableAdapter,
+    "memory": InMemoryTableAdapter,
+}
+
+
+def find_adapter(path: Path) -> type[TableAdapter] | None:
+    for adapter_type in (*ADAPTER_TYPES.values(), PartitionedTableAdapter):
+        if adapter_type.exists(path):
+            return adapter_type
+    return None
+
+
+async def copy_items(adapter: TableAdapter, items: Mapping[str, bytes]) -> None:
+    if not items:
+        return
+    existing = await adapter.get_many(list(items))
+    added = [key for key in items if key not in existing]
+    updated = [key for key in items if key in existing]
+    with adapter.batch():
+        if added:
+            await adapter.record_changes("add", added)
+        if updated:
+            await adapter.record_changes("update", updated)
+        await adapter.set_all(items)
+
+
+def open_adapter(path: Path) -> TableAdapter:
+    # Tables stay on the adapter they were created with until a config
+    # selects another one
+    adapter_type = find_adapter(path) or SqliteTableAdapter
+    return adapter_type.create(path)
+
+
 class TableExtension:
     def __init__(self, server: Server) -> None:
         self.server = server
         self._tables: dict[Identifier, ServerTable] = {}
         self._adapters: list[TableAdapter] = []
+        self._retention_task: asyncio.Task | None = None
+        self._warm_up_task: asyncio.Task | None = None
         server.permission_manager.register(TABLE_PERMISSION)
         server.packet_dispatcher.register(
             TABLE_SET_PERMISSION_PACKET,
             TABLE_SET_CONFIG_PACKET,
             TABLE_LISTEN_PACKET,
+            TABLE_LISTEN_KEYS_PACKET,
+            TABLE_LISTEN_PATCHES_PACKET,
             TABLE_PROXY_LISTEN_PACKET,
             TABLE_PROXY_PACKET,
             TABLE_ITEM_ADD_PACKET,
             TABLE_ITEM_UPDATE_PACKET,
+            TABLE_ITEM_PATCH_PACKET,
             TABLE_ITEM_REMOVE_PACKET,
+            TABLE_ITEM_REMOVE_KEYS_PACKET,
             TABLE_ITEM_CLEAR_PACKET,
+            TABLE_BATCH_PACKET,
         )
         server.packet_dispatcher.add_packet_handler(
             TABLE_SET_PERMISSION_PACKET,
@@ -90,6 +176,14 @@ class TableExtension:
             TABLE_LISTEN_PACKET,
             self.handler_listen,
         )
+        server.packet_dispatcher.add_packet_handler(
+            TABLE_LISTEN_KEYS_PACKET,
+            self.handle_listen_keys,
+        )
+        server.packet_dispatcher.add_packet_handler(
+            TABLE_LISTEN_PATCHES_PACKET,
+            self.handle_listen_patches,
+        )
         server.packet_dispatcher.add_packet_handler(
             TABLE_PROXY_LISTEN_PACKET,
             self.handle_proxy_listen,
@@ -106,14 +200,26 @@ class TableExtension:
             TABLE_ITEM_UPDATE_PACKET,
             self.handle_item_update,
         )
+        server.packet_dispatcher.add_packet_handler(
+            TABLE_ITEM_PATCH_PACKET,
+            self.handle_item_patch,
+        )
         server.packet_dispatcher.add_packet_handler(
             TABLE_ITEM_REMOVE_PACKET,
             self.handle_item_remove,
         )
+        server.packet_dispatcher.add_packet_handler(
+            TABLE_ITEM_REMOVE_KEYS_PACKET,
+            self.handle_item_remove_keys,
+        )
         server.packet_dispatcher.add_packet_handler(
             TABLE_ITEM_CLEAR_PACKET,
             self.handle_item_clear,
         )
+        server.packet_dispatcher.add_packet_handler(
+            TABLE_BATCH_PACKET,
+            self.handle_batch,
+        )
         server.endpoints.bind_endpoint(
             TABLE_ITEM_GET_ENDPOINT,
             self.handle_item_get,
@@ -122,10 +228,26 @@ class TableExtension:
             TABLE_FETCH_ENDPOINT,
             self.handle_item_fetch,
         )
+        server.endpoints.bind_endpoint(
+            TABLE_FETCH_PAGE_ENDPOINT,
+            self.handle_item_fetch_page,
+        )
         server.endpoints.bind_endpoint(
             TABLE_FETCH_RANGE_ENDPOINT,
             self.handle_item_fetch_range,
         )
+        server.endpoints.bind_endpoint(
+            TABLE_FETCH_BY_INDEX_ENDPOINT,
+            self.handle_item_fetch_by_index,
+        )
+        server.endpoints.bind_endpoint(
+            TABLE_QUERY_ENDPOINT,
+            self.handle_item_query,
+        )
+        server.endpoints.bind_endpoint(
+            TABLE_SEARCH_ENDPOINT,
+            self.handle_item_search,
+        )
         server.endpoints.bind_endpoint(
             TABLE_FETCH_ALL_ENDPOINT,
             self.handle_item_fetch_all,
@@ -134,6 +256,22 @@ class TableExtension:
             TABLE_SIZE_ENDPOINT,
             self.handle_table_size,
         )
+        server.endpoints.bind_endpoint(
+            TABLE_CHANGES_SINCE_ENDPOINT,
+            self.handle_changes_since,
+        )
+        server.endpoints.bind_endpoint(
+            TABLE_COMMIT_OFFSET_ENDPOINT,
+            self.handle_commit_offset,
+        )
+        server.endpoints.bind_endpoint(
+            TABLE_DUMP_ENDPOINT,
+            self.handle_dump,
+        )
+        server.endpoints.bind_endpoint(
+            TABLE_RESTORE_ENDPOINT,
+            self.handle_restore,
+        )
         server.event.start += self.on_server_start
         server.event.stop += self.on_server_stop
 
@@ -161,6 +299,21 @@ class TableExtension:
             items=items,
         )
 
+    async def handle_item_fetch_page(
+        self, session: Session, packet: TableFetchPagePacket
+    ) -> TablePagePacket:
+        table = await self.get_table(packet.id)
+        page = await table.fetch_page(
+            limit=packet.limit,
+            backward=packet.backward,
+            cursor=packet.cursor,
+        )
+        return TablePagePacket(
+            id=packet.id,
+            items=page.items,
+            cursor=page.cursor,
+        )
+
     async def handle_item_fetch_range(
         self, session: Session, packet: TableFetchRangePacket
     ) -> TableItemsPacket:
@@ -171,6 +324,43 @@ class TableExtension:
             items=items,
         )
 
+    async def handle_item_fetch_by_index(
+        self, session: Session, packet: TableFetchIndexPacket
+    ) -> TableItemsPacket:
+        table = await self.get_table(packet.id)
+        items = await table.fetch_by_index(
+            packet.index,
+            start=packet.start,
+            end=packet.end,
+            limit=packet.limit,
+            backward=packet.backward,
+        )
+        return TableItemsPacket(
+            id=packet.id,
+            items=items,
+        )
+
+    async def handle_item_query(
+        self, session: Session, packet: TableQueryPacket
+    ) -> TableItemsPacket:
+        table = await self.get_table(packet.id)
+        items = await table.query(packet.query)
+        return TableItemsPacket(
+            id=packet.id,
+            items=items,
+        )
+
+    async def handle_item_search(
+        self, session: Session, packet: TableSearchPacket
+    ) -> TablePagePacket:
+        table = await self.get_table(packet.id)
+        page = await table.search(packet.query)
+        return TablePagePacket(
+            id=packet.id,
+            items=page.items,
+            cursor=page.cursor,
+        )
+
     async def handle_item_fetch_all(
         self, session: Session, packet: TablePacket
     ) -> TableItemsPacket:
@@ -185,6 +375,64 @@ class TableExtension:
         table = await self.get_table(packet.id)
         return await table.size()
 
+    async def handle_changes_since(
+        self, session: Session, packet: TableChangesSincePacket
+    ) -> TableChangesPacket:
+        table = await self.get_table(packet.id)
+        await self.verify_permission(
+            session,
+            table,
+            lambda perms: [perms.all, perms.read],
+        )
+        offset = packet.offset
+        if offset is None:
+            offset = 0
+            if packet.consumer is not None:
+                consumer = (session.app.id / packet.consumer).key()
+                offset = await table.get_consumer_offset(consumer)
+        changes = await table.fetch_changes(offset, packet.limit)
+        return TableChangesPacket(
+            id=packet.id,
+            changes=changes.changes,
+            offset=changes.offset,
+        )
+
+    async def handle_commit_offset(
+        self, session: Session, packet: TableOffsetPacket
+    ) -> None:
+        table = await self.get_table(packet.id)
+        await self.verify_permission(
+            session,
+            table,
+            lambda perms: [perms.all, perms.read],
+        )
+        consumer = (session.app.id / packet.consumer).key()
+        await table.commit_offset(consumer, packet.offset)
+
+    async def handle_dump(self, session: Session, packet: TableDumpPacket) -> int:
+        table = await self.get_table(packet.id)
+        await self.verify_permission(
+            session,
+            table,
+            lambda perms: [perms.all, perms.read],
+        )
+        return await table.dump(packet.dump)
+
+    async def handle_restore(self, session: Session, packet: TableRestorePacket) -> int:
+        table = await self.get_table(packet.id)
+        if packet.restore.get("replace", False):
+            await self.verify_permission(
+                session,
+                table,
+                lambda perms: [perms.all, perms.remove],
+            )
+        await self.verify_permission(
+            session,
+            table,
+            lambda perms: [perms.all, perms.write],
+        )
+        return await table.restore(packet.restore)
+
     async def handle_bind_permission(
         self, session: Session, packet: SetPermissionPacket
     ) -> None:
@@ -212,7 +460,106 @@ class TableExtension:
             table,
             lambda perms: [perms.all],
         )
-        table.set_config(packet.config)
+        await self.configure_table(table, packet.config)
+
+    async def configure_table(self, table: ServerTable, config: TableConfig) -> None:
+        adapter_name = config.get("adapter")
+        if adapter_name is not None:
+            adapter_type = ADAPTER_TYPES.get(adapter_name)
+            if adapter_type is None:
+                raise ValueError(f"Unknown table adapter {adapter_name}")
+        elif table.adapter is not None and not isinstance(
+            table.adapter, PartitionedTableAdapter
+        ):
+            # A config without an adapter keeps the one the table has
+            adapter_type = type(table.adapter)
+        else:
+            adapter_type = SqliteTableAdapter
+        if "partition" in config:
+            if adapter_type is not SqliteTableAdapter:
+                raise ValueError("Partitioned tables are stored in sqlite")
+            adapter_type = PartitionedTableAdapter
+        if type(table.adapter) is not adapter_type:
+            await self.migrate_table(table, adapter_type, config)
+        table.set_config(config)
+
+    async def migrate_table(
+        self,
+        table: ServerTable,
+        adapter_type: type[TableAdapter],
+        config: TableConfig,
+    ) -> None:
+        # Items are copied a batch at a time while the table keeps serving
+        # from the old adapter, keys written in between are copied again at
+        # the end. The new change log starts with a clear, so consumers that
+        # had not read everything read the whole table again from it.
+        old_adapter = table.adapter
+        adapter = adapter_type.create(self.get_table_path(table.id))
+        adapter.configure(config)
+        await adapter.load()
+        # Also drops what an interrupted migration left behind
+        await adapter.record_changes("clear", [])
+        await adapter.clear()
+        if old_adapter is not None:
+            written: dict[str, None] = {}
+            cleared = False
+
+            async def on_write(items: Mapping[str, bytes]) -> None:
+                written.update(dict.fromkeys(items))
+
+            async def on_remove(keys: Sequence[str]) -> None:
+                written.update(dict.fromkeys(keys))
+
+            async def on_clear() -> None:
+                nonlocal cleared
+                cleared = True
+                written.clear()
+
+            unlistens = [
+                table.event.add.listen(on_write),
+                table.event.update.listen(on_write),
+                table.event.remove_keys.listen(on_remove),
+                table.event.clear.listen(on_clear),
+            ]
+            try:
+                cursor: str | None = None
+                while not cleared:
+                    page = await old_adapter.fetch_page(
+                        MIGRATE_BATCH_SIZE, False, cursor
+                    )
+                    await copy_items(adapter, page.items)
+                    if page.cursor is None:
+                        break
+                    cursor = page.cursor
+                    # Serve other requests between batches
+                    await asyncio.sleep(0)
+            finally:
+                for unlisten in unlistens:
+                    unlisten()
+            # Nothing below yields, so no write is missed
+            if cleared:
+                await adapter.record_changes("clear", [])
+                await adapter.clear()
+            items = await old_adapter.get_many(list(written))
+            await copy_items(adapter, items)
+            removed = [key for key in written if key not in items]
+            if removed:
+                with adapter.batch():
+                    await adapter.record_changes("remove", removed)
+                    await adapter.remove_all(removed)
+            last_offset = await old_adapter.get_last_offset()
+            new_offset = await adapter.get_last_offset()
+            for consumer, offset in (await old_adapter.get_consumer_offsets()).items():
+                # Consumers that had read everything stay caught up
+                caught_up = offset >= last_offset
+                await adapter.set_consumer_offset(
+                    consumer, new_offset if caught_up else 0
+                )
+            await adapter.store()
+        table.set_adapter(adapter)
+        if old_adapter is not None:
+            await old_adapter.drop()
+        logger.info(f"Migrated table {table.id} to {adapter_type.__name__}")
 
     async def handler_listen(self, session: Session, id: Identifier) -> None:
         table = await self.get_table(id)
@@ -223,6 +570,24 @@ class TableExtension:
         )
         table.attach_session(session)
 
+    async def handle_listen_keys(self, session: Session, id: Identifier) -> None:
+        table = await self.get_table(id)
+        await self.verify_permission(
+            session,
+            table,
+            lambda perms: [perms.all, perms.read],
+        )
+        table.attach_session(session, removed_values=False)
+
+    async def handle_listen_patches(self, session: Session, id: Identifier) -> None:
+        table = await self.get_table(id)
+        await self.verify_permission(
+            session,
+            table,
+            lambda perms: [perms.all, perms.read],
+        )
+        table.attach_session(session, removed_values=False, patches=True)
+
     async def handle_proxy_listen(self, session: Session, id: Identifier) -> None:
         table = await self.get_table(id)
         await self.verify_permission(
@@ -261,6 +626,17 @@ class TableExtension:
         )
         await table.update(packet.items)
 
+    async def handle_item_patch(
+        self, session: Session, packet: TableItemsPacket
+    ) -> None:
+        table = await self.get_table(packet.id)
+        await self.verify_permission(
+            session,
+            table,
+            lambda perms: [perms.all, perms.write],
+        )
+        await table.patch(packet.items)
+
     async def handle_item_remove(
         self, session: Session, packet: TableItemsPacket
     ) -> None:
@@ -272,6 +648,17 @@ class TableExtension:
         )
         await table.remove(list(packet.items.keys()))
 
+    async def handle_item_remove_keys(
+        self, session: Session, packet: TableKeysPacket
+    ) -> None:
+        table = await self.get_table(packet.id)
+        await self.verify_permission(
+            session,
+            table,
+            lambda perms: [perms.all, perms.remove],
+        )
+        await table.remove(list(packet.keys))
+
     async def handle_item_clear(self, session: Session, packet: TablePacket) -> None:
         table = await self.get_table(packet.id)
         await self.verify_permission(
@@ -281,6 +668,27 @@ class TableExtension:
         )
         await table.clear()
 
+    async def handle_batch(self, session: Session, packet: TableBatchPacket) -> None:
+        # Every write is checked before any is applied
+        batches: dict[ServerTable, list[TableWrite]] = {}
+        for write in packet.writes:
+            table = await self.get_table(write.id)
+            if write.type in ("add", "update", "patch"):
+                await self.verify_permission(
+                    session,
+                    table,
+                    lambda perms: [perms.all, perms.write],
+                )
+            else:
+                await self.verify_permission(
+                    session,
+                    table,
+                    lambda perms: [perms.all, perms.remove],
+                )
+            batches.setdefault(table, []).append(write)
+        for table, writes in batches.items():
+            await table.write_batch(writes)
+
     async def register_table[T: Keyable](self, table_type: TableType[T]) -> Table[T]:
         table = await self.get_table(table_type.id)
         return SerializedTable(table, table_type)
@@ -289,7 +697,7 @@ class TableExtension:
         if id in self._tables:
             return self._tables[id]
         table = CachedTable(self.server, id)
-        adapter = SqliteTableAdapter.create(self.get_table_path(id))
+        adapter = open_adapter(self.get_table_path(id))
         await adapter.load()
         table.set_adapter(adapter)
         self._tables[id] = table
@@ -303,10 +711,96 @@ class TableExtension:
     async def on_server_start(self) -> None:
         for table in self._tables.values():
             await table.load()
+        self._warm_up_task = asyncio.create_task(self.warm_up())
+        self._retention_task = asyncio.create_task(self.retention_task())
 
     async def on_server_stop(self) -> None:
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+            self._warm_up_task = None
+        if self._retention_task is not None:
+            self._retention_task.cancel()
+            self._retention_task = None
+        self.save_warm_up()
         for table in self._tables.values():
             await table.store()
+            stats = table.update_stats
+            if stats.coalesced:
+                logger.info(
+                    f"Coalesced {stats.coalesced} of {stats.received} updates "
+                    f"on {table.id}"
+                )
+            for proxy, proxy_stats in table.proxy_stats.items():
+                logger.info(
+                    f"Proxy {proxy} on {table.id}: {proxy_stats.batches} batches, "
+                    f"{proxy_stats.mean_latency * 1000:.0f}ms mean, "
+                    f"{proxy_stats.max_latency * 1000:.0f}ms max, "
+                    f"{proxy_stats.timeouts} timeouts, {proxy_stats.errors} errors"
+                )
+
+    def get_warm_up_path(self) -> Path:
+        return self.server.directories.get("tables") / WARM_UP_FILE
+
+    def load_warm_up(self) -> dict[str, int]:
+        path = self.get_warm_up_path()
+        if not path.exists():
+            return {}
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except ValueError as e:
+            logger.warning(f"Ignoring invalid {path}: {e}")
+            return {}
+
+    def save_warm_up(self) -> None:
+        # Tables used in this run and their cache sizes, to be warmed up on
+        # the next start before their clients set the config again
+        tables = {id.key(): table.cache_size for id, table in self._tables.items()}
+        path = self.get_warm_up_path()
+        temp = path.with_suffix(".tmp")
+        temp.write_text(json.dumps(tables), encoding="utf-8")
+        temp.replace(path)
+
+    async def warm_up(self) -> None:
+        start = time.monotonic()
+        for key, cache_size in self.load_warm_up().items():
+            id = Identifier.from_key(key)
+            if id in self._tables:
+                continue
+            # Tables that were in memory or were removed are not recreated
+            if find_adapter(self.get_table_path(id)) is None:
+                continue
+            table = await self.get_table(id)
+            if cache_size and not table.cache_size:
+                table.set_cache_size(cache_size)
+        tables = tuple(self._tables.values())
+        results = await asyncio.gather(
+            *(table.warm_up() for table in tables), return_exceptions=True
+        )
+        rows = 0
+        for table, result in zip(tables, results, strict=True):
+            if isinstance(result, BaseException):
+                logger.error(f"Failed to warm up table {table.id}: {result}")
+                continue
+            rows += result
+        logger.info(
+            f"Warmed up {len(tables)} tables with {rows} cached items "
+            f"in {time.monotonic() - start:.2f}s"
+        )
+
+    async def retention_task(self) -> None:
+        while True:
+            await asyncio.sleep(RETENTION_INTERVAL)
+            for table in tuple(self._tables.values()):
+                try:
+                    await table.enforce_retention(RETENTION_BATCH_SIZE)
+                    await table.compact_changes()
+                    # Reclaim free pages only while nothing writes to the table
+                    while table.idle_time >= COMPACT_IDLE_TIME:
+                        if await table.compact(COMPACT_PAGES) == 0:
+                            break
+                        await asyncio.sleep(0)
+                except Exception as e:
+                    logger.error(f"Failed to enforce retention on {table.id}: {e}")
 
     async def verify_permission(
         self,
@@ -332,7 +826,24 @@ class TableExtension:
     def register[T: Keyable](self, table_type: TableType[T]) -> Table[T]:
         table = CachedTable(self.server, table_type.id)
         table.set_permissions(table_type.permissions)
-        adapter = SqliteTableAdapter.create(self.get_table_path(table_type.id))
+        config: TableConfig = {}
+        if table_type.indexes:
+            config["indexes"] = {**table_type.indexes}
+        if table_type.search is not None:
+            config["search"] = {**table_type.search}
+        if table_type.update_window is not None:
+            config["update_window"] = table_type.update_window
+        path = self.get_table_path(table_type.id)
+        if table_type.partition is not None:
+            config["partition"] = {**table_type.partition}
+            adapter = PartitionedTableAdapter.create(path)
+        elif table_type.adapter is not None:
+            config["adapter"] = table_type.adapter
+            adapter = ADAPTER_TYPES[table_type.adapter].create(path)
+        else:
+            adapter = open_adapter(path)
+        if config:
+            table.set_config(config)
         table.set_adapter(adapter)
         self._tables[table_type.id] = table
         return SerializedTable(table, table_type)
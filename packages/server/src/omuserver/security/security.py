@@ -12,6 +12,7 @@ from omu.extension.permission.permission import PermissionType
 from omu.identifier import Identifier
 from result import Ok, Result
 
+from omuserver.database import DATABASES
 from omuserver.server import Server
 from omuserver.session import SessionType
 
@@ -81,7 +82,7 @@ class ServerPermissionManager(PermissionManager):
         self._token_generator = TokenGenerator()
         self.permissions: dict[Identifier, PermissionType] = {}
         self.token_permissions: dict[str, list[Identifier]] = {}
-        self._token_db = sqlite3.connect(
+        self._token_database = DATABASES.open(
             server.directories.get("security") / "tokens.sqlite"
         )
         self._token_db.execute(
@@ -97,7 +98,7 @@ class ServerPermissionManager(PermissionManager):
         self.token_permissions: dict[str, list[Identifier]] = {}
         permission_dir = server.directories.get("permissions")
         permission_dir.mkdir(parents=True, exist_ok=True)
-        self.permission_db = sqlite3.connect(permission_dir / "permissions.db")
+        self._permission_database = DATABASES.open(permission_dir / "permissions.db")
         self.permission_db.execute(
             """
             CREATE TABLE IF NOT EXISTS permissions (
@@ -109,6 +110,14 @@ class ServerPermissionManager(PermissionManager):
         self.permission_db.commit()
         self.load_permissions()
 
+    @property
+    def _token_db(self) -> sqlite3.Connection:
+        return self._token_database.connection
+
+    @property
+    def permission_db(self) -> sqlite3.Connection:
+        return self._permission_database.connection
+
     def load_permissions(self) -> None:
         cursor = self.permission_db.cursor()
         cursor.execute("SELECT id, value FROM permissions")
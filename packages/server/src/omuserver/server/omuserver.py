@@ -10,6 +10,7 @@ from omu.address import Address
 
 from omuserver import __version__
 from omuserver.config import Config
+from omuserver.database import DATABASES
 from omuserver.directories import Directories
 from omuserver.extension.asset import AssetExtension
 from omuserver.extension.dashboard import DashboardExtension
@@ -156,6 +157,8 @@ class OmuServer(Server):
     async def shutdown(self) -> None:
         self._running = False
         await self._event.stop()
+        # After every extension stored its state
+        DATABASES.close()
 
     @property
     def config(self) -> Config:
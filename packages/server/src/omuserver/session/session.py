@@ -23,6 +23,8 @@ from result import Err, Ok
 from omuserver.server import Server
 
 if TYPE_CHECKING:
+    from omu.client import Client
+
     from omuserver.security import PermissionHandle
 
 
@@ -40,6 +42,11 @@ class SessionConnection(abc.ABC):
     @abc.abstractmethod
     def closed(self) -> bool: ...
 
+    @property
+    def local_client(self) -> Client | None:
+        # The client at the other end when it runs in the server's process
+        return None
+
 
 class SessionEvents:
     def __init__(self) -> None:
@@ -0,0 +1,88 @@
+import sqlite3
+import zipfile
+from pathlib import Path
+from typing import Any
+
+import pytest
+from omuserver import backup
+from omuserver.backup import backup_data
+
+
+@pytest.mark.asyncio
+async def test_backup_data(tmp_path: Path):
+    data = tmp_path / "data"
+    (data / "tables").mkdir(parents=True)
+    (data / "registry").mkdir()
+    (data / "backups").mkdir()
+    (data / "registry" / "version.json").write_text('"1.0.0"')
+    (data / "backups" / "old.zip").write_bytes(b"")
+    connection = sqlite3.connect(data / "tables" / "messages.db")
+    connection.execute("CREATE TABLE data (value)")
+    connection.executemany("INSERT INTO data VALUES (?)", [(i,) for i in range(1000)])
+    connection.commit()
+    # Not committed yet, so not part of the snapshot
+    connection.execute("INSERT INTO data VALUES (-1)")
+
+    archive = tmp_path / "backup.zip"
+    count = await backup_data(data, archive, exclude=[data / "backups"])
+    connection.commit()
+    connection.close()
+
+    assert count == 2
+    with zipfile.ZipFile(archive) as zip:
+        assert sorted(zip.namelist()) == ["registry/version.json", "tables/messages.db"]
+        assert zip.read("registry/version.json") == b'"1.0.0"'
+        zip.extract("tables/messages.db", tmp_path / "restored")
+    restored = sqlite3.connect(tmp_path / "restored" / "tables" / "messages.db")
+    assert restored.execute("SELECT COUNT(*), MIN(value) FROM data").fetchone() == (
+        1000,
+        0,
+    )
+    restored.close()
+
+
+def test_backup_restarted(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(backup, "MAX_RESTARTS", 0)
+    source = tmp_path / "source.db"
+    connection = sqlite3.connect(source)
+    connection.execute("CREATE TABLE data (value)")
+    connection.executemany(
+        "INSERT INTO data VALUES (?)", [(bytes(4096),) for _ in range(500)]
+    )
+    connection.commit()
+    writes = 0
+
+    class WrittenConnection(sqlite3.Connection):
+        def backup(self, target: sqlite3.Connection, **kwargs: Any) -> None:
+            def progress(status: int, remaining: int, total: int) -> None:
+                # Another connection writes between two steps
+                nonlocal writes
+                writes += 1
+                connection.execute("INSERT INTO data VALUES (x'00')")
+                connection.commit()
+                kwargs["progress"](status, remaining, total)
+
+            super().backup(target, pages=kwargs["pages"], progress=progress)
+
+    connect_readonly = backup.connect_readonly
+    opened: list[Path] = []
+
+    def connect(source: Path) -> sqlite3.Connection:
+        opened.append(source)
+        if len(opened) > 1:
+            return connect_readonly(source)
+        return sqlite3.connect(source, factory=WrittenConnection)
+
+    monkeypatch.setattr(backup, "connect_readonly", connect)
+    target = tmp_path / "target.db"
+    backup.backup_database(source, target)
+    assert writes >= 2
+    assert opened == [source, source]
+    restored = sqlite3.connect(target)
+    # Copied with VACUUM INTO once the copy restarted
+    assert restored.execute("SELECT COUNT(*) FROM data").fetchone() == (500 + writes,)
+    restored.close()
+    connection.close()
+
+    with pytest.raises(FileNotFoundError):
+        backup.backup_database(tmp_path / "missing.db", tmp_path / "target.db")
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import sqlite3
+from collections.abc import Callable, Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+import pytest
+from omu.app import App
+from omu.extension.table import TableType, TableWrite
+from omu.extension.table.table_extension import (
+    TABLE_ITEM_PATCH_PACKET,
+    TABLE_ITEM_UPDATE_PACKET,
+)
+from omu.identifier import Identifier
+from omu.serializer import Serializer
+from omuserver.extension.table.adapters.sqlitetable import SqliteTableAdapter
+from omuserver.extension.table.cached_table import CachedTable
+from omuserver.extension.table.serialized_table import SerializedTable
+
+
+@pytest.mark.asyncio
+async def test_sqlite_batch(tmp_path: Path):
+    adapter = SqliteTableAdapter(tmp_path / "table")
+    other = sqlite3.connect(tmp_path / "table.db")
+    with adapter.batch():
+        await adapter.set_all({"a": b"1", "b": b"2"})
+        await adapter.remove("a")
+        assert other.execute("SELECT COUNT(*) FROM data").fetchone() == (0,)
+    assert other.execute("SELECT key FROM data").fetchall() == [("b",)]
+
+    with pytest.raises(RuntimeError):
+        with adapter.batch():
+            await adapter.clear()
+            raise RuntimeError
+    assert await adapter.get("b") == b"2"
+    assert (await adapter.fetch_page(10, False, None)).items == {"b": b"2"}
+
+
+@pytest.mark.asyncio
+async def test_coalesced_events(tmp_path: Path):
+    table_type = TableType(
+        id=Identifier("com.example", "apps"),
+        serializer=Serializer.model(App).to_json(),
+        key_function=lambda item: item.key(),
+    )
+    cached_table = CachedTable(None, table_type.id)  # type: ignore
+    cached_table.set_adapter(SqliteTableAdapter(tmp_path / "apps"))
+    table = SerializedTable(cached_table, table_type)
+    apps = [App(Identifier("com.example", f"app{i}")) for i in range(3)]
+    await table.add(apps[0])
+
+    events: list[tuple[str, list[str]]] = []
+
+    def listener(name: str):
+        async def listen(items: Mapping[str, bytes]) -> None:
+            events.append((name, list(items)))
+
+        return listen
+
+    cached_table.event.add += listener("add")
+    cached_table.event.update += listener("update")
+    cached_table.event.remove += listener("remove")
+
+    async with table.batch():
+        await table.add(apps[1])
+        await table.add(apps[2])
+        await table.update(apps[0])
+        await table.remove(apps[2])
+        assert list(await table.fetch_all()) == [apps[0].key()]
+    assert events == [
+        ("remove", [apps[2].key()]),
+        ("add", [apps[1].key()]),
+        ("update", [apps[0].key()]),
+    ]
+    assert list(await table.fetch_all()) == [apps[1].key(), apps[0].key()]
+
+
+@pytest.mark.asyncio
+async def test_update_window(tmp_path: Path):
+    table = CachedTable(None, Identifier("com.example", "rooms"))  # type: ignore
+    table.set_adapter(SqliteTableAdapter(tmp_path / "rooms"))
+    table.set_config({"update_window": 0.05})
+    updates: list[Mapping[str, bytes]] = []
+
+    async def on_update(items: Mapping[str, bytes]) -> None:
+        updates.append(items)
+
+    table.event.update += on_update
+    for i in range(5):
+        await table.update({"room": str(i).encode(), f"other{i % 2}": b"x"})
+    assert await table.get("room") == b"4"
+    assert await table.adapter.get("room") is None  # type: ignore
+
+    await asyncio.sleep(0.1)
+    assert updates == [{"room": b"4", "other0": b"x", "other1": b"x"}]
+    assert table.update_stats.received == 10
+    assert table.update_stats.coalesced == 7
+
+    # Other writes apply after the held updates
+    await table.update({"room": b"5"})
+    await table.remove(["room"])
+    assert await table.get("room") is None
+
+
+@pytest.mark.asyncio
+async def test_remove_keys(tmp_path: Path):
+    table = CachedTable(None, Identifier("com.example", "items"))  # type: ignore
+    adapter = SqliteTableAdapter(tmp_path / "items")
+    table.set_adapter(adapter)
+    await table.add({"a": b"1", "b": b"2", "c": b"3"})
+    read: list[list[str]] = []
+    get_many = adapter.get_many
+
+    async def counting_get_many(keys: list[str]) -> dict[str, bytes]:
+        read.append(keys)
+        return await get_many(keys)
+
+    adapter.get_many = counting_get_many  # type: ignore
+    removed_keys: list[Sequence[str]] = []
+
+    async def on_remove_keys(keys: Sequence[str]) -> None:
+        removed_keys.append(keys)
+
+    table.event.remove_keys += on_remove_keys
+    await table.remove(["a"])
+    assert read == []
+    assert removed_keys == [["a"]]
+
+    # Values are only read once someone listens for them
+    removed: list[Mapping[str, bytes]] = []
+
+    async def on_remove(items: Mapping[str, bytes]) -> None:
+        removed.append(items)
+
+    table.event.remove += on_remove
+    await table.write_batch([TableWrite(table.id, "remove", {"b": b"", "x": b""})])
+    assert removed == [{"b": b"2"}]
+    assert removed_keys[-1] == ["b"]
+
+    # Keys that never existed are not recorded or sent
+    offset = (await table.fetch_changes(0, 100)).offset
+    await table.remove(["x"])
+    assert len(removed_keys) == 2
+    assert (await table.fetch_changes(0, 100)).offset == offset
+
+
+@pytest.mark.asyncio
+async def test_patch(tmp_path: Path, create_session: Callable[..., Any]):
+    table = CachedTable(None, Identifier("com.example", "rooms"))  # type: ignore
+    table.set_adapter(SqliteTableAdapter(tmp_path / "rooms"))
+    await table.add({"room": b'{"connected": true, "metadata": {"title": "a"}}'})
+    patches: list[Mapping[str, bytes]] = []
+
+    async def on_patch(items: Mapping[str, bytes], merged: Mapping[str, bytes]):
+        patches.append(items)
+
+    table.event.patch += on_patch
+    updates: list[Mapping[str, bytes]] = []
+
+    async def on_update(items: Mapping[str, bytes]) -> None:
+        updates.append(items)
+
+    table.event.update += on_update
+    await table.patch(
+        {
+            "room": b'{"metadata": {"viewers": 5, "title": null}}',
+            "missing": b'{"connected": false}',
+        }
+    )
+    assert patches == [{"room": b'{"metadata": {"viewers": 5, "title": null}}'}]
+    # Listeners of update receive the merged items too
+    assert updates == [{"room": await table.get("room")}]
+    assert json.loads(await table.get("room") or b"") == {
+        "connected": True,
+        "metadata": {"viewers": 5},
+    }
+
+    # An item patched twice in a batch is sent as an update of the merged item
+    await table.write_batch(
+        [
+            TableWrite(table.id, "patch", {"room": b'{"connected": false}'}),
+            TableWrite(table.id, "patch", {"room": b'{"metadata": {"viewers": 6}}'}),
+        ]
+    )
+    assert len(patches) == 1
+    assert json.loads(await table.get("room") or b"") == {
+        "connected": False,
+        "metadata": {"viewers": 6},
+    }
+    assert len(updates) == 2
+
+    # A session sent the patch is not sent its update, the others are
+    sessions = [create_session("first"), create_session("second")]
+    table.attach_session(sessions[0], removed_values=False, patches=True)  # type: ignore
+    table.attach_session(sessions[1], removed_values=False)  # type: ignore
+    await table.patch({"room": b'{"connected": true}'})
+    await table.update({"other": b"{}"})
+    sent = [
+        [(packet_type, packet.items) for packet_type, packet in session.sent]
+        for session in sessions
+    ]
+    assert sent[0] == [
+        (TABLE_ITEM_PATCH_PACKET, {"room": b'{"connected": true}'}),
+        (TABLE_ITEM_UPDATE_PACKET, {"other": b"{}"}),
+    ]
+    assert sent[1] == [
+        (TABLE_ITEM_UPDATE_PACKET, {"room": await table.get("room")}),
+        (TABLE_ITEM_UPDATE_PACKET, {"other": b"{}"}),
+    ]
@@ -0,0 +1,67 @@
+from collections.abc import Awaitable, Callable, Mapping
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from omu.app import App
+from omu.event_emitter import EventEmitter
+from omu.extension.table import TableConfig
+from omu.identifier import Identifier
+from omu.network.packet import PacketType
+from omuserver.extension.table.adapters.tableadapter import TableAdapter
+from omuserver.extension.table.table_extension import TableExtension
+
+
+class FakeSession:
+    def __init__(self, name: str, local_client: Any = None) -> None:
+        self.app = App(Identifier("com.example", name))
+        self.closed = False
+        self.connection = SimpleNamespace(local_client=local_client)
+        self.event = SimpleNamespace(disconnected=EventEmitter())
+        self.sent: list[tuple[PacketType, Any]] = []
+
+    async def send(self, packet_type: PacketType, packet: Any) -> None:
+        self.sent.append((packet_type, packet))
+
+
+@pytest.fixture
+def create_session() -> Callable[..., FakeSession]:
+    """Creates a session of the app com.example:`name` that records what it is
+    sent, served in process by `local_client` if given."""
+    return FakeSession
+
+
+@pytest.fixture
+def create_adapter(tmp_path: Path) -> Callable[..., Awaitable[Any]]:
+    """Creates an adapter of `adapter_type` in tmp_path holding `items`, or
+    key0..keyN with values value0..valueN if a count is given."""
+
+    async def create[T: TableAdapter](
+        adapter_type: type[T],
+        items: Mapping[str, bytes] | int = 0,
+        config: TableConfig | None = None,
+        name: str = "table",
+    ) -> T:
+        adapter = adapter_type(tmp_path / name)  # type: ignore
+        if config is not None:
+            adapter.configure(config)
+        if isinstance(items, int):
+            items = {f"key{i}": f"value{i}".encode() for i in range(items)}
+        if items:
+            await adapter.record_changes("add", list(items))
+            await adapter.set_all(items)
+        return adapter
+
+    return create
+
+
+@pytest.fixture
+def extension(tmp_path: Path) -> TableExtension:
+    """A table extension storing its tables in tmp_path, without a server."""
+    extension = object.__new__(TableExtension)
+    extension.server = SimpleNamespace(  # type: ignore
+        directories=SimpleNamespace(get=lambda name: tmp_path)
+    )
+    extension._tables = {}
+    return extension
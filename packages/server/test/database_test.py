@@ -0,0 +1,51 @@
+from pathlib import Path
+
+from omuserver.database import MIN_CACHE_SIZE, DatabaseManager
+
+
+def test_shared_handles(tmp_path: Path):
+    manager = DatabaseManager()
+    first = manager.open(tmp_path / "a.db")
+    second = manager.open(tmp_path / "." / "a.db")
+    assert first is second
+    assert first.connection is second.connection
+
+    first.close()
+    assert second.connected
+    second.close()
+    assert manager.connected == 0
+
+
+def test_evict_idle(tmp_path: Path):
+    manager = DatabaseManager(max_open=2, cache_budget=4096)
+    a, b, c = (manager.open(tmp_path / f"{name}.db") for name in "abc")
+    a.connection.execute("CREATE TABLE data (value)")
+    a.connection.execute("INSERT INTO data VALUES (1)")
+    b.connection.execute("SELECT 1")
+    assert b.connection.execute("PRAGMA cache_size").fetchone() == (-2048,)
+
+    # a is in a transaction, so b is closed instead
+    c.connection.execute("SELECT 1")
+    assert a.connected and not b.connected and c.connected
+    a.connection.commit()
+
+    # Using a again made c the least recently used
+    b.connection.execute("SELECT 1")
+    assert a.connected and b.connected and not c.connected
+    c.connection.execute("SELECT 1")
+    assert not a.connected
+    assert a.connection.execute("SELECT value FROM data").fetchall() == [(1,)]
+    assert manager.connected == 2
+
+    manager.close()
+    assert manager.connected == 0
+    # Alone again, c gets the whole budget
+    assert c.connection.execute("PRAGMA cache_size").fetchone() == (-4096,)
+
+
+def test_min_cache_size(tmp_path: Path):
+    manager = DatabaseManager(cache_budget=1)
+    database = manager.open(tmp_path / "a.db")
+    assert database.connection.execute("PRAGMA cache_size").fetchone() == (
+        -MIN_CACHE_SIZE,
+    )
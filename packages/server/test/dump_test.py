@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+
+import pytest
+from omuserver.extension.table.adapters.memorytable import InMemoryTableAdapter
+from omuserver.extension.table.adapters.sqlitetable import SqliteTableAdapter
+from omuserver.extension.table.dump import dump_adapter, read_dump, restore_adapter
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("format", ["binary", "ndjson"])
+async def test_dump_restore(tmp_path: Path, format):
+    source = SqliteTableAdapter(tmp_path / "source")
+    items = {f"key{i}": json.dumps({"index": i}).encode() for i in range(25)}
+    await source.set_all(items)
+    await source.set("key3", b'{"index": "updated"}')
+
+    path = tmp_path / "dump"
+    assert await dump_adapter(source, path, format, chunk_size=10) == 25
+    assert [len(chunk) for chunk in read_dump(path, format, chunk_size=10)] == [
+        10,
+        10,
+        5,
+    ]
+
+    target = InMemoryTableAdapter()
+    await target.set("stale", b"{}")
+    assert await restore_adapter(target, path, format, replace=True) == 25
+    assert list(await target.fetch_all()) == list(await source.fetch_all())
+    assert json.loads((await target.get("key3")) or b"") == {"index": "updated"}
+    # The stale add, the clear and one add per item
+    assert len(await target.fetch_changes(0, 100)) == 27
+
+
+@pytest.mark.asyncio
+async def test_invalid_dump(tmp_path: Path):
+    source = InMemoryTableAdapter()
+    await source.set("key", b"not json")
+    with pytest.raises(ValueError):
+        await dump_adapter(source, tmp_path / "dump", "ndjson")
+
+    await dump_adapter(source, tmp_path / "dump", "binary")
+    data = (tmp_path / "dump").read_bytes()
+    (tmp_path / "dump").write_bytes(data[:-2])
+    with pytest.raises(ValueError):
+        list(read_dump(tmp_path / "dump"))
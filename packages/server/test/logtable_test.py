@@ -0,0 +1,82 @@
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+from omuserver.extension.table.adapters.logtable import LogTableAdapter
+
+
+@pytest.mark.asyncio
+async def test_reload(tmp_path: Path, create_adapter: Callable[..., Awaitable[Any]]):
+    adapter = await create_adapter(LogTableAdapter, 10)
+    await adapter.set("key3", b"updated")
+    await adapter.remove_all(["key5", "key6"])
+    await adapter.store()
+    await adapter.close()
+
+    adapter = LogTableAdapter(tmp_path / "table")
+    assert await adapter.size() == 8
+    assert await adapter.get("key3") == b"updated"
+    assert await adapter.get("key5") is None
+    # Updated items move to the end like sqlite REPLACE
+    assert await adapter.last() == "key3"
+    changes = await adapter.fetch_changes(10, 10)
+    assert [(change.type, change.key) for change in changes] == [
+        ("update", "key3"),
+        ("remove", "key5"),
+        ("remove", "key6"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_fetch_page(create_adapter: Callable[..., Awaitable[Any]]):
+    adapter = await create_adapter(LogTableAdapter, 25)
+    await adapter.remove("key12")
+    keys: list[str] = []
+    cursor: str | None = None
+    while True:
+        page = await adapter.fetch_page(10, backward=True, cursor=cursor)
+        keys.extend(page.items.keys())
+        if page.cursor is None:
+            break
+        cursor = page.cursor
+    assert keys == [f"key{i}" for i in reversed(range(25)) if i != 12]
+
+    await adapter.clear()
+    with pytest.raises(ValueError):
+        await adapter.fetch_page(10, backward=True, cursor=cursor)
+
+
+@pytest.mark.asyncio
+async def test_compact(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    create_adapter: Callable[..., Awaitable[Any]],
+):
+    monkeypatch.setattr("omuserver.extension.table.adapters.logtable.SEGMENT_SIZE", 64)
+    adapter = await create_adapter(LogTableAdapter, 20)
+    for i in range(20):
+        await adapter.set(f"key{i % 4}", f"updated{i}".encode())
+    await adapter.compact(0)
+    assert len(list((tmp_path / "table.log").glob("*.seg"))) == 2
+    assert await adapter.get("key1") == b"updated17"
+    assert await adapter.get("key10") == b"value10"
+    await adapter.close()
+
+    adapter = LogTableAdapter(tmp_path / "table")
+    assert await adapter.size() == 20
+    assert await adapter.get("key2") == b"updated18"
+    assert list(await adapter.fetch_all())[-4:] == ["key0", "key1", "key2", "key3"]
+
+
+@pytest.mark.asyncio
+async def test_batch_is_not_atomic(create_adapter: Callable[..., Awaitable[Any]]):
+    adapter = await create_adapter(LogTableAdapter, 5)
+    with pytest.raises(RuntimeError):
+        with adapter.batch():
+            await adapter.set("key0", b"changed")
+            await adapter.remove("key1")
+            raise RuntimeError
+    # Writes before the error are kept, unlike in sqlite
+    assert await adapter.get("key0") == b"changed"
+    assert await adapter.get("key1") is None
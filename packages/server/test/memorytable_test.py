@@ -0,0 +1,86 @@
+import json
+from datetime import UTC, datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from omu.extension.table import TableConfig
+from omuserver.extension.table.adapters.memorytable import InMemoryTableAdapter
+from omuserver.extension.table.adapters.sqlitetable import SqliteTableAdapter
+from omuserver.extension.table.adapters.tableadapter import TableAdapter
+
+
+async def populate(adapter: TableAdapter) -> None:
+    await adapter.set_all({f"key{i}": f"value{i}".encode() for i in range(30)})
+    await adapter.set("key3", b"updated")
+    await adapter.remove_all(["key10", "key11"])
+
+
+@pytest.mark.asyncio
+async def test_matches_sqlite(tmp_path: Path):
+    memory = InMemoryTableAdapter()
+    sqlite = SqliteTableAdapter(tmp_path / "table")
+    await populate(memory)
+    await populate(sqlite)
+
+    assert list(await memory.fetch_all()) == [
+        row[0] for row in sqlite._conn.execute("SELECT key FROM data ORDER BY id")
+    ]
+    assert await memory.fetch_items(5, 5, "key20") == await sqlite.fetch_items(
+        5, 5, "key20"
+    )
+    assert await memory.fetch_range("key5", "key3") == await sqlite.fetch_range(
+        "key5", "key3"
+    )
+    for backward in (False, True):
+        memory_keys: list[str] = []
+        cursor: str | None = None
+        while True:
+            page = await memory.fetch_page(7, backward, cursor)
+            memory_keys.extend(page.items)
+            if page.cursor is None:
+                break
+            cursor = page.cursor
+        sqlite_page = await sqlite.fetch_page(100, backward, None)
+        assert memory_keys == list(sqlite_page.items)
+
+
+@pytest.mark.asyncio
+async def test_expired_timestamps_match_sqlite(tmp_path: Path):
+    now = datetime.now(UTC)
+    # Lexically the +09:00 timestamp is the newest, but it is the oldest
+    timestamps = {
+        "tokyo": (now - timedelta(hours=2)).astimezone(timezone(timedelta(hours=9))),
+        "utc": now - timedelta(minutes=30),
+        "naive": (now - timedelta(hours=3)).replace(tzinfo=None),
+        "recent": now.astimezone(timezone(timedelta(hours=-5))),
+    }
+    items = {
+        key: json.dumps({"created_at": timestamp.isoformat()}).encode()
+        for key, timestamp in timestamps.items()
+    }
+    config: TableConfig = {
+        "indexes": {"created_at": {"path": "$.created_at"}},
+        "retention": {"max_age": 60 * 60, "timestamp_index": "created_at"},
+    }
+    memory = InMemoryTableAdapter()
+    sqlite = SqliteTableAdapter(tmp_path / "table")
+    for adapter in (memory, sqlite):
+        adapter.configure(config)
+        await adapter.set_all(items)
+    retention = config["retention"]
+    assert await memory.fetch_expired(retention, 100) == ["naive", "tokyo"]
+    assert await sqlite.fetch_expired(retention, 100) == ["naive", "tokyo"]
+
+
+@pytest.mark.asyncio
+async def test_batch_is_not_atomic():
+    adapter = InMemoryTableAdapter()
+    await populate(adapter)
+    with pytest.raises(RuntimeError):
+        with adapter.batch():
+            await adapter.set("key0", b"changed")
+            await adapter.remove("key1")
+            raise RuntimeError
+    # Writes before the error are kept, unlike in sqlite
+    assert await adapter.get("key0") == b"changed"
+    assert await adapter.get("key1") is None
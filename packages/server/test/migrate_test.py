@@ -0,0 +1,101 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from omu.extension.table import TableConfig
+from omu.identifier import Identifier
+from omuserver.extension.table import table_extension
+from omuserver.extension.table.adapters.logtable import LogTableAdapter
+from omuserver.extension.table.adapters.partitionedtable import (
+    PartitionedTableAdapter,
+)
+from omuserver.extension.table.adapters.sqlitetable import SqliteTableAdapter
+from omuserver.extension.table.cached_table import CachedTable
+from omuserver.extension.table.table_extension import TableExtension
+
+
+@pytest.mark.asyncio
+async def test_migrate_table(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, extension: TableExtension
+):
+    monkeypatch.setattr(table_extension, "MIGRATE_BATCH_SIZE", 2)
+    id = Identifier("com.example", "items")
+    table = CachedTable(None, id)  # type: ignore
+    table.set_adapter(SqliteTableAdapter(extension.get_table_path(id)))
+    await table.add({f"key{i}": str(i).encode() for i in range(6)})
+    await table.commit_offset("behind", 3)
+
+    async def write() -> None:
+        # Runs between batches, after key0 and key1 were copied
+        await table.remove(["key0"])
+        await table.update({"key1": b"updated"})
+        await table.add({"key6": b"6"})
+        await table.commit_offset("caught_up", 9)
+
+    migration = asyncio.create_task(
+        extension.configure_table(table, {"adapter": "log"})
+    )
+    await asyncio.sleep(0)
+    await write()
+    await migration
+    assert isinstance(table.adapter, LogTableAdapter)
+    assert not (tmp_path / "items.db").exists()
+    items = await table.fetch_all()
+    assert items == {
+        "key1": b"updated",
+        **{f"key{i}": str(i).encode() for i in range(2, 7)},
+    }
+
+    changes = await table.fetch_changes(0, 100)
+    assert changes.changes[0].type == "clear"
+    assert await table.get_consumer_offset("caught_up") == changes.offset
+    # Reads the whole table again, starting with the clear
+    assert await table.get_consumer_offset("behind") == 0
+
+    # A config without an adapter keeps the table where it is
+    await extension.configure_table(table, {"cache_size": 10})
+    assert isinstance(table.adapter, LogTableAdapter)
+
+
+@pytest.mark.asyncio
+async def test_partition_existing_table(tmp_path: Path, extension: TableExtension):
+    # Chat messages stored before their table type declared a partition
+    id = Identifier("com.omuapps", "chat", "messages")
+    adapter = SqliteTableAdapter(extension.get_table_path(id))
+    table = CachedTable(None, id)  # type: ignore
+    table.set_adapter(adapter)
+    messages = {
+        f"message{i}": json.dumps(
+            {"room_id": f"room{i % 3}", "content": str(i)}
+        ).encode()
+        for i in range(9)
+    }
+    await table.add(messages)
+    await table.commit_offset("reader", await adapter.get_last_offset())
+    await adapter.close()
+
+    table = await extension.get_table(id)
+    assert isinstance(table.adapter, SqliteTableAdapter)
+    config: TableConfig = {
+        "indexes": {"room_id": {"path": "$.room_id"}},
+        "partition": {"path": "$.room_id"},
+        "search": {"path": "$.content", "text_type": "text"},
+    }
+    await extension.configure_table(table, config)
+    assert isinstance(table.adapter, PartitionedTableAdapter)
+    assert not extension.get_table_path(id).with_suffix(".db").exists()
+    assert (
+        len(list(extension.get_table_path(id).with_suffix(".parts").glob("room*-*.db")))
+        == 3
+    )
+    assert await table.fetch_all() == messages
+    room1 = await table.query(
+        {"filters": [{"path": "$.room_id", "op": "eq", "value": "room1"}]}
+    )
+    assert list(room1) == ["message1", "message4", "message7"]
+    # Readers that had read everything are not sent the messages again
+    assert (
+        await table.get_consumer_offset("reader")
+        == await table.adapter.get_last_offset()
+    )
@@ -0,0 +1,175 @@
+import json
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+from omu.extension.table import TableConfig
+from omuserver.extension.table.adapters.partitionedtable import (
+    PartitionedTableAdapter,
+)
+
+
+def message(index: int, room: int) -> bytes:
+    return json.dumps({"room_id": f"room{room}", "index": index}).encode()
+
+
+CONFIG: TableConfig = {
+    "partition": {"path": "$.room_id", "max_open": 2},
+    "indexes": {"index": {"path": "$.index"}},
+}
+MESSAGES = {f"message{i}": message(i, i % 3) for i in range(30)}
+
+
+@pytest.mark.asyncio
+async def test_partitioned_reads(create_adapter: Callable[..., Awaitable[Any]]):
+    adapter = await create_adapter(PartitionedTableAdapter, MESSAGES, CONFIG)
+    assert len(adapter._partitions) == 2
+    assert await adapter.get("message4") == message(4, 1)
+
+    page = await adapter.fetch_page(10, backward=True, cursor=None)
+    assert list(page.items) == [f"message{i}" for i in reversed(range(20, 30))]
+
+    room = await adapter.query(
+        {"filters": [{"path": "$.room_id", "op": "eq", "value": "room2"}]}
+    )
+    assert list(room) == [f"message{i}" for i in range(2, 30, 3)]
+
+    ordered = await adapter.query(
+        {"order_by": "$.index", "backward": True, "limit": 4, "fields": ["$.index"]}
+    )
+    assert [json.loads(value)["$.index"] for value in ordered.values()] == [
+        29,
+        28,
+        27,
+        26,
+    ]
+
+    changes = await adapter.fetch_changes(0, 2)
+    assert [change.item for change in changes] == [message(0, 0), message(1, 1)]
+
+
+@pytest.mark.asyncio
+async def test_partitioned_writes(
+    tmp_path: Path, create_adapter: Callable[..., Awaitable[Any]]
+):
+    adapter = await create_adapter(PartitionedTableAdapter, MESSAGES, CONFIG)
+    await adapter.set("message0", message(0, 1))
+    assert await adapter.get("message0") == message(0, 1)
+    assert await adapter.last() == "message0"
+
+    await adapter.remove_all([f"message{i}" for i in range(2, 30, 3)])
+    assert len(list((tmp_path / "table.parts").glob("room2-*.db"))) == 0
+    await adapter.close()
+
+    # The partition path is stored with the table
+    adapter = PartitionedTableAdapter(tmp_path / "table")
+    adapter.configure({})
+    assert await adapter.size() == 20
+    await adapter.set("message40", message(40, 5))
+    assert await adapter.get("message40") == message(40, 5)
+
+
+@pytest.mark.asyncio
+async def test_moves_drop_emptied_partitions(
+    tmp_path: Path, create_adapter: Callable[..., Awaitable[Any]]
+):
+    adapter = await create_adapter(PartitionedTableAdapter, MESSAGES, CONFIG)
+    parts = tmp_path / "table.parts"
+    room1 = range(1, 30, 3)
+    with adapter.batch():
+        await adapter.set_all({f"message{i}": message(i, 3) for i in room1})
+        assert len(list(parts.glob("room1-*.db"))) == 1
+    # Moved out by its last item, dropped once the batch is committed
+    assert len(list(parts.glob("room1-*.db"))) == 0
+    assert await adapter.get("message1") == message(1, 3)
+
+    await adapter.set_all({f"message{i}": message(i, 4) for i in range(0, 30, 3)})
+    assert len(list(parts.glob("room0-*.db"))) == 0
+    assert await adapter.size() == 30
+
+
+@pytest.mark.asyncio
+async def test_reads_use_the_directory(
+    tmp_path: Path, create_adapter: Callable[..., Awaitable[Any]]
+):
+    adapter = await create_adapter(PartitionedTableAdapter, MESSAGES, CONFIG)
+    files = set((tmp_path / "table.parts").glob("*.db"))
+    unknown = await adapter.query(
+        {"filters": [{"path": "$.room_id", "op": "eq", "value": "room9"}]}
+    )
+    assert unknown == {}
+    # Unknown rooms are never created as empty partitions
+    assert set((tmp_path / "table.parts").glob("*.db")) == files
+
+    for partition in tuple(adapter._partitions):
+        adapter._partitions.pop(partition)._database.close()
+    fetched = await adapter.fetch_by_index("index", 5, 6, 10, False)
+    assert fetched == {"message5": message(5, 2), "message6": message(6, 0)}
+    assert len(adapter._partitions) == 2
+
+    for partition in tuple(adapter._partitions):
+        adapter._partitions.pop(partition)._database.close()
+    expired = await adapter.fetch_expired({"max_rows": 28}, 10)
+    assert expired == ["message0", "message1"]
+    assert len(adapter._partitions) == 0
+
+    latest = await adapter.query({"order_by": "$.index", "backward": True, "limit": 1})
+    assert latest == {"message29": message(29, 2)}
+    assert len(adapter._partitions) == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_keeps_partitions_on_rollback(
+    tmp_path: Path, create_adapter: Callable[..., Awaitable[Any]]
+):
+    adapter = await create_adapter(PartitionedTableAdapter, MESSAGES, CONFIG)
+    room2 = [f"message{i}" for i in range(2, 30, 3)]
+    with pytest.raises(RuntimeError):
+        with adapter.batch():
+            await adapter.remove_all(room2)
+            await adapter.set("message30", message(30, 3))
+            await adapter.set("message31", message(31, 4))
+            raise RuntimeError
+    assert await adapter.size() == 30
+    assert await adapter.get("message2") == message(2, 2)
+    assert await adapter.get("message30") is None
+
+    with pytest.raises(RuntimeError):
+        with adapter.batch():
+            await adapter.clear()
+            raise RuntimeError
+    assert await adapter.size() == 30
+    assert await adapter.get("message4") == message(4, 1)
+
+    with adapter.batch():
+        await adapter.remove_all(room2)
+        await adapter.set("message31", message(31, 4))
+        await adapter.set("message32", message(32, 5))
+        # Dropped and closed once the batch is committed
+        assert len(list((tmp_path / "table.parts").glob("room2-*.db"))) == 1
+    assert len(list((tmp_path / "table.parts").glob("room2-*.db"))) == 0
+    assert len(adapter._partitions) == 2
+    assert await adapter.get("message31") == message(31, 4)
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_across_partitions(tmp_path: Path):
+    adapter = PartitionedTableAdapter(tmp_path / "messages")
+    adapter.configure(
+        {"partition": {"path": "$.room_id"}, "search": {"path": "$.content"}}
+    )
+
+    def item(room: int, content: str) -> bytes:
+        return json.dumps({"room_id": f"room{room}", "content": content}).encode()
+
+    await adapter.set_all(
+        {
+            "message0": item(0, "hello"),
+            "message1": item(1, "hello hello hello"),
+            "message2": item(0, "hello hello"),
+            "message3": item(1, "goodbye"),
+        }
+    )
+    page = await adapter.search({"text": "hello"})
+    assert list(page.items) == ["message1", "message2", "message0"]
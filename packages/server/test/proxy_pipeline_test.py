@@ -0,0 +1,173 @@
+import asyncio
+from collections.abc import Callable, Mapping
+from pathlib import Path
+from typing import Any
+
+import pytest
+from omu.extension.table import TableWrite
+from omu.extension.table.table_extension import TableImpl
+from omu.identifier import Identifier
+from omuserver.extension.table.adapters.sqlitetable import SqliteTableAdapter
+from omuserver.extension.table.cached_table import CachedTable
+from omuserver.extension.table.proxy_pipeline import ProxyPipeline
+
+TABLE_ID = Identifier("com.example", "messages")
+
+
+def received(session: Any) -> list[Any]:
+    return [packet for _, packet in session.sent]
+
+
+@pytest.mark.asyncio
+async def test_proxy_pipeline(create_session: Callable[..., Any]):
+    written: list[Mapping[str, bytes]] = []
+
+    async def commit(items: Mapping[str, bytes]) -> None:
+        written.append(items)
+
+    pipeline = ProxyPipeline(TABLE_ID, commit)
+    first, second = create_session("first"), create_session("second")
+    pipeline.attach(first)  # type: ignore
+    pipeline.attach(second)  # type: ignore
+
+    await pipeline.send({"a": b"1"})
+    await pipeline.send({"b": b"2"})
+    assert [packet.key for packet in received(first)] == [1, 2]
+
+    # The second batch overtakes the first but is written after it
+    await pipeline.receive(first, 2, {"b": b"2!"})  # type: ignore
+    await pipeline.receive(second, 2, {"b": b"2!?"})  # type: ignore
+    assert written == []
+    await pipeline.receive(first, 1, {"a": b"1!"})  # type: ignore
+    await pipeline.receive(second, 1, {"a": b"1!?"})  # type: ignore
+    assert written == [{"a": b"1!?"}, {"b": b"2!?"}]
+
+    # A slow proxy is skipped and its late answer ignored
+    pipeline.timeout = 0.05
+    await pipeline.send({"c": b"3"})
+    while len(received(second)) < 3:
+        await asyncio.sleep(0.001)
+    assert received(second)[-1].items == {"c": b"3"}
+    assert not await pipeline.receive(first, 3, {"c": b"late"})  # type: ignore
+    await pipeline.receive(second, 3, {"c": b"3?"})  # type: ignore
+    assert written[-1] == {"c": b"3?"}
+    assert pipeline.stats[first.app.key()].timeouts == 1
+    assert pipeline.stats[first.app.key()].batches == 2
+
+    # Batches held by a detached proxy move on at once
+    pipeline.timeout = 5
+    await pipeline.send({"d": b"4"})
+    pipeline.detach(first)  # type: ignore
+    await asyncio.sleep(0)
+    assert received(second)[-1].items == {"d": b"4"}
+
+
+@pytest.mark.asyncio
+async def test_proxy_window(create_session: Callable[..., Any]):
+    async def commit(items: Mapping[str, bytes]) -> None:
+        pass
+
+    pipeline = ProxyPipeline(TABLE_ID, commit)
+    session = create_session("proxy")
+    pipeline.attach(session)  # type: ignore
+    pipeline.window = 1
+    await pipeline.send({"a": b"1"})
+    blocked = asyncio.create_task(pipeline.send({"b": b"2"}))
+    await asyncio.sleep(0)
+    assert len(received(session)) == 1
+    await pipeline.receive(session, 1, {"a": b"1"})  # type: ignore
+    await blocked
+    assert [packet.key for packet in received(session)] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_failed_commit(create_session: Callable[..., Any]):
+    written: list[Mapping[str, bytes]] = []
+
+    async def commit(items: Mapping[str, bytes]) -> None:
+        if "a" in items:
+            raise RuntimeError
+        written.append(items)
+
+    pipeline = ProxyPipeline(TABLE_ID, commit)
+    session = create_session("proxy")
+    pipeline.attach(session)  # type: ignore
+    pipeline.window = 2
+    await pipeline.send({"a": b"1"})
+    await pipeline.send({"b": b"2"})
+    blocked = asyncio.create_task(pipeline.send({"c": b"3"}))
+    await pipeline.receive(session, 2, {"b": b"2"})  # type: ignore
+    # The failed batch is logged, the ones after it are still written
+    await pipeline.receive(session, 1, {"a": b"1"})  # type: ignore
+    assert written == [{"b": b"2"}]
+    await asyncio.wait_for(blocked, 1)
+    await pipeline.receive(session, 3, {"c": b"3"})  # type: ignore
+    assert written == [{"b": b"2"}, {"c": b"3"}]
+
+
+@pytest.mark.asyncio
+async def test_local_proxies(
+    create_session: Callable[..., Any], create_table: Callable[..., TableImpl[dict]]
+):
+    written: list[Mapping[str, bytes]] = []
+
+    async def commit(items: Mapping[str, bytes]) -> None:
+        written.append(items)
+
+    pipeline = ProxyPipeline(TABLE_ID, commit)
+    first, second = create_table(id=TABLE_ID), create_table(id=TABLE_ID)
+
+    async def append(item: dict) -> dict:
+        return {**item, "text": item["text"] + "!"}
+
+    async def drop(items: list[dict]) -> list[dict | None]:
+        return [None if item["key"] == "b" else item for item in items]
+
+    first.proxy(append)
+    second.proxy_batch(drop)
+    remote = create_session("remote")
+    pipeline.attach(create_session("first", first._client))  # type: ignore
+    pipeline.attach(create_session("second", second._client))  # type: ignore
+    pipeline.attach(remote)  # type: ignore
+
+    await pipeline.send(
+        {
+            "a": b'{"key": "a", "text": "a"}',
+            "b": b'{"key": "b", "text": "b"}',
+        }
+    )
+    while not received(remote):
+        await asyncio.sleep(0)
+    # Both in-process proxies ran on one decode before the remote hop
+    assert received(remote)[0].items == {"a": b'{"key": "a", "text": "a!"}'}
+    await pipeline.receive(remote, 1, received(remote)[0].items)  # type: ignore
+    assert written == [{"a": b'{"key": "a", "text": "a!"}'}]
+
+
+@pytest.mark.asyncio
+async def test_proxied_batch_keeps_order(
+    tmp_path: Path,
+    create_session: Callable[..., Any],
+    create_table: Callable[..., TableImpl[dict]],
+):
+    table = CachedTable(None, TABLE_ID)  # type: ignore
+    table.set_adapter(SqliteTableAdapter(tmp_path / "messages"))
+    client = create_table(id=TABLE_ID)
+
+    async def append(item: dict) -> dict:
+        return {**item, "text": item["text"] + "!"}
+
+    client.proxy(append)
+    table.attach_proxy_session(create_session("proxy", client._client))  # type: ignore
+
+    await table.write_batch(
+        [
+            TableWrite(TABLE_ID, "add", {"a": b'{"key": "a", "text": "a"}'}),
+            TableWrite(TABLE_ID, "remove", {"a": b""}),
+            TableWrite(TABLE_ID, "add", {"b": b'{"key": "b", "text": "b"}'}),
+            TableWrite(TABLE_ID, "update", {"b": b'{"key": "b", "text": "c"}'}),
+        ]
+    )
+    # Proxied adds are written where they were submitted, not after the batch
+    await asyncio.sleep(0.01)
+    assert await table.fetch_all() == {"b": b'{"key": "b", "text": "c"}'}
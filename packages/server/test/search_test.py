@@ -0,0 +1,99 @@
+import json
+from pathlib import Path
+
+import pytest
+from omu.extension.table import TableConfig, TableSearchQuery
+from omuserver.extension.table.adapters.memorytable import InMemoryTableAdapter
+from omuserver.extension.table.adapters.partitionedtable import (
+    PartitionedTableAdapter,
+)
+from omuserver.extension.table.adapters.sqlitetable import SqliteTableAdapter
+from omuserver.extension.table.adapters.tableadapter import TableAdapter
+
+CONFIG: TableConfig = {"search": {"path": "$.content", "text_type": "text"}}
+
+
+def message(room: int, *texts: str) -> bytes:
+    content = {
+        "type": "root",
+        "data": [{"type": "text", "data": text} for text in texts],
+    }
+    return json.dumps({"room_id": f"room{room}", "content": content}).encode()
+
+
+async def populate(adapter: TableAdapter) -> None:
+    await adapter.set_all(
+        {
+            "message0": message(0, "こんにちは"),
+            "message1": message(1, "こんにちは", "こんにちは"),
+            "message2": message(0, "hello ", "world"),
+            "message3": message(1, "こんばんは"),
+            "message4": message(0, "こんにちは!"),
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_sqlite_search(tmp_path: Path):
+    adapter = SqliteTableAdapter(tmp_path / "messages")
+    adapter.configure(CONFIG)
+    await populate(adapter)
+
+    # Ranked by bm25, shorter matches come first
+    page = await adapter.search({"text": "こんにちは"})
+    assert list(page.items) == ["message0", "message1", "message4"]
+    assert page.cursor is None
+
+    page = await adapter.search({"text": "こんにちは", "order": "newest", "limit": 2})
+    assert list(page.items) == ["message4", "message1"]
+    page = await adapter.search(
+        {"text": "こんにちは", "order": "newest", "cursor": page.cursor}
+    )
+    assert list(page.items) == ["message0"]
+
+    room = await adapter.search(
+        {
+            "text": "こんにちは",
+            "filters": [{"path": "$.room_id", "op": "eq", "value": "room0"}],
+        }
+    )
+    assert set(room.items) == {"message0", "message4"}
+
+    # Text shorter than a trigram
+    short = await adapter.search({"text": "ばん"})
+    assert list(short.items) == ["message3"]
+    assert list((await adapter.search({"text": "o wor"})).items) == ["message2"]
+
+    await adapter.set("message3", message(1, "おはよう"))
+    await adapter.remove("message1")
+    assert list((await adapter.search({"text": "ばん"})).items) == []
+    assert list((await adapter.search({"text": "おはよう"})).items) == ["message3"]
+    assert list((await adapter.search({"text": "こんにちは"})).items) == [
+        "message0",
+        "message4",
+    ]
+
+    with pytest.raises(ValueError):
+        await adapter.search({"text": " "})
+
+
+@pytest.mark.asyncio
+async def test_search_adapters_match(tmp_path: Path):
+    sqlite = SqliteTableAdapter(tmp_path / "sqlite")
+    sqlite.configure(CONFIG)
+    memory = InMemoryTableAdapter()
+    memory.configure(CONFIG)
+    partitioned = PartitionedTableAdapter(tmp_path / "partitioned")
+    partitioned.configure({**CONFIG, "partition": {"path": "$.room_id"}})
+    for adapter in (sqlite, memory, partitioned):
+        await populate(adapter)
+
+    queries: list[TableSearchQuery] = [
+        {"text": "こんにちは", "order": "newest"},
+        {"text": "hello world"},
+        {"text": "は", "order": "newest", "limit": 2, "cursor": "1"},
+    ]
+    for query in queries:
+        expected = await sqlite.search(query)
+        assert await memory.search(query) == expected
+        assert await partitioned.search(query) == expected
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+from omu.app import App
+from omu.extension.table import TableCacheChange, TableType
+from omu.identifier import Identifier
+from omu.interface import Keyable
+from omu.model import Model
+from omu.serializer import Serializable, Serializer
+from omuserver.extension.table.adapters.sqlitetable import SqliteTableAdapter
+from omuserver.extension.table.cached_table import CachedTable
+from omuserver.extension.table.serialized_table import SerializedTable
+
+
+class CountingSerializer[T]:
+    def __init__(self, serializer: Serializable[T, bytes]) -> None:
+        self.serializer = serializer
+        self.deserialized = 0
+
+    def serialize(self, item: T) -> bytes:
+        return self.serializer.serialize(item)
+
+    def deserialize(self, item: bytes) -> T:
+        self.deserialized += 1
+        return self.serializer.deserialize(item)
+
+
+@pytest.mark.asyncio
+async def test_memoized_deserialization(tmp_path: Path):
+    serializer = CountingSerializer(Serializer.model(App).to_json())
+    table_type = TableType(
+        id=Identifier("com.example", "apps"),
+        serializer=serializer,
+        key_function=lambda item: item.key(),
+    )
+    cached_table = CachedTable(None, table_type.id)  # type: ignore
+    cached_table.set_adapter(SqliteTableAdapter(tmp_path / "apps"))
+    cached_table.set_cache_size(10)
+    table = SerializedTable(cached_table, table_type)
+
+    app = App(Identifier("com.example", "app"), version="1.0.0")
+    await table.add(app)
+    first = await table.get(app.key())
+    second = await table.get(app.key())
+    assert first is not None and second is not None
+    assert serializer.deserialized == 1
+    assert first is second
+
+    await table.update(App(app.id, version="2.0.0"))
+    updated = await table.get(app.key())
+    assert updated is not None
+    assert updated.version == "2.0.0"
+    assert first.version == "1.0.0"
+
+
+@pytest.mark.asyncio
+async def test_warm_up(tmp_path: Path):
+    adapter = SqliteTableAdapter(tmp_path / "items")
+    await adapter.set_all({f"key{i}": str(i).encode() for i in range(10)})
+    table = CachedTable(None, Identifier("com.example", "items"))  # type: ignore
+    table.set_adapter(adapter)
+    assert await table.warm_up() == 0
+
+    table.set_cache_size(3)
+    assert await table.warm_up() == 3
+    assert list(table.cache) == ["key7", "key8", "key9"]
+
+
+class Emoji(Model[dict], Keyable):
+    def __init__(self, id: str, patterns: list[str]) -> None:
+        self.id = id
+        self.patterns = patterns
+
+    def key(self) -> str:
+        return self.id
+
+    @classmethod
+    def from_json(cls, json: dict) -> Emoji:
+        return cls(json["id"], json["patterns"])
+
+    def to_json(self) -> dict:
+        return {"id": self.id, "patterns": self.patterns}
+
+
+@pytest.mark.asyncio
+async def test_bulk_cache_change(tmp_path: Path):
+    serializer = CountingSerializer(Serializer.model(Emoji).to_json())
+    table_type = TableType(
+        id=Identifier("com.example", "emoji"),
+        serializer=serializer,
+        key_function=lambda item: item.key(),
+    )
+    cached_table = CachedTable(None, table_type.id)  # type: ignore
+    cached_table.set_adapter(SqliteTableAdapter(tmp_path / "emoji"))
+    cached_table.set_cache_size(100)
+    table = SerializedTable(cached_table, table_type)
+    changes: list[TableCacheChange[Emoji]] = []
+
+    async def on_change(change: TableCacheChange[Emoji]) -> None:
+        changes.append(change)
+
+    table.event.cache_change += on_change
+
+    await table.add(*(Emoji(f"emoji{i}", [f":e{i}:"]) for i in range(150)))
+    # One event with what is left after the bound, each item decoded once
+    assert len(changes) == 1
+    assert list(changes[0].inserted) == [f"emoji{i}" for i in range(50, 150)]
+    assert changes[0].updated == {}
+    assert changes[0].removed == {}
+    assert serializer.deserialized == 150
+
+    await table.update(Emoji("emoji60", [":sixty:"]))
+    assert changes[-1].inserted == {}
+    assert list(changes[-1].updated) == ["emoji60"]
+    assert changes[-1].updated["emoji60"].patterns == [":sixty:"]
+    assert serializer.deserialized == 151
+
+    await table.add(Emoji("new0", []), Emoji("new1", []))
+    assert list(changes[-1].inserted) == ["new0", "new1"]
+    assert list(changes[-1].removed) == ["emoji50", "emoji51"]
+    await table.remove(Emoji("emoji99", []))
+    assert list(changes[-1].removed) == ["emoji99"]
+    assert len(changes) == 4
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_is_cheaper_than_decoding(tmp_path: Path):
+    table_type = TableType(
+        id=Identifier("com.example", "emoji"),
+        serializer=Serializer.model(Emoji).to_json(),
+        key_function=lambda item: item.key(),
+    )
+    cached_table = CachedTable(None, table_type.id)  # type: ignore
+    cached_table.set_adapter(SqliteTableAdapter(tmp_path / "emoji"))
+    cached_table.set_cache_size(10)
+    table = SerializedTable(cached_table, table_type)
+    emoji = Emoji("emoji", [f":e{i}:" for i in range(100)])
+    await table.add(emoji)
+    data = cached_table.cache["emoji"]
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        table_type.serializer.deserialize(data)
+    decoding = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(1000):
+        await table.get("emoji")
+    hits = time.perf_counter() - start
+    assert hits < decoding
+
+
+@pytest.mark.asyncio
+async def test_proxy(tmp_path: Path, create_session: Callable[..., Any]):
+    table_type = TableType(
+        id=Identifier("com.example", "emoji"),
+        serializer=Serializer.model(Emoji).to_json(),
+        key_function=lambda item: item.key(),
+    )
+    cached_table = CachedTable(None, table_type.id)  # type: ignore
+    cached_table.set_adapter(SqliteTableAdapter(tmp_path / "emoji"))
+    table = SerializedTable(cached_table, table_type)
+
+    async def append(emoji: Emoji) -> Emoji | None:
+        if emoji.id == "dropped":
+            return None
+        return Emoji(emoji.id, [*emoji.patterns, ":proxied:"])
+
+    unlisten = table.proxy(append)
+    await table.add(Emoji("a", [":a:"]), Emoji("dropped", []))
+    # In-process proxies run in their own task
+    while cached_table._proxy._batches:
+        await asyncio.sleep(0)
+    assert list(await table.fetch_all()) == ["a"]
+    assert (await table.get("a") or Emoji("", [])).patterns == [":a:", ":proxied:"]
+
+    # Proxies of the server run before those of sessions
+    session = create_session("proxy")
+    cached_table.attach_proxy_session(session)
+    added = asyncio.create_task(table.add(Emoji("b", [])))
+    while not session.sent:
+        await asyncio.sleep(0)
+    _, packet = session.sent[0]
+    assert packet.items == {"b": b'{"id": "b", "patterns": [":proxied:"]}'}
+    await cached_table.proxy(session, packet.key, packet.items)
+    await added
+    while cached_table._proxy._batches:
+        await asyncio.sleep(0)
+    assert (await table.get("b") or Emoji("", [])).patterns == [":proxied:"]
+
+    unlisten()
+    cached_table.detach_session(session)
+    await table.add(Emoji("c", []))
+    assert (await table.get("c") or Emoji("", [])).patterns == []
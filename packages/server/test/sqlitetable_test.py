@@ -0,0 +1,329 @@
+import json
+import sqlite3
+from collections.abc import Awaitable, Callable
+from contextlib import closing
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+import pytest
+from omu.extension.table import TableConfig
+from omuserver.extension.table.adapters import sqlitetable
+from omuserver.extension.table.adapters.sqlitetable import SqliteTableAdapter
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_backward(create_adapter: Callable[..., Awaitable[Any]]):
+    adapter = await create_adapter(SqliteTableAdapter, 25)
+    keys: list[str] = []
+    cursor: str | None = None
+    while True:
+        page = await adapter.fetch_page(10, backward=True, cursor=cursor)
+        keys.extend(page.items.keys())
+        if page.cursor is None:
+            break
+        cursor = page.cursor
+    assert keys == [f"key{i}" for i in reversed(range(25))]
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_forward(create_adapter: Callable[..., Awaitable[Any]]):
+    adapter = await create_adapter(SqliteTableAdapter, 20)
+    first = await adapter.fetch_page(10, backward=False, cursor=None)
+    assert list(first.items.keys()) == [f"key{i}" for i in range(10)]
+    assert first.cursor is not None
+    second = await adapter.fetch_page(10, backward=False, cursor=first.cursor)
+    assert list(second.items.keys()) == [f"key{i}" for i in range(10, 20)]
+    assert second.cursor is not None
+    last = await adapter.fetch_page(10, backward=False, cursor=second.cursor)
+    assert len(last.items) == 0
+    assert last.cursor is None
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_cursor_expires_on_clear(
+    create_adapter: Callable[..., Awaitable[Any]],
+):
+    adapter = await create_adapter(SqliteTableAdapter, 20)
+    page = await adapter.fetch_page(10, backward=True, cursor=None)
+    assert page.cursor is not None
+    await adapter.clear()
+    with pytest.raises(ValueError):
+        await adapter.fetch_page(10, backward=True, cursor=page.cursor)
+
+
+@pytest.mark.asyncio
+async def test_fetch_items_order(create_adapter: Callable[..., Awaitable[Any]]):
+    adapter = await create_adapter(SqliteTableAdapter, 10)
+    items = await adapter.fetch_items(before=3, after=3, cursor="key5")
+    assert list(items.keys()) == ["key7", "key6", "key5", "key4", "key3"]
+    items = await adapter.fetch_items(before=3, after=None, cursor=None)
+    assert list(items.keys()) == ["key9", "key8", "key7"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_by_index(tmp_path: Path):
+    adapter = SqliteTableAdapter(tmp_path / "table")
+    await adapter.set_all(
+        {
+            f"key{i}": json.dumps(
+                {"room_id": f"room{i % 3}", "paid": {"amount": i} if i % 2 else None}
+            ).encode()
+            for i in range(10)
+        }
+    )
+    adapter.configure(
+        {
+            "indexes": {
+                "room_id": {"path": "$.room_id"},
+                "paid": {"path": "$.paid", "exists": True},
+            }
+        }
+    )
+    items = await adapter.fetch_by_index("room_id", "room1", "room1", None, False)
+    assert list(items.keys()) == ["key1", "key4", "key7"]
+    items = await adapter.fetch_by_index("paid", True, True, 2, True)
+    assert list(items.keys()) == ["key9", "key7"]
+    with pytest.raises(ValueError):
+        await adapter.fetch_by_index("author_id", None, None, None, False)
+
+    adapter.configure({"indexes": {"room_id": {"path": "$.room_id"}}})
+    with pytest.raises(ValueError):
+        await adapter.fetch_by_index("paid", True, True, None, False)
+
+
+@pytest.mark.asyncio
+async def test_query(tmp_path: Path):
+    adapter = SqliteTableAdapter(tmp_path / "table")
+    await adapter.set_all(
+        {
+            f"key{i}": json.dumps(
+                {"room_id": f"room{i % 3}", "order": 10 - i, "paid": i % 2 == 1}
+            ).encode()
+            for i in range(10)
+        }
+    )
+    adapter.configure({"indexes": {"room_id": {"path": "$.room_id"}}})
+    items = await adapter.query(
+        {"filters": [{"path": "$.room_id", "op": "eq", "value": "room1"}]}
+    )
+    assert list(items.keys()) == ["key1", "key4", "key7"]
+    plan = adapter._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT key FROM data "
+        "WHERE json_extract(CAST(value AS TEXT), '$.room_id') = 'room1'"
+    ).fetchall()
+    assert "index_room_id" in plan[0][3]
+    items = await adapter.query(
+        {
+            "filters": [
+                {"path": "$.room_id", "op": "in", "value": ["room0", "room2"]},
+                {"path": "$.paid", "op": "eq", "value": True},
+            ],
+            "order_by": "$.order",
+            "limit": 2,
+        }
+    )
+    assert list(items.keys()) == ["key9", "key5"]
+    items = await adapter.query(
+        {
+            "filters": [{"path": "$.room_id", "op": "prefix", "value": "room"}],
+            "backward": True,
+            "limit": 1,
+            "fields": ["$.room_id", "$.order"],
+        }
+    )
+    assert {key: json.loads(value) for key, value in items.items()} == {
+        "key9": {"$.room_id": "room0", "$.order": 1}
+    }
+    with pytest.raises(ValueError):
+        await adapter.query({"filters": [{"path": "room_id", "op": "eq"}]})
+
+
+@pytest.mark.asyncio
+async def test_fetch_expired(tmp_path: Path):
+    adapter = SqliteTableAdapter(tmp_path / "table")
+    now = datetime.now().astimezone()
+    await adapter.set_all(
+        {
+            f"key{i}": json.dumps(
+                {
+                    "room_id": f"room{i % 2}",
+                    "created_at": (now - timedelta(days=10 - i)).isoformat(),
+                }
+            ).encode()
+            for i in range(10)
+        }
+    )
+    adapter.configure(
+        {
+            "indexes": {
+                "room_id": {"path": "$.room_id"},
+                "created_at": {"path": "$.created_at"},
+            }
+        }
+    )
+    assert await adapter.fetch_expired({"max_rows": 7}, 100) == [
+        "key0",
+        "key1",
+        "key2",
+    ]
+    assert await adapter.fetch_expired({"max_rows": 7}, 2) == ["key0", "key1"]
+    assert await adapter.fetch_expired(
+        {"max_age": 60 * 60 * 24 * 7.5, "timestamp_index": "created_at"}, 100
+    ) == ["key0", "key1", "key2"]
+    expired = await adapter.fetch_expired(
+        {"max_rows_per_partition": 3, "partition_index": "room_id"}, 100
+    )
+    assert sorted(expired) == ["key0", "key1", "key2", "key3"]
+    with pytest.raises(ValueError):
+        await adapter.fetch_expired({"max_age": 1}, 100)
+
+    await adapter.remove_all(expired)
+    assert await adapter.compact(1) >= 0
+    assert await adapter.size() == 6
+
+
+@pytest.mark.asyncio
+async def test_retention_is_bounded(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(sqlitetable, "RETENTION_PARTITIONS", 2)
+    adapter = SqliteTableAdapter(tmp_path / "table")
+    config: TableConfig = {
+        "indexes": {
+            "room_id": {"path": "$.room_id"},
+            "created_at": {"path": "$.created_at"},
+        },
+        "retention": {
+            "max_age": 60,
+            "timestamp_index": "created_at",
+            "max_rows_per_partition": 1,
+            "partition_index": "room_id",
+        },
+    }
+    adapter.configure(config)
+    now = datetime.now().astimezone()
+    await adapter.set_all(
+        {
+            f"key{i}": json.dumps(
+                {"room_id": f"room{i % 5}", "created_at": now.isoformat()}
+            ).encode()
+            for i in range(10)
+        }
+    )
+    plan = adapter._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT key FROM data WHERE "
+        "julianday(json_extract(CAST(value AS TEXT), '$.created_at')) < 0"
+    ).fetchall()
+    assert sqlitetable.AGE_INDEX in plan[0][3]
+    # Two partitions per call, continuing where the last call stopped
+    retention = config["retention"]
+    assert await adapter.fetch_expired(retention, 100) == ["key0", "key1"]
+    assert await adapter.fetch_expired(retention, 100) == ["key2", "key3"]
+    assert await adapter.fetch_expired(retention, 100) == ["key4"]
+    assert await adapter.fetch_expired(retention, 100) == ["key0", "key1"]
+
+
+@pytest.mark.asyncio
+async def test_compact_changes_in_batches(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(sqlitetable, "COMPACT_CHANGES_BATCH", 3)
+    adapter = SqliteTableAdapter(tmp_path / "table")
+    for _ in range(3):
+        await adapter.record_changes("update", ["a", "b"])
+    await adapter.set_all({"a": b"1", "b": b"2"})
+    assert await adapter.compact_changes() == 3
+    assert await adapter.compact_changes() == 1
+    assert await adapter.compact_changes() == 0
+    changes = await adapter.fetch_changes(0, 100)
+    assert [(c.offset, c.key) for c in changes] == [(5, "a"), (6, "b")]
+
+
+@pytest.mark.asyncio
+async def test_migrate(tmp_path: Path):
+    path = tmp_path / "table"
+    with closing(sqlite3.connect(path.with_suffix(".db"))) as connection:
+        # Created before auto_vacuum was set
+        connection.execute("CREATE TABLE legacy (id INTEGER PRIMARY KEY)")
+        connection.commit()
+    assert SqliteTableAdapter.migrate(path)
+    assert not SqliteTableAdapter.migrate(path)
+    adapter = SqliteTableAdapter(path)
+    await adapter.set("key", b"value")
+    assert adapter._conn.execute("PRAGMA auto_vacuum").fetchone() == (2,)
+
+
+@pytest.mark.asyncio
+async def test_changes(tmp_path: Path):
+    adapter = SqliteTableAdapter(tmp_path / "table")
+    await adapter.record_changes("add", ["a", "b"])
+    await adapter.set_all({"a": b"1", "b": b"2"})
+    await adapter.record_changes("update", ["a"])
+    await adapter.set_all({"a": b"3"})
+    await adapter.record_changes("remove", ["b"])
+    await adapter.remove_all(["b"])
+    changes = await adapter.fetch_changes(0, 100)
+    assert [(c.offset, c.type, c.key, c.item) for c in changes] == [
+        (1, "add", "a", b"3"),
+        (2, "add", "b", None),
+        (3, "update", "a", b"3"),
+        (4, "remove", "b", None),
+    ]
+    assert [c.offset for c in await adapter.fetch_changes(2, 1)] == [3]
+
+    await adapter.set_consumer_offset("consumer", 2)
+    assert await adapter.get_consumer_offset("consumer") == 2
+    assert await adapter.get_consumer_offset("unknown") == 0
+    assert await adapter.compact_changes() == 2
+    changes = await adapter.fetch_changes(0, 100)
+    assert [(c.type, c.key) for c in changes] == [("update", "a"), ("remove", "b")]
+
+    await adapter.set_consumer_offset("consumer", 4)
+    await adapter.record_changes("clear", [])
+    await adapter.clear()
+    await adapter.compact_changes()
+    changes = await adapter.fetch_changes(0, 100)
+    assert [(c.type, c.key) for c in changes] == [("clear", None)]
+    await adapter.set_consumer_offset("consumer", 5)
+    await adapter.compact_changes()
+    assert await adapter.fetch_changes(0, 100) == []
+
+
+@pytest.mark.asyncio
+async def test_compression(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    adapter = SqliteTableAdapter(tmp_path / "table")
+    items = {
+        f"key{i}": json.dumps(
+            {"room_id": f"room{i % 3}", "text": "hello " * 20, "index": i}
+        ).encode()
+        for i in range(200)
+    }
+    await adapter.set_all(items)
+    indexes: TableConfig = {"indexes": {"room_id": {"path": "$.room_id"}}}
+    with pytest.raises(ValueError):
+        adapter.configure({**indexes, "compression": {"type": "zlib"}})
+    monkeypatch.setattr(sqlitetable, "COMPRESSION_BATCH", 7)
+    adapter.configure({"compression": {"type": "zlib"}})
+    assert adapter._dictionaries
+    (stored,) = adapter._conn.execute(
+        "SELECT value FROM data WHERE key = 'key1'"
+    ).fetchone()
+    assert stored[:1] == b"\x00" and len(stored) < len(items["key1"])
+    assert await adapter.get("key1") == items["key1"]
+    assert adapter._codec is not None
+    assert adapter._codec.decode(adapter._codec.encode(b"\x00")) == b"\x00"
+    assert await adapter.fetch_all() == items
+    found = await adapter.query(
+        {"filters": [{"path": "$.room_id", "op": "eq", "value": "room1"}]}
+    )
+    assert list(found) == [f"key{i}" for i in range(200) if i % 3 == 1]
+
+    # Reopened before configure, values stay readable
+    await adapter.close()
+    adapter = SqliteTableAdapter(tmp_path / "table")
+    assert await adapter.get("key2") == items["key2"]
+    adapter.configure(indexes)
+    (stored,) = adapter._conn.execute(
+        "SELECT value FROM data WHERE key = 'key2'"
+    ).fetchone()
+    assert stored == items["key2"]
+    assert not adapter._dictionaries
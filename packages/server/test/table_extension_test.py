@@ -0,0 +1,30 @@
+from types import SimpleNamespace
+
+import pytest
+from omu.errors import PermissionDenied
+from omu.extension.table.packets import TableChangesSincePacket, TableOffsetPacket
+from omu.identifier import Identifier
+from omuserver.extension.table.adapters.sqlitetable import SqliteTableAdapter
+from omuserver.extension.table.cached_table import CachedTable
+from omuserver.extension.table.table_extension import TableExtension
+
+TABLE_ID = Identifier("com.example", "items")
+
+
+@pytest.mark.asyncio
+async def test_changes_require_read_permission(extension: TableExtension):
+    table = CachedTable(None, TABLE_ID)  # type: ignore
+    table.set_adapter(SqliteTableAdapter(extension.get_table_path(TABLE_ID)))
+    extension._tables[TABLE_ID] = table
+    session = SimpleNamespace(app=SimpleNamespace(id=Identifier("com.other", "app")))
+    with pytest.raises(PermissionDenied):
+        await extension.handle_changes_since(
+            session,  # type: ignore
+            TableChangesSincePacket(id=TABLE_ID, offset=None, consumer=None, limit=10),
+        )
+    with pytest.raises(PermissionDenied):
+        await extension.handle_commit_offset(
+            session,  # type: ignore
+            TableOffsetPacket(id=TABLE_ID, consumer="reader", offset=1),
+        )
+    assert await table.get_consumer_offset("com.other:app/reader") == 0